@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+PIL图像转换为QImage/QPixmap的耗时基准测试
+
+用法（在PhotoWatermarkApp目录下运行）:
+    python benchmarks/bench_qimage_conversion.py [--repeat N]
+
+分别测量每帧的耗时：
+    ImageQt       PIL.ImageQt.ImageQt + QPixmap.fromImage（原有方式）
+    set_base      PreviewCompositor.set_base：pil_to_qimage转换底图并建立帧，切换图片或代理图时执行
+    compose       PreviewCompositor.compose：移动水印时只恢复并重绘水印所在区域
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# 添加项目目录到系统路径，以便导入其他模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PIL import Image
+from PIL.ImageQt import ImageQt
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtGui import QPixmap
+
+from ui.preview_compositor import PreviewCompositor
+from utils.ui_utils import pil_to_qimage
+
+
+# 测试的图片尺寸：预览代理图、高分屏预览、原图
+SIZES = [(1024, 683), (2048, 1365), (6000, 4000)]
+
+# 水印区域 (left, top, right, bottom)，按图片尺寸的比例
+WATERMARK_BOX = (0.55, 0.80, 0.95, 0.92)
+
+
+def measure(func, repeat):
+    """返回每次调用的平均耗时（毫秒）"""
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench_image(image, repeat):
+    """测量一张图片各转换方式的耗时"""
+    width, height = image.size
+    box = (
+        int(WATERMARK_BOX[0] * width), int(WATERMARK_BOX[1] * height),
+        int(WATERMARK_BOX[2] * width), int(WATERMARK_BOX[3] * height)
+    )
+    layer = Image.new('RGBA', (box[2] - box[0], box[3] - box[1]), (255, 255, 255, 160))
+
+    compositor = PreviewCompositor()
+    compositor.set_base(image)
+    compositor.set_layer('bench', pil_to_qimage(layer))
+    positions = [(box[0], box[1]), (box[0] - 8, box[1] - 4)]
+
+    def compose():
+        # 在两个位置之间来回移动水印，模拟拖动
+        positions.reverse()
+        compositor.compose(positions[0], 0.8)
+
+    return [
+        ('ImageQt', measure(lambda: QPixmap.fromImage(ImageQt(image)), repeat)),
+        ('set_base', measure(lambda: compositor.set_base(image), repeat)),
+        ('compose', measure(compose, repeat))
+    ]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="PIL到QImage转换耗时基准测试")
+    parser.add_argument('--repeat', type=int, default=20, help="每项测试的重复次数")
+    args = parser.parse_args(argv)
+
+    app = QApplication(sys.argv[:1])
+
+    print(f"{'size':>11} {'mode':>5} {'method':>14} {'ms/frame':>9}")
+    for width, height in SIZES:
+        pixels = (np.random.rand(height, width, 4) * 255).astype('uint8')
+        for mode in ('RGB', 'RGBA'):
+            image = Image.fromarray(pixels[:, :, :len(mode)], mode)
+            # 大图减少重复次数
+            repeat = max(1, args.repeat * 1024 * 683 // (width * height))
+            for method, elapsed in bench_image(image, repeat):
+                print(f"{width:>5}x{height:<5} {mode:>5} {method:>14} {elapsed:>9.2f}")
+
+    app.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
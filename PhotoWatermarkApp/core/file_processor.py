@@ -4,12 +4,18 @@
 
 import os
 import shutil
+import fnmatch
 from datetime import datetime
-from typing import List, Dict, Optional, Union
+from typing import Callable, Iterator, List, Dict, Optional, Union
 
 from PIL import Image
 from data.image_storage import ImageStorage
+from data.read_ahead import ReadAhead
 from core.watermark_processor import WatermarkProcessor
+from utils.archive_utils import ArchiveWriter, get_archive_format, is_member_path
+from utils.image_utils import (
+    sniff_image_format, sniff_image_header, SIGNATURE_LENGTH, OUTPUT_FORMATS, get_save_kwargs, resize_image
+)
 
 
 class FileProcessor:
@@ -18,49 +24,137 @@ class FileProcessor:
     def __init__(self):
         self.image_storage = ImageStorage()
         self.watermark_processor = WatermarkProcessor()
-        self.supported_formats = {
-            'JPEG': ['.jpg', '.jpeg'],
-            'PNG': ['.png'],
-            'BMP': ['.bmp'],
-            'TIFF': ['.tiff', '.tif']
-        }
+        self.supported_formats = {name: list(extensions) for name, extensions in OUTPUT_FORMATS.items()}
 
-    def import_images(self, file_paths: List[str]) -> Dict[str, bool]:
+    def import_images(self, file_paths: List[str], workers: int = 1) -> Dict[str, bool]:
         """
         导入图片文件
 
         Args:
-            file_paths: 图片文件路径列表
+            file_paths: 图片文件路径列表，可以包含ZIP归档（导入其中的所有图片）
+                或归档成员路径（如 shoot.zip!/day1/img.jpg），归档无需解压
+            workers: 并发加载的线程数，大于1时使用线程池加载
 
         Returns:
-            字典，键为文件路径，值为是否成功导入
+            字典，键为文件路径（归档展开为成员路径），值为是否成功导入
         """
+        file_paths = self.image_storage.expand_archives(file_paths)
+
+        if workers > 1:
+            # load_image本身会检查文件是否存在并根据文件头检查格式
+            futures = self.image_storage.load_images(file_paths, workers)
+            return {file_path: future.result() for file_path, future in futures.items()}
+
         results = {}
 
         for file_path in file_paths:
-            if os.path.isfile(file_path):
-                # 检查文件格式是否支持
-                file_ext = os.path.splitext(file_path)[1].lower()
-                format_found = False
-
-                for format_name, extensions in self.supported_formats.items():
-                    if file_ext in extensions:
-                        format_found = True
-                        break
-
-                if format_found:
-                    # 尝试加载图片
-                    if self.image_storage.load_image(file_path):
-                        results[file_path] = True
-                    else:
-                        results[file_path] = False
-                else:
-                    results[file_path] = False
+            # 根据文件头检查格式是否支持，然后尝试加载图片
+            if self.validate_format(file_path):
+                results[file_path] = self.image_storage.load_image(file_path)
             else:
                 results[file_path] = False
 
         return results
 
+    def scan_folder(
+        self,
+        folder: str,
+        recursive: bool = True,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None
+    ) -> Iterator[str]:
+        """
+        遍历文件夹，逐个产出支持的图片文件路径
+
+        使用os.scandir遍历，格式根据文件头识别而不是扩展名；
+        以生成器形式返回，调用方可以边遍历边导入。
+
+        Args:
+            folder: 文件夹路径
+            recursive: 是否遍历子文件夹
+            include: 包含的文件通配符列表（如 ["*.jpg", "2023/*"]），为空时包含全部
+            exclude: 排除的文件或文件夹通配符列表
+
+        Yields:
+            图片文件路径
+        """
+        folders = [folder]
+
+        while folders:
+            current = folders.pop()
+            try:
+                with os.scandir(current) as it:
+                    entries = sorted(it, key=lambda e: e.name)
+            except OSError as e:
+                print(f"遍历文件夹失败: {current}, 错误: {str(e)}")
+                continue
+
+            subfolders = []
+            for entry in entries:
+                # 跳过隐藏文件和文件夹
+                if entry.name.startswith('.'):
+                    continue
+
+                relative_path = os.path.relpath(entry.path, folder).replace(os.sep, '/')
+                if exclude and self._match_patterns(entry.name, relative_path, exclude):
+                    continue
+
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            subfolders.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+
+                if include and not self._match_patterns(entry.name, relative_path, include):
+                    continue
+
+                if sniff_image_format(entry.path) in self.supported_formats:
+                    yield entry.path
+
+            # 逆序入栈，保持按名称顺序遍历
+            folders.extend(reversed(subfolders))
+
+    def import_folder(
+        self,
+        folder: str,
+        recursive: bool = True,
+        include: Optional[List[str]] = None,
+        exclude: Optional[List[str]] = None,
+        callback: Optional[Callable[[str, bool], None]] = None
+    ) -> Dict[str, bool]:
+        """
+        导入文件夹中的图片
+
+        Args:
+            folder: 文件夹路径
+            recursive: 是否遍历子文件夹
+            include: 包含的文件通配符列表
+            exclude: 排除的文件或文件夹通配符列表
+            callback: 每导入一张图片后调用，参数为文件路径和是否成功
+
+        Returns:
+            字典，键为文件路径，值为是否成功导入
+        """
+        results = {}
+
+        for file_path in self.scan_folder(folder, recursive, include, exclude):
+            results[file_path] = self.image_storage.load_image(file_path)
+            if callback:
+                callback(file_path, results[file_path])
+
+        return results
+
+    def _match_patterns(self, name: str, relative_path: str, patterns: List[str]) -> bool:
+        """检查文件名或相对路径是否匹配任一通配符"""
+        return any(
+            fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative_path, pattern)
+            for pattern in patterns
+        )
+
     def export_images(
         self, 
         output_folder: str, 
@@ -69,7 +163,12 @@ class FileProcessor:
         quality: int = 90,
         resize_size: Optional[tuple] = None,
         filename_pattern: str = '{original_name}_watermarked',
-        overwrite_existing: bool = False
+        overwrite_existing: bool = False,
+        archive_path: Optional[str] = None,
+        archive_format: Optional[str] = None,
+        duplicates: str = 'export',
+        read_ahead: int = 0,
+        image_paths: Optional[List[str]] = None
     ) -> Dict[str, bool]:
         """
         导出图片
@@ -82,85 +181,368 @@ class FileProcessor:
             resize_size: 调整后的尺寸 (width, height)
             filename_pattern: 文件名模式
             overwrite_existing: 是否覆盖已存在的文件
+            archive_path: 归档文件路径，指定时所有图片直接写入该ZIP/TAR文件，
+                相对路径相对于输出文件夹
+            archive_format: 归档格式，'zip'或'tar'，默认根据archive_path扩展名判断
+            duplicates: 内容重复图片的处理方式，'export'照常导出，'skip'跳过，
+                'link'不重新处理，链接到同内容图片的导出结果
+            read_ahead: 预读窗口，大于0时在后台提前读取后续图片文件的字节，
+                适用于网络存储上的原图
+            image_paths: 要导出的图片路径列表，可通过image_storage.query_image_paths
+                按条件筛选排序，为None时按导入顺序导出所有已加载的图片
 
         Returns:
-            字典，键为原始文件路径，值为是否成功导出
+            字典，键为原始文件路径，值为是否成功导出（跳过的重复图片视为成功）
         """
         # 确保输出文件夹存在
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
 
-        results = {}
+        # 未指定时导出所有已加载的图片
+        if image_paths is None:
+            image_paths = self.image_storage.get_all_image_paths()
+
+        # 按导出顺序预读原始文件，重复的图片只读取一次
+        with self.image_storage.prefetch(
+            [self.image_storage.get_canonical_path(path) for path in image_paths],
+            window=read_ahead
+        ) as prefetched:
+            if archive_path:
+                return self.export_images_to_archive(
+                    image_paths,
+                    os.path.join(output_folder, archive_path),
+                    archive_format=archive_format or get_archive_format(archive_path) or 'zip',
+                    watermark_params=watermark_params,
+                    file_format=file_format,
+                    quality=quality,
+                    resize_size=resize_size,
+                    filename_pattern=filename_pattern,
+                    overwrite_existing=overwrite_existing,
+                    duplicates=duplicates,
+                    prefetched=prefetched
+                )
 
-        # 获取所有已加载的图片
-        image_paths = self.image_storage.get_all_image_paths()
+            results = {}
+            exported = {}  # 代表图片路径 -> 同内容图片的输出文件路径
+
+            for i, image_path in enumerate(image_paths):
+                canonical_path = self.image_storage.get_canonical_path(image_path)
+                if duplicates != 'export' and canonical_path in exported:
+                    if duplicates == 'skip':
+                        results[image_path] = True
+                        continue
+
+                    try:
+                        filename = self.build_filename(image_path, file_format, filename_pattern, i + 1)
+                        output_path = self.get_output_path(output_folder, filename, overwrite_existing)
+                        self.link_file(exported[canonical_path], output_path)
+                        results[image_path] = True
+                        continue
+                    except Exception as e:
+                        # 链接失败时照常导出
+                        print(f"链接重复图片失败: {image_path}, 错误: {str(e)}")
+
+                try:
+                    output_path = self.export_image(
+                        image_path,
+                        output_folder,
+                        watermark_params=watermark_params,
+                        file_format=file_format,
+                        quality=quality,
+                        resize_size=resize_size,
+                        filename_pattern=filename_pattern,
+                        overwrite_existing=overwrite_existing,
+                        index=i + 1,
+                        prefetched=prefetched
+                    )
+                    results[image_path] = output_path is not None
+                    if output_path is not None:
+                        exported.setdefault(canonical_path, output_path)
 
-        for i, image_path in enumerate(image_paths):
-            try:
-                # 获取图片对象
-                image = self.image_storage.get_image(image_path)
-                if image is None:
+                except Exception as e:
+                    print(f"导出图片失败: {image_path}, 错误: {str(e)}")
                     results[image_path] = False
-                    continue
 
-                # 应用水印（如果需要）
-                if watermark_params:
-                    image = self.watermark_processor.apply_watermark(
-                        image, 
-                        watermark_params
-                    )
+            return results
+
+    def export_image(
+        self,
+        image_path: str,
+        output_folder: str,
+        watermark_params: Optional[Dict] = None,
+        file_format: str = 'JPEG',
+        quality: int = 90,
+        resize_size: Optional[tuple] = None,
+        filename_pattern: str = '{original_name}_watermarked',
+        overwrite_existing: bool = False,
+        index: int = 1,
+        prefetched: Optional[ReadAhead] = None
+    ) -> Optional[str]:
+        """
+        导出单张已加载的图片
+
+        Args:
+            image_path: 原始图片路径
+            output_folder: 输出文件夹路径
+            watermark_params: 水印参数
+            file_format: 输出文件格式
+            quality: JPEG质量 (1-100)
+            resize_size: 调整后的尺寸 (width, height)
+            filename_pattern: 文件名模式
+            overwrite_existing: 是否覆盖已存在的文件
+            index: 图片序号，用于文件名模式中的{index}
+            prefetched: export_images中预读原始文件的ReadAhead
 
-                # 调整尺寸（如果需要）
-                if resize_size:
-                    image = self.resize_image(image, resize_size)
+        Returns:
+            输出文件路径，如果图片未加载则返回None
+        """
+        image = self.render_image(image_path, watermark_params, resize_size, prefetched)
+        if image is None:
+            return None
 
-                # 生成文件名
-                original_name = os.path.splitext(os.path.basename(image_path))[0]
-                date_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # 生成文件名
+        filename = self.build_filename(image_path, file_format, filename_pattern, index)
 
-                # 替换文件名模式中的变量
-                filename = filename_pattern.format(
-                    original_name=original_name,
-                    index=i + 1,
-                    date=date_str
-                )
+        # 构建输出路径
+        output_path = self.get_output_path(output_folder, filename, overwrite_existing)
+
+        # 保存图片
+        image.save(output_path, **self.get_save_kwargs(file_format, quality))
+        return output_path
+
+    def get_output_path(self, output_folder: str, filename: str, overwrite_existing: bool = False) -> str:
+        """
+        构建输出文件路径，不覆盖时为已存在的文件名添加序号
+
+        Args:
+            output_folder: 输出文件夹路径
+            filename: 文件名
+            overwrite_existing: 是否覆盖已存在的文件
 
-                # 确保文件名有正确的扩展名
-                if file_format.upper() in self.supported_formats:
-                    ext = self.supported_formats[file_format.upper()][0]
-                    if not filename.lower().endswith(ext.lower()):
-                        filename += ext
-                else:
-                    filename += os.path.splitext(image_path)[1]
-
-                # 构建输出路径
-                output_path = os.path.join(output_folder, filename)
-
-                # 检查文件是否已存在
-                if os.path.exists(output_path) and not overwrite_existing:
-                    # 添加序号避免覆盖
-                    counter = 1
-                    base, ext = os.path.splitext(filename)
-                    while os.path.exists(os.path.join(output_folder, f"{base}_{counter}{ext}")):
-                        counter += 1
-                    filename = f"{base}_{counter}{ext}"
-                    output_path = os.path.join(output_folder, filename)
-
-                # 保存图片
-                save_kwargs = {}
-                if file_format.upper() == 'JPEG':
-                    save_kwargs['quality'] = quality
-                    save_kwargs['optimize'] = True
-
-                image.save(output_path, **save_kwargs)
-                results[image_path] = True
-
-            except Exception as e:
-                print(f"导出图片失败: {image_path}, 错误: {str(e)}")
-                results[image_path] = False
+        Returns:
+            输出文件路径
+        """
+        output_path = os.path.join(output_folder, filename)
+
+        # 检查文件是否已存在
+        if os.path.exists(output_path) and not overwrite_existing:
+            # 添加序号避免覆盖
+            counter = 1
+            base, ext = os.path.splitext(filename)
+            while os.path.exists(os.path.join(output_folder, f"{base}_{counter}{ext}")):
+                counter += 1
+            output_path = os.path.join(output_folder, f"{base}_{counter}{ext}")
+
+        return output_path
+
+    def link_file(self, source_path: str, output_path: str) -> None:
+        """
+        为已导出的文件创建硬链接，文件系统不支持时复制文件
+
+        Args:
+            source_path: 已导出的文件路径
+            output_path: 输出文件路径
+        """
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+        try:
+            os.link(source_path, output_path)
+        except OSError:
+            shutil.copyfile(source_path, output_path)
+
+    def export_images_to_archive(
+        self,
+        image_paths: List[str],
+        archive_path: str,
+        archive_format: str = 'zip',
+        watermark_params: Optional[Dict] = None,
+        file_format: str = 'JPEG',
+        quality: int = 90,
+        resize_size: Optional[tuple] = None,
+        filename_pattern: str = '{original_name}_watermarked',
+        overwrite_existing: bool = False,
+        duplicates: str = 'export',
+        prefetched: Optional[ReadAhead] = None
+    ) -> Dict[str, bool]:
+        """
+        将图片逐张编码并直接写入ZIP/TAR归档
+
+        Args:
+            image_paths: 要导出的图片路径列表
+            archive_path: 归档文件路径
+            archive_format: 归档格式，'zip'或'tar'
+            watermark_params: 水印参数
+            file_format: 输出文件格式
+            quality: JPEG质量 (1-100)
+            resize_size: 调整后的尺寸 (width, height)
+            filename_pattern: 文件名模式
+            overwrite_existing: 是否覆盖已存在的归档文件
+            duplicates: 内容重复图片的处理方式，'export'照常导出，'skip'跳过，
+                'link'写入链接成员（ZIP复制已编码的数据），不重新处理
+            prefetched: export_images中预读原始文件的ReadAhead
+
+        Returns:
+            字典，键为原始文件路径，值为是否成功导出（跳过的重复图片视为成功）
+        """
+        # 检查归档文件是否已存在
+        if os.path.exists(archive_path) and not overwrite_existing:
+            counter = 1
+            base, ext = os.path.splitext(archive_path)
+            while os.path.exists(f"{base}_{counter}{ext}"):
+                counter += 1
+            archive_path = f"{base}_{counter}{ext}"
+
+        results = {}
+        exported = {}  # 代表图片路径 -> 同内容图片的成员名称
+
+        with ArchiveWriter(archive_path, archive_format) as archive:
+            for i, image_path in enumerate(image_paths):
+                filename = self.build_filename(image_path, file_format, filename_pattern, i + 1)
+                canonical_path = self.image_storage.get_canonical_path(image_path)
+                if duplicates != 'export' and canonical_path in exported:
+                    if duplicates == 'skip':
+                        results[image_path] = True
+                        continue
+
+                    try:
+                        archive.add_link(filename, exported[canonical_path])
+                        results[image_path] = True
+                        continue
+                    except Exception as e:
+                        # 链接失败时照常导出
+                        print(f"链接重复图片失败: {image_path}, 错误: {str(e)}")
+
+                try:
+                    image = self.render_image(image_path, watermark_params, resize_size, prefetched)
+                    if image is None:
+                        results[image_path] = False
+                        continue
+
+                    name = archive.add_image(
+                        image,
+                        filename,
+                        self.get_output_format(image_path, file_format),
+                        self.get_save_kwargs(file_format, quality)
+                    )
+                    exported.setdefault(canonical_path, name)
+                    results[image_path] = True
+
+                except Exception as e:
+                    print(f"导出图片失败: {image_path}, 错误: {str(e)}")
+                    results[image_path] = False
 
         return results
 
+    def render_image(
+        self,
+        image_path: str,
+        watermark_params: Optional[Dict] = None,
+        resize_size: Optional[tuple] = None,
+        prefetched: Optional[ReadAhead] = None
+    ) -> Optional[Image.Image]:
+        """
+        获取已加载的图片并应用水印和尺寸调整
+
+        Args:
+            image_path: 原始图片路径
+            watermark_params: 水印参数
+            resize_size: 调整后的尺寸 (width, height)
+            prefetched: 预读原始文件的ReadAhead，解码时优先使用其中的数据
+
+        Returns:
+            处理后的图片对象，如果图片未加载则返回None
+        """
+        # 获取图片对象
+        image = self.image_storage.get_image(image_path, prefetched)
+        if image is None:
+            return None
+
+        # 应用水印（如果需要）
+        if watermark_params:
+            image = self.watermark_processor.apply_watermark(
+                image, 
+                watermark_params
+            )
+
+        # 调整尺寸（如果需要）
+        if resize_size:
+            image = self.resize_image(image, resize_size)
+
+        return image
+
+    def get_output_format(self, image_path: str, file_format: str) -> str:
+        """
+        获取输出图片的格式名称
+
+        Args:
+            image_path: 原始图片路径
+            file_format: 输出文件格式
+
+        Returns:
+            PIL格式名称，不支持的格式沿用原始文件的格式
+        """
+        if file_format.upper() in self.supported_formats:
+            return file_format.upper()
+
+        file_ext = os.path.splitext(image_path)[1].lower()
+        for format_name, extensions in self.supported_formats.items():
+            if file_ext in extensions:
+                return format_name
+        return 'JPEG'
+
+    def build_filename(
+        self,
+        image_path: str,
+        file_format: str,
+        filename_pattern: str = '{original_name}_watermarked',
+        index: int = 1
+    ) -> str:
+        """
+        根据文件名模式生成输出文件名
+
+        Args:
+            image_path: 原始图片路径
+            file_format: 输出文件格式
+            filename_pattern: 文件名模式
+            index: 图片序号
+
+        Returns:
+            带扩展名的输出文件名
+        """
+        original_name = os.path.splitext(os.path.basename(image_path))[0]
+        date_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        # 替换文件名模式中的变量
+        filename = filename_pattern.format(
+            original_name=original_name,
+            index=index,
+            date=date_str
+        )
+
+        # 确保文件名有正确的扩展名
+        if file_format.upper() in self.supported_formats:
+            ext = self.supported_formats[file_format.upper()][0]
+            if not filename.lower().endswith(ext.lower()):
+                filename += ext
+        else:
+            filename += os.path.splitext(image_path)[1]
+
+        return filename
+
+    def get_save_kwargs(self, file_format: str, quality: int = 90) -> Dict:
+        """
+        获取保存图片时使用的参数
+
+        Args:
+            file_format: 输出文件格式
+            quality: JPEG质量 (1-100)
+
+        Returns:
+            传递给Image.save的关键字参数
+        """
+        return get_save_kwargs(file_format, quality)
+
     def resize_image(self, image: Image.Image, size: tuple) -> Image.Image:
         """
         调整图片尺寸
@@ -172,25 +554,28 @@ class FileProcessor:
         Returns:
             调整后的图片对象
         """
-        return image.resize(size, Image.Resampling.LANCZOS)
+        return resize_image(image, size, maintain_aspect=False)
 
     def validate_format(self, file_path: str) -> bool:
         """
         验证文件格式是否支持
 
         Args:
-            file_path: 文件路径
+            file_path: 文件路径或归档成员路径
 
         Returns:
             是否支持该文件格式
         """
+        if is_member_path(file_path):
+            # 归档成员从归档中读取文件头
+            try:
+                with self.image_storage.archive_reader.open(file_path) as source:
+                    return sniff_image_header(source.read(SIGNATURE_LENGTH)) in self.supported_formats
+            except Exception:
+                return False
+
         if not os.path.isfile(file_path):
             return False
 
-        file_ext = os.path.splitext(file_path)[1].lower()
-
-        for extensions in self.supported_formats.values():
-            if file_ext in extensions:
-                return True
-
-        return False
+        # 根据文件头识别格式，扩展名错误或缺失的图片同样可以导入
+        return sniff_image_format(file_path) in self.supported_formats
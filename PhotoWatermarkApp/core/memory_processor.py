@@ -0,0 +1,261 @@
+"""
+内存处理模块
+"""
+
+import io
+from typing import BinaryIO, Dict, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from core.watermark_processor import WatermarkProcessor, PRESET_MARGIN
+from utils.image_utils import OUTPUT_FORMATS, get_save_kwargs, resize_image
+
+
+class MemoryProcessor:
+    """内存处理模块，负责在内存中处理图片数据，不依赖Qt也不读写文件系统"""
+
+    def __init__(self, watermark_processor: Optional[WatermarkProcessor] = None):
+        self.watermark_processor = watermark_processor or WatermarkProcessor()
+
+    def detect_format(self, source: Union[bytes, bytearray, memoryview, BinaryIO]) -> Optional[str]:
+        """
+        只读取文件头，识别图片格式
+
+        Args:
+            source: 图片数据或文件对象
+
+        Returns:
+            PIL格式名称，无法识别时返回None
+        """
+        try:
+            with Image.open(self._as_file(source)) as img:
+                return img.format
+        except Exception:
+            return None
+
+    def load_image(self, source) -> Image.Image:
+        """
+        从字节、文件对象、NumPy数组或PIL图片加载图片
+
+        Args:
+            source: bytes / bytearray / memoryview / 文件对象 / NumPy数组 / PIL图片
+
+        Returns:
+            RGB或RGBA模式的PIL图片对象
+        """
+        if isinstance(source, Image.Image):
+            image = source
+        elif self._is_array(source):
+            return self.array_to_image(source)
+        else:
+            # load()会解码全部像素，之后不再依赖传入的数据
+            image = Image.open(self._as_file(source))
+            image.load()
+
+        # 与ImageStorage保持一致，非RGB/RGBA图片转换为RGB
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        return image
+
+    def process_bytes(
+        self,
+        source: Union[bytes, bytearray, memoryview, BinaryIO],
+        watermark_params: Optional[Dict],
+        file_format: Optional[str] = None,
+        quality: int = 90,
+        resize_size: Optional[tuple] = None
+    ) -> bytes:
+        """
+        为编码后的图片数据添加水印，并返回编码后的结果
+
+        Args:
+            source: 图片数据或文件对象
+            watermark_params: 水印参数
+            file_format: 输出格式，为None时沿用原始格式
+            quality: JPEG质量 (1-100)
+            resize_size: 调整后的尺寸 (width, height)
+
+        Returns:
+            编码后的图片数据
+        """
+        if file_format is None:
+            file_format = self.detect_format(source) or 'JPEG'
+            if hasattr(source, 'seek'):
+                source.seek(0)
+
+        image = self.process_image(self.load_image(source), watermark_params, resize_size)
+        return self.encode_image(image, file_format, quality)
+
+    def process_image(
+        self,
+        image: Image.Image,
+        watermark_params: Optional[Dict],
+        resize_size: Optional[tuple] = None
+    ) -> Image.Image:
+        """
+        为PIL图片添加水印并调整尺寸
+
+        Args:
+            image: PIL图片对象
+            watermark_params: 水印参数
+            resize_size: 调整后的尺寸 (width, height)
+
+        Returns:
+            处理后的图片对象
+        """
+        if watermark_params:
+            image = self.watermark_processor.apply_watermark(image, watermark_params)
+        if resize_size:
+            image = resize_image(image, resize_size, maintain_aspect=False)
+        return image
+
+    def encode_image(self, image: Image.Image, file_format: str = 'JPEG', quality: int = 90) -> bytes:
+        """
+        将图片编码为字节
+
+        Args:
+            image: PIL图片对象
+            file_format: 输出格式
+            quality: JPEG质量 (1-100)
+
+        Returns:
+            编码后的图片数据
+        """
+        file_format = file_format.upper()
+        if file_format not in OUTPUT_FORMATS:
+            file_format = 'JPEG'
+
+        # JPEG和BMP不支持透明通道
+        if file_format in ('JPEG', 'BMP') and image.mode == 'RGBA':
+            image = image.convert('RGB')
+
+        output = io.BytesIO()
+        image.save(output, format=file_format, **get_save_kwargs(file_format, quality))
+        return output.getvalue()
+
+    def process_array(self, array, watermark_params: Optional[Dict], inplace: bool = False):
+        """
+        为NumPy数组表示的图片添加水印
+
+        只混合水印覆盖的区域，inplace为True时直接修改传入的数组，
+        不复制整张图片。
+
+        Args:
+            array: 形状为(高, 宽, 3)或(高, 宽, 4)的uint8数组
+            watermark_params: 水印参数
+            inplace: 是否直接修改传入的数组
+
+        Returns:
+            添加水印后的数组，inplace为True时为传入的数组本身
+        """
+        self._check_array(array)
+        result = array if inplace else array.copy()
+        if not watermark_params:
+            return result
+
+        if inplace and not result.flags.writeable:
+            raise ValueError("数组为只读，无法原地添加水印")
+
+        watermark = self.watermark_processor.get_watermark_layer(watermark_params)
+        if watermark is None:
+            return result
+
+        img_height, img_width = result.shape[:2]
+        pos_x, pos_y = self.watermark_processor.calculate_position(
+            watermark_params['position'],
+            (img_width, img_height),
+            watermark.size,
+            watermark_params.get('margin', PRESET_MARGIN)
+        )
+
+        # 计算水印与图片的重叠区域
+        left, top = max(pos_x, 0), max(pos_y, 0)
+        right = min(pos_x + watermark.width, img_width)
+        bottom = min(pos_y + watermark.height, img_height)
+        if left >= right or top >= bottom:
+            return result
+
+        layer = np.asarray(watermark)[top - pos_y:bottom - pos_y, left - pos_x:right - pos_x]
+        region = result[top:bottom, left:right]
+        channels = region.shape[2]
+
+        # 与Image.paste(watermark, pos, watermark)相同的混合方式
+        alpha = layer[..., 3:4].astype(np.uint16)
+        source = layer[..., :channels].astype(np.uint16)
+        target = region.astype(np.uint16)
+        region[...] = ((source * alpha + target * (255 - alpha) + 127) // 255).astype(np.uint8)
+
+        return result
+
+    def process_array_to_bytes(
+        self,
+        array,
+        watermark_params: Optional[Dict],
+        file_format: str = 'JPEG',
+        quality: int = 90
+    ) -> bytes:
+        """
+        为NumPy数组添加水印并编码为字节
+
+        Args:
+            array: 形状为(高, 宽, 3)或(高, 宽, 4)的uint8数组
+            watermark_params: 水印参数
+            file_format: 输出格式
+            quality: JPEG质量 (1-100)
+
+        Returns:
+            编码后的图片数据
+        """
+        result = self.process_array(array, watermark_params)
+        return self.encode_image(self.array_to_image(result), file_format, quality)
+
+    def array_to_image(self, array) -> Image.Image:
+        """
+        将NumPy数组转换为PIL图片
+
+        C连续的RGBA数组直接共享内存，不复制像素数据，此时返回的图片为只读，
+        修改时PIL会自动复制；PIL内部按每像素4字节存储RGB图片，RGB数组需要复制一次。
+
+        Args:
+            array: 形状为(高, 宽, 3)或(高, 宽, 4)的uint8数组
+
+        Returns:
+            PIL图片对象
+        """
+        self._check_array(array)
+        mode = 'RGB' if array.shape[2] == 3 else 'RGBA'
+        if not array.flags.c_contiguous:
+            array = np.ascontiguousarray(array)
+
+        height, width = array.shape[:2]
+        return Image.frombuffer(mode, (width, height), array, 'raw', mode, 0, 1)
+
+    def image_to_array(self, image: Image.Image):
+        """
+        将PIL图片转换为NumPy数组
+
+        Args:
+            image: PIL图片对象
+
+        Returns:
+            形状为(高, 宽, 3)或(高, 宽, 4)的uint8数组
+        """
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        return np.asarray(image)
+
+    def _check_array(self, array) -> None:
+        """检查数组的形状和类型"""
+        if array.dtype != np.uint8 or array.ndim != 3 or array.shape[2] not in (3, 4):
+            raise ValueError("仅支持形状为(高, 宽, 3)或(高, 宽, 4)的uint8数组")
+
+    def _is_array(self, source) -> bool:
+        """判断是否为NumPy数组"""
+        return isinstance(source, np.ndarray)
+
+    def _as_file(self, source) -> BinaryIO:
+        """将字节数据包装为文件对象"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return io.BytesIO(source)
+        return source
@@ -0,0 +1,319 @@
+"""
+监视文件夹模块
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Optional, Tuple
+
+from core.file_processor import FileProcessor
+
+# inotify为可选依赖，不可用时退回到纯轮询模式
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+    inotify_flags = None
+
+
+class WatchFolder:
+    """监视文件夹模块，负责监视输入目录并为新到达的图片自动添加水印"""
+
+    def __init__(
+        self,
+        input_folder: str,
+        output_folder: str,
+        watermark_params: Optional[Dict] = None,
+        export_options: Optional[Dict] = None,
+        state_file: Optional[str] = None,
+        workers: int = 4,
+        poll_interval: float = 1.0,
+        settle_time: float = 2.0,
+        recursive: bool = False
+    ):
+        """
+        初始化监视文件夹
+
+        Args:
+            input_folder: 监视的输入文件夹
+            output_folder: 输出文件夹
+            watermark_params: 水印参数
+            export_options: 传递给FileProcessor.export_image的导出选项
+            state_file: 记录已处理文件的状态文件路径，默认位于输出文件夹中
+            workers: 工作线程数量
+            poll_interval: 轮询间隔（秒）
+            settle_time: 文件大小保持不变多久后才认为写入完成（秒）
+            recursive: 是否监视子文件夹
+        """
+        self.input_folder = os.path.abspath(input_folder)
+        self.output_folder = os.path.abspath(output_folder)
+        self.watermark_params = watermark_params
+        self.export_options = export_options or {}
+        self.state_file = state_file or os.path.join(self.output_folder, '.watch_state.json')
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.recursive = recursive
+
+        self.processed = {}  # 已处理文件路径 -> {'size', 'mtime', 'output'}
+        self.pending = {}  # 等待写入完成的文件路径 -> (size, mtime, 首次稳定时间)
+        self.in_flight = {}  # 正在处理的文件路径 -> Future
+
+        self._lock = threading.Lock()
+        self._state_dirty = False
+        self._stop_event = threading.Event()
+        self._local = threading.local()
+        self._inotify = None
+        self._watched_dirs = set()
+        self._file_checker = FileProcessor()
+
+    def load_state(self) -> bool:
+        """从状态文件加载已处理的文件记录"""
+        if not os.path.exists(self.state_file):
+            return False
+
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                self.processed = json.load(f).get('processed', {})
+            return True
+        except Exception as e:
+            print(f"加载监视状态失败: {str(e)}")
+            return False
+
+    def save_state(self) -> bool:
+        """保存已处理的文件记录到状态文件"""
+        with self._lock:
+            if not self._state_dirty:
+                return True
+            state = {'processed': dict(self.processed)}
+            self._state_dirty = False
+
+        try:
+            state_dir = os.path.dirname(self.state_file)
+            if state_dir and not os.path.exists(state_dir):
+                os.makedirs(state_dir)
+
+            # 先写入临时文件再替换，避免进程中断时状态文件损坏
+            temp_file = self.state_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=4, ensure_ascii=False)
+            os.replace(temp_file, self.state_file)
+            return True
+        except Exception as e:
+            print(f"保存监视状态失败: {str(e)}")
+            with self._lock:
+                self._state_dirty = True
+            return False
+
+    def run(self) -> None:
+        """运行监视循环，直到调用stop()"""
+        if not os.path.exists(self.output_folder):
+            os.makedirs(self.output_folder)
+
+        self.load_state()
+        self._start_inotify()
+
+        print(f"开始监视文件夹: {self.input_folder}")
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                while not self._stop_event.is_set():
+                    self.poll_once(pool)
+                    self.save_state()
+                    self._wait_for_changes()
+        finally:
+            self.save_state()
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+
+    def stop(self) -> None:
+        """请求停止监视循环"""
+        self._stop_event.set()
+
+    def poll_once(self, pool: ThreadPoolExecutor) -> List[str]:
+        """
+        扫描一次输入文件夹，将已写入完成的新文件提交处理
+
+        Args:
+            pool: 处理图片的线程池
+
+        Returns:
+            本次提交处理的文件路径列表
+        """
+        now = time.monotonic()
+        submitted = []
+        seen = set()
+
+        for file_path, size, mtime in self.scan_files():
+            seen.add(file_path)
+
+            with self._lock:
+                if file_path in self.in_flight:
+                    continue
+                record = self.processed.get(file_path)
+
+            # 文件未发生变化则跳过
+            if record and record.get('size') == size and record.get('mtime') == mtime:
+                self.pending.pop(file_path, None)
+                continue
+
+            # 检查文件大小是否稳定，避免处理仍在写入的文件
+            previous = self.pending.get(file_path)
+            if previous is None or previous[0] != size or previous[1] != mtime:
+                self.pending[file_path] = (size, mtime, now)
+                continue
+
+            if now - previous[2] < self.settle_time:
+                continue
+
+            del self.pending[file_path]
+            future = pool.submit(self.process_file, file_path)
+            with self._lock:
+                self.in_flight[file_path] = future
+            future.add_done_callback(
+                lambda f, path=file_path, stat=(size, mtime): self._on_processed(path, stat, f)
+            )
+            submitted.append(file_path)
+
+        # 清理已被删除的待处理文件
+        for file_path in list(self.pending):
+            if file_path not in seen:
+                del self.pending[file_path]
+
+        return submitted
+
+    def scan_files(self) -> List[Tuple[str, int, float]]:
+        """
+        扫描输入文件夹中支持的图片文件
+
+        Returns:
+            (文件路径, 文件大小, 修改时间) 元组列表
+        """
+        files = []
+        folders = [self.input_folder]
+
+        while folders:
+            folder = folders.pop()
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        # 跳过隐藏文件和临时文件
+                        if entry.name.startswith('.'):
+                            continue
+
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive and entry.path != self.output_folder:
+                                folders.append(entry.path)
+                                self._add_watch(entry.path)
+                            continue
+
+                        if not entry.is_file():
+                            continue
+
+                        file_ext = os.path.splitext(entry.name)[1].lower()
+                        if not any(file_ext in exts for exts in self._file_checker.supported_formats.values()):
+                            continue
+
+                        stat = entry.stat()
+                        files.append((entry.path, stat.st_size, stat.st_mtime))
+            except OSError as e:
+                print(f"扫描文件夹失败: {folder}, 错误: {str(e)}")
+
+        return files
+
+    def process_file(self, file_path: str) -> Optional[str]:
+        """
+        为单个文件添加水印并导出
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            输出文件路径，失败时返回None
+        """
+        # 每个工作线程使用独立的FileProcessor，避免共享图片存储
+        file_processor = getattr(self._local, 'file_processor', None)
+        if file_processor is None:
+            file_processor = FileProcessor()
+            self._local.file_processor = file_processor
+
+        if not file_processor.image_storage.load_image(file_path):
+            return None
+
+        try:
+            output_folder = self.output_folder
+            if self.recursive:
+                # 在输出文件夹中保持输入目录结构
+                relative_dir = os.path.relpath(os.path.dirname(file_path), self.input_folder)
+                output_folder = os.path.normpath(os.path.join(self.output_folder, relative_dir))
+                os.makedirs(output_folder, exist_ok=True)
+
+            return file_processor.export_image(
+                file_path,
+                output_folder,
+                watermark_params=self.watermark_params,
+                **self.export_options
+            )
+        finally:
+            file_processor.image_storage.remove_image(file_path)
+
+    def _on_processed(self, file_path: str, stat: Tuple[int, float], future: Future) -> None:
+        """处理完成回调，记录处理结果"""
+        output_path = None
+        try:
+            output_path = future.result()
+        except Exception as e:
+            print(f"处理图片失败: {file_path}, 错误: {str(e)}")
+
+        with self._lock:
+            self.in_flight.pop(file_path, None)
+            # 失败的文件同样记录，避免反复处理损坏的文件；文件变化后会重新处理
+            self.processed[file_path] = {
+                'size': stat[0],
+                'mtime': stat[1],
+                'output': output_path
+            }
+            self._state_dirty = True
+
+        if output_path:
+            print(f"已处理: {file_path} -> {output_path}")
+
+    def _start_inotify(self) -> None:
+        """在可用时启用inotify，以便新文件到达时立即唤醒"""
+        if INotify is None:
+            return
+
+        try:
+            self._inotify = INotify()
+            self._add_watch(self.input_folder)
+        except OSError as e:
+            print(f"inotify不可用，使用轮询模式: {str(e)}")
+            self._inotify = None
+
+    def _add_watch(self, folder: str) -> None:
+        """为文件夹添加inotify监视"""
+        if self._inotify is None or folder in self._watched_dirs:
+            return
+
+        try:
+            mask = (inotify_flags.CREATE | inotify_flags.CLOSE_WRITE |
+                    inotify_flags.MOVED_TO | inotify_flags.MODIFY)
+            self._inotify.add_watch(folder, mask)
+            self._watched_dirs.add(folder)
+        except OSError as e:
+            print(f"添加inotify监视失败: {folder}, 错误: {str(e)}")
+
+    def _wait_for_changes(self) -> None:
+        """等待下一次扫描，inotify可用时有文件事件会提前返回"""
+        if self._inotify is None:
+            self._stop_event.wait(self.poll_interval)
+            return
+
+        events = self._inotify.read(timeout=int(self.poll_interval * 1000))
+        if events and not self.pending:
+            # 新文件刚出现，稍作等待以便合并同一批写入事件
+            self._stop_event.wait(min(self.poll_interval, 0.1))
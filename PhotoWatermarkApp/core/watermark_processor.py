@@ -6,13 +6,163 @@ from typing import Dict, Optional, Tuple, Union
 from PIL import Image, ImageDraw, ImageFont, ImageColor
 
 import os
+import copy
+import json
+import threading
+from collections import OrderedDict
+
+
+# 预设位置与图片边缘的距离（像素）
+PRESET_MARGIN = 10
 
 
 class WatermarkProcessor:
     """水印处理模块，负责文本和图片水印的生成和应用"""
 
-    def __init__(self):
-        pass
+    def __init__(self, layer_cache_size: int = 32, size_cache_size: int = 256):
+        # 水印图层缓存：参数相同（位置除外）的水印只需生成一次
+        self.layer_cache_size = layer_cache_size
+        self._layer_cache = OrderedDict()
+        self._layer_cache_lock = threading.Lock()
+        # 水印图层尺寸缓存：measure只计算尺寸，无需生成图层
+        self.size_cache_size = size_cache_size
+        self._size_cache = OrderedDict()
+
+    def get_layer_key(self, watermark_params: Dict) -> str:
+        """
+        生成水印图层的缓存键
+
+        水印位置和边距不影响图层内容，因此不参与缓存键；图片水印额外包含
+        水印文件的修改时间，文件被替换后会重新生成。
+
+        Args:
+            watermark_params: 水印参数字典
+
+        Returns:
+            缓存键字符串
+        """
+        key_params = {k: v for k, v in watermark_params.items() if k not in ('position', 'margin')}
+        if key_params.get('type') != 'text':
+            image_path = key_params.get('image')
+            if image_path and os.path.exists(image_path):
+                key_params['_mtime'] = os.path.getmtime(image_path)
+        return json.dumps(key_params, sort_keys=True, default=str, ensure_ascii=False)
+
+    def get_watermark_layer(self, watermark_params: Dict) -> Optional[Image.Image]:
+        """
+        获取水印图层，优先使用缓存
+
+        Args:
+            watermark_params: 水印参数字典
+
+        Returns:
+            RGBA水印图层，创建失败时返回None
+        """
+        key = self.get_layer_key(watermark_params)
+
+        with self._layer_cache_lock:
+            if key in self._layer_cache:
+                self._layer_cache.move_to_end(key)
+                return self._layer_cache[key]
+
+        if watermark_params['type'] == 'text':
+            watermark = self.create_text_watermark(watermark_params)
+        else:  # image watermark
+            watermark = self.create_image_watermark(watermark_params)
+
+        if watermark is not None:
+            # 以实际生成的图层尺寸为准
+            self._put_layer_size(key, watermark.size)
+            if self.layer_cache_size > 0:
+                with self._layer_cache_lock:
+                    self._layer_cache[key] = watermark
+                    while len(self._layer_cache) > self.layer_cache_size:
+                        self._layer_cache.popitem(last=False)
+
+        return watermark
+
+    def clear_layer_cache(self) -> None:
+        """清空水印图层缓存和尺寸缓存"""
+        with self._layer_cache_lock:
+            self._layer_cache.clear()
+            self._size_cache.clear()
+
+    def get_layer_size(self, watermark_params: Dict) -> Optional[Tuple[int, int]]:
+        """
+        获取水印图层的尺寸，优先使用缓存；未缓存时按与生成图层相同的方法计算，不生成图层
+
+        Args:
+            watermark_params: 水印参数字典
+
+        Returns:
+            图层尺寸 (width, height)，水印无效时返回None
+        """
+        key = self.get_layer_key(watermark_params)
+
+        with self._layer_cache_lock:
+            if key in self._layer_cache:
+                return self._layer_cache[key].size
+            if key in self._size_cache:
+                self._size_cache.move_to_end(key)
+                return self._size_cache[key]
+
+        try:
+            if watermark_params['type'] == 'text':
+                font_size = watermark_params.get('font_size', 240)
+                text = self.get_watermark_text(watermark_params)
+                font = self.load_font(text, watermark_params.get('font', 'Arial'), font_size)
+                size = self.measure_text(text, font, font_size)
+            else:
+                image_path = watermark_params.get('image')
+                if not image_path or not os.path.exists(image_path):
+                    return None
+                size = (watermark_params.get('width', 200), watermark_params.get('height', 100))
+        except Exception as e:
+            print(f"计算水印尺寸失败: {str(e)}")
+            return None
+
+        self._put_layer_size(key, size)
+        return size
+
+    def _put_layer_size(self, key: str, size: Tuple[int, int]) -> None:
+        """缓存水印图层的尺寸"""
+        if self.size_cache_size <= 0:
+            return
+        with self._layer_cache_lock:
+            self._size_cache[key] = size
+            self._size_cache.move_to_end(key)
+            while len(self._size_cache) > self.size_cache_size:
+                self._size_cache.popitem(last=False)
+
+    def measure(self, watermark_params: Dict, image_size: Tuple[int, int]) -> Optional[Dict]:
+        """
+        计算水印在图片中的位置和范围，与apply_watermark的结果一致
+
+        图层尺寸按参数缓存，预览的鼠标事件中可频繁调用，无需创建字体或生成图层。
+
+        Args:
+            watermark_params: 水印参数字典
+            image_size: 图片尺寸 (width, height)
+
+        Returns:
+            字典，anchor为水印左上角坐标 (x, y)，size为图层尺寸 (width, height)，
+            box为水印范围 (left, top, right, bottom)；水印无效时返回None
+        """
+        size = self.get_layer_size(watermark_params)
+        if size is None:
+            return None
+
+        pos_x, pos_y = self.calculate_position(
+            watermark_params['position'],
+            image_size,
+            size,
+            watermark_params.get('margin', PRESET_MARGIN)
+        )
+        return {
+            'anchor': (pos_x, pos_y),
+            'size': size,
+            'box': (pos_x, pos_y, pos_x + size[0], pos_y + size[1])
+        }
 
     def apply_watermark(self, image: Image.Image, watermark_params: Dict) -> Image.Image:
         """
@@ -31,10 +181,7 @@ class WatermarkProcessor:
         # 根据水印类型创建水印
         watermark = None
         try:
-            if watermark_params['type'] == 'text':
-                watermark = self.create_text_watermark(watermark_params)
-            else:  # image watermark
-                watermark = self.create_image_watermark(watermark_params)
+            watermark = self.get_watermark_layer(watermark_params)
         except Exception as e:
             print(f"水印创建失败: {str(e)}")
             return result_image  # 返回原始图片副本
@@ -42,30 +189,13 @@ class WatermarkProcessor:
         # 应用水印到图片
         if watermark:
             try:
-                # 获取水印位置
-                position = watermark_params['position']
-
-                # 计算实际位置
-                img_width, img_height = image.size
-                wm_width, wm_height = watermark.size
-
-                if isinstance(position, str):
-                    # 预设位置
-                    if position == 'top-left':
-                        pos_x, pos_y = 10, 10
-                    elif position == 'top-right':
-                        pos_x, pos_y = img_width - wm_width - 10, 10
-                    elif position == 'bottom-left':
-                        pos_x, pos_y = 10, img_height - wm_height - 10
-                    elif position == 'bottom-right':
-                        pos_x, pos_y = img_width - wm_width - 10, img_height - wm_height - 10
-                    elif position == 'center':
-                        pos_x, pos_y = (img_width - wm_width) // 2, (img_height - wm_height) // 2
-                    else:
-                        pos_x, pos_y = 10, 10
-                else:
-                    # 自定义位置
-                    pos_x, pos_y = position
+                # 计算实际位置，与measure使用相同的方法
+                pos_x, pos_y = self.calculate_position(
+                    watermark_params['position'],
+                    image.size,
+                    watermark.size,
+                    watermark_params.get('margin', PRESET_MARGIN)
+                )
 
                 # 合并图像
                 result_image.paste(watermark, (pos_x, pos_y), watermark)
@@ -75,6 +205,220 @@ class WatermarkProcessor:
 
         return result_image
 
+    def calculate_position(
+        self,
+        position: Union[str, Tuple[int, int]],
+        image_size: Tuple[int, int],
+        watermark_size: Tuple[int, int],
+        margin: float = PRESET_MARGIN
+    ) -> Tuple[int, int]:
+        """
+        计算水印左上角在图片中的坐标
+
+        Args:
+            position: 预设位置名称或自定义坐标 (x, y)
+            image_size: 图片尺寸 (width, height)
+            watermark_size: 水印尺寸 (width, height)
+            margin: 预设位置与图片边缘的距离
+
+        Returns:
+            水印左上角坐标 (x, y)
+        """
+        if not isinstance(position, str):
+            # 自定义位置
+            return int(position[0]), int(position[1])
+
+        img_width, img_height = image_size
+        wm_width, wm_height = watermark_size
+
+        margin = int(round(margin))
+
+        # 预设位置
+        if position == 'top-left':
+            return margin, margin
+        elif position == 'top-right':
+            return img_width - wm_width - margin, margin
+        elif position == 'bottom-left':
+            return margin, img_height - wm_height - margin
+        elif position == 'bottom-right':
+            return img_width - wm_width - margin, img_height - wm_height - margin
+        elif position == 'center':
+            return (img_width - wm_width) // 2, (img_height - wm_height) // 2
+        else:
+            return margin, margin
+
+    def scale_params(self, watermark_params: Dict, scale: float) -> Dict:
+        """
+        按比例缩放水印参数，用于在缩小的预览图上渲染与原图效果一致的水印
+
+        字体大小、图片水印尺寸、自定义坐标、预设位置边距以及阴影偏移和描边宽度
+        均按同一比例缩放。
+
+        Args:
+            watermark_params: 水印参数字典
+            scale: 缩放比例（预览图尺寸 / 原图尺寸）
+
+        Returns:
+            缩放后的水印参数字典，比例为1时返回原参数
+        """
+        if scale == 1:
+            return watermark_params
+
+        params = copy.deepcopy(watermark_params)
+
+        if 'font_size' in params:
+            params['font_size'] = max(1, round(params['font_size'] * scale))
+        if params.get('type') != 'text':
+            for key in ('width', 'height'):
+                if key in params:
+                    params[key] = max(1, round(params[key] * scale))
+
+        position = params.get('position')
+        if position is not None and not isinstance(position, str):
+            params['position'] = (round(position[0] * scale), round(position[1] * scale))
+        params['margin'] = params.get('margin', PRESET_MARGIN) * scale
+
+        effects = params.get('effects')
+        if isinstance(effects, dict):
+            shadow = effects.get('shadow')
+            if isinstance(shadow, dict) and 'offset' in shadow:
+                shadow['offset'] = (round(shadow['offset'][0] * scale), round(shadow['offset'][1] * scale))
+            outline = effects.get('outline')
+            if isinstance(outline, dict) and outline.get('width'):
+                outline['width'] = max(1, round(outline['width'] * scale))
+
+        return params
+
+    def get_watermark_text(self, params: Dict) -> str:
+        """
+        获取文本水印的内容，内容为空时使用默认文本
+
+        Args:
+            params: 文本水印参数
+
+        Returns:
+            水印文本
+        """
+        text = params.get('text', '水印')
+        if not text or not text.strip():
+            print("警告: 文本水印内容为空，使用默认文本")
+            text = "水印"
+        return text
+
+    def load_font(self, text: str, font_path: str, font_size: int):
+        """
+        加载水印字体，文本包含中文时使用支持中文的字体，加载失败时依次尝试备用字体
+
+        Args:
+            text: 水印文本
+            font_path: 字体名称或路径
+            font_size: 字体大小
+
+        Returns:
+            PIL字体对象
+        """
+        try:
+            # 检查是否包含中文字符
+            has_chinese = any('一' <= char <= '鿿' for char in text)
+
+            if has_chinese:
+                # 如果包含中文字符，必须使用支持中文的字体
+                # 在Windows系统中，尝试查找常见的中文字体
+                import platform
+                system = platform.system()
+
+                if system == "Windows":
+                    # Windows系统中常见的中文字体路径
+                    chinese_fonts = {
+                        "宋体": "C:/Windows/Fonts/simsun.ttc",
+                        "黑体": "C:/Windows/Fonts/simhei.ttf",
+                        "楷体": "C:/Windows/Fonts/simkai.ttf",
+                        "微软雅黑": "C:/Windows/Fonts/msyh.ttc",
+                        "微软雅黑黑体": "C:/Windows/Fonts/msyhbd.ttc",
+                        "微软雅轻黑": "C:/Windows/Fonts/msyhlt.ttc"
+                    }
+
+                    if font_path in chinese_fonts:
+                        font_path = chinese_fonts[font_path]
+                    else:
+                        # 默认使用宋体
+                        font_path = "C:/Windows/Fonts/simsun.ttc"
+                else:
+                    # 其他系统尝试使用字体名称
+                    pass
+
+                # 尝试加载中文字体
+                font = ImageFont.truetype(font_path, font_size)
+            else:
+                # 如果不包含中文字符，可以使用普通字体
+                if font_path in ["Arial", "Times New Roman", "Helvetica", "Courier"]:
+                    # 使用Pillow内置字体名称
+                    font = ImageFont.truetype(font_path, font_size)
+                else:
+                    # 尝试直接使用字体名称
+                    font = ImageFont.truetype(font_path, font_size)
+
+        except Exception as font_error:
+            print(f"警告: 无法加载字体 {font_path}，使用默认字体: {str(font_error)}")
+            # 尝试加载系统中可能存在的其他中文字体
+            try:
+                # 尝试使用系统中可能存在的其他中文字体
+                fallback_fonts = [
+                    "C:/Windows/Fonts/simsun.ttc",  # Windows宋体
+                    "C:/Windows/Fonts/simhei.ttf",  # Windows黑体
+                    "/System/Library/Fonts/PingFang.ttc",  # macOS
+                    "/System/Library/Fonts/Arial Unicode.ttf",  # macOS
+                    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",  # Linux
+                    "/System/Library/Fonts/STHeiti Light.ttc",  # macOS黑体
+                    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"  # Linux
+                ]
+
+                for fallback_font in fallback_fonts:
+                    try:
+                        font = ImageFont.truetype(fallback_font, font_size)
+                        print(f"成功使用备用字体: {fallback_font}")
+                        break
+                    except:
+                        continue
+                else:
+                    font = ImageFont.load_default()
+            except:
+                font = ImageFont.load_default()
+
+        return font
+
+    def measure_text(self, text: str, font, font_size: int) -> Tuple[int, int]:
+        """
+        计算文本水印图层的尺寸：宽度为文本排版宽度，高度为字体大小
+
+        Args:
+            text: 水印文本
+            font: PIL字体对象
+            font_size: 字体大小
+
+        Returns:
+            图层尺寸 (width, height)
+        """
+        # 获取文本尺寸 (使用新版本Pillow API)
+        draw = ImageDraw.Draw(Image.new('RGBA', (1, 1)))
+        try:
+            # 使用textlength获取文本宽度，更准确
+            text_width = int(draw.textlength(text, font=font))
+            # 使用字体大小作为高度，更可靠
+            text_height = font_size
+        except Exception as bbox_error:
+            print(f"警告: 无法计算文本尺寸，使用默认尺寸: {str(bbox_error)}")
+            text_width = font_size * len(text)
+            text_height = font_size
+
+        # 确保文本尺寸不为0
+        if text_width <= 0 or text_height <= 0:
+            print("警告: 文本尺寸无效，使用默认尺寸")
+            text_width = font_size * len(text)
+            text_height = font_size
+
+        return text_width, text_height
+
     def create_text_watermark(self, params: Dict) -> Optional[Image.Image]:
         """
         创建文本水印
@@ -87,107 +431,16 @@ class WatermarkProcessor:
         """
         try:
             # 获取参数
-            text = params.get('text', '水印')
             font_path = params.get('font', 'Arial')
             font_size = params.get('font_size', 240)
             color = params.get('color', (0, 0, 0))  # RGB颜色
             opacity = params.get('opacity', 0.7)
             effects = params.get('effects', {})
 
-            # 检查文本内容
-            if not text or not text.strip():
-                print("警告: 文本水印内容为空，使用默认文本")
-                text = "水印"
-
-            # 创建透明背景图像
-            dummy_image = Image.new('RGBA', (1, 1))
-            draw = ImageDraw.Draw(dummy_image)
-
-            # 获取字体
-            try:
-                # 检查是否包含中文字符
-                has_chinese = any('一' <= char <= '鿿' for char in text)
-
-                if has_chinese:
-                    # 如果包含中文字符，必须使用支持中文的字体
-                    # 在Windows系统中，尝试查找常见的中文字体
-                    import platform
-                    system = platform.system()
-
-                    if system == "Windows":
-                        # Windows系统中常见的中文字体路径
-                        chinese_fonts = {
-                            "宋体": "C:/Windows/Fonts/simsun.ttc",
-                            "黑体": "C:/Windows/Fonts/simhei.ttf",
-                            "楷体": "C:/Windows/Fonts/simkai.ttf",
-                            "微软雅黑": "C:/Windows/Fonts/msyh.ttc",
-                            "微软雅黑黑体": "C:/Windows/Fonts/msyhbd.ttc",
-                            "微软雅轻黑": "C:/Windows/Fonts/msyhlt.ttc"
-                        }
-
-                        if font_path in chinese_fonts:
-                            font_path = chinese_fonts[font_path]
-                        else:
-                            # 默认使用宋体
-                            font_path = "C:/Windows/Fonts/simsun.ttc"
-                    else:
-                        # 其他系统尝试使用字体名称
-                        pass
-
-                    # 尝试加载中文字体
-                    font = ImageFont.truetype(font_path, font_size)
-                else:
-                    # 如果不包含中文字符，可以使用普通字体
-                    if font_path in ["Arial", "Times New Roman", "Helvetica", "Courier"]:
-                        # 使用Pillow内置字体名称
-                        font = ImageFont.truetype(font_path, font_size)
-                    else:
-                        # 尝试直接使用字体名称
-                        font = ImageFont.truetype(font_path, font_size)
-
-            except Exception as font_error:
-                print(f"警告: 无法加载字体 {font_path}，使用默认字体: {str(font_error)}")
-                # 尝试加载系统中可能存在的其他中文字体
-                try:
-                    # 尝试使用系统中可能存在的其他中文字体
-                    fallback_fonts = [
-                        "C:/Windows/Fonts/simsun.ttc",  # Windows宋体
-                        "C:/Windows/Fonts/simhei.ttf",  # Windows黑体
-                        "/System/Library/Fonts/PingFang.ttc",  # macOS
-                        "/System/Library/Fonts/Arial Unicode.ttf",  # macOS
-                        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",  # Linux
-                        "/System/Library/Fonts/STHeiti Light.ttc",  # macOS黑体
-                        "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"  # Linux
-                    ]
-
-                    for fallback_font in fallback_fonts:
-                        try:
-                            font = ImageFont.truetype(fallback_font, font_size)
-                            print(f"成功使用备用字体: {fallback_font}")
-                            break
-                        except:
-                            continue
-                    else:
-                        font = ImageFont.load_default()
-                except:
-                    font = ImageFont.load_default()
-
-            # 获取文本尺寸 (使用新版本Pillow API)
-            try:
-                # 使用textlength获取文本宽度，更准确
-                text_width = int(draw.textlength(text, font=font))
-                # 使用字体大小作为高度，更可靠
-                text_height = font_size
-            except Exception as bbox_error:
-                print(f"警告: 无法计算文本尺寸，使用默认尺寸: {str(bbox_error)}")
-                text_width = font_size * len(text)
-                text_height = font_size
-
-            # 确保文本尺寸不为0
-            if text_width <= 0 or text_height <= 0:
-                print("警告: 文本尺寸无效，使用默认尺寸")
-                text_width = font_size * len(text)
-                text_height = font_size
+            # 加载字体并计算尺寸，与measure使用相同的方法，保证尺寸一致
+            text = self.get_watermark_text(params)
+            font = self.load_font(text, font_path, font_size)
+            text_width, text_height = self.measure_text(text, font, font_size)
 
             # 创建实际大小的图像
             watermark = Image.new('RGBA', (text_width, text_height), (0, 0, 0, 0))
@@ -278,8 +531,9 @@ class WatermarkProcessor:
             # 加载图片
             watermark = Image.open(image_path)
 
-            # 调整大小
-            watermark = watermark.resize((width, height), Image.Resampling.LANCZOS)
+            # 调整大小，草稿预览使用较快的双线性插值
+            resample = Image.Resampling.BILINEAR if params.get('draft') else Image.Resampling.LANCZOS
+            watermark = watermark.resize((width, height), resample)
 
             # 转换为RGBA模式
             if watermark.mode != 'RGBA':
@@ -324,3 +578,32 @@ class WatermarkProcessor:
                 template[key] = value
 
         return template
+
+    def normalize_params(self, template: Dict) -> Dict:
+        """
+        将从JSON加载的模板转换为水印参数
+
+        JSON不支持元组，颜色、位置和偏移量在模板中保存为列表，
+        这里将它们转换回元组，与界面生成的水印参数保持一致。
+
+        Args:
+            template: 水印模板字典
+
+        Returns:
+            水印参数字典
+        """
+        params = copy.deepcopy(template)
+
+        for key in ('color', 'position'):
+            if isinstance(params.get(key), list):
+                params[key] = tuple(params[key])
+
+        effects = params.get('effects')
+        if isinstance(effects, dict):
+            for effect in effects.values():
+                if isinstance(effect, dict):
+                    for key in ('color', 'offset'):
+                        if isinstance(effect.get(key), list):
+                            effect[key] = tuple(effect[key])
+
+        return params
@@ -0,0 +1,390 @@
+"""
+水印HTTP服务模块
+"""
+
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from core.memory_processor import MemoryProcessor
+from core.watermark_processor import WatermarkProcessor
+from data.template_storage import TemplateStorage
+from utils.image_utils import OUTPUT_FORMATS
+
+
+# 工作进程中的全局处理器，进程存活期间保持水印图层缓存
+_worker_processor = None
+
+
+def _init_worker(warm_params: List[Dict]) -> None:
+    """
+    初始化工作进程，并预先生成常用模板的水印图层
+
+    Args:
+        warm_params: 需要预热的水印参数列表
+    """
+    global _worker_processor
+    _worker_processor = MemoryProcessor()
+
+    for params in warm_params:
+        try:
+            _worker_processor.watermark_processor.get_watermark_layer(params)
+        except Exception as e:
+            print(f"预热水印图层失败: {str(e)}")
+
+
+def _watermark_bytes(data: bytes, watermark_params: Dict, file_format: Optional[str], quality: int) -> Tuple[bytes, str]:
+    """
+    在工作进程中为图片数据添加水印并编码
+
+    Args:
+        data: 原始图片数据
+        watermark_params: 水印参数
+        file_format: 输出格式，为None时沿用原始格式
+        quality: JPEG质量 (1-100)
+
+    Returns:
+        (编码后的图片数据, 输出格式) 元组
+    """
+    if _worker_processor is None:
+        _init_worker([])
+
+    file_format = (file_format or _worker_processor.detect_format(data) or 'JPEG').upper()
+    if file_format not in OUTPUT_FORMATS:
+        file_format = 'JPEG'
+
+    return _worker_processor.process_bytes(data, watermark_params, file_format, quality), file_format
+
+
+class WatermarkService:
+    """水印HTTP服务模块，通过本地HTTP接口为其他工具提供水印处理"""
+
+    CONTENT_TYPES = {
+        'JPEG': 'image/jpeg',
+        'PNG': 'image/png',
+        'BMP': 'image/bmp',
+        'TIFF': 'image/tiff'
+    }
+
+    STATUS_TEXT = {
+        200: 'OK',
+        400: 'Bad Request',
+        404: 'Not Found',
+        405: 'Method Not Allowed',
+        411: 'Length Required',
+        413: 'Payload Too Large',
+        500: 'Internal Server Error',
+        503: 'Service Unavailable'
+    }
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 8765,
+        template_dir: str = 'templates',
+        workers: Optional[int] = None,
+        max_body_size: int = 200 * 1024 * 1024,
+        chunk_size: int = 64 * 1024
+    ):
+        """
+        初始化水印服务
+
+        Args:
+            host: 监听地址，默认只监听本机
+            port: 监听端口，为0时由系统分配
+            template_dir: 模板目录
+            workers: 工作进程数量，默认为CPU核心数
+            max_body_size: 允许上传的最大图片大小（字节）
+            chunk_size: 返回结果时每次写入的数据块大小（字节）
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_body_size = max_body_size
+        self.chunk_size = chunk_size
+        self.template_storage = TemplateStorage(template_dir)
+        self.watermark_processor = WatermarkProcessor()
+
+        self.server = None
+        self.executor = None
+        self.started_at = None
+        self._connections = {}  # 连接的写入流 -> 处理该连接的任务
+        self.metrics = {
+            'requests_total': 0,
+            'requests_in_flight': 0,
+            'images_processed': 0,
+            'errors_total': 0,
+            'bytes_received': 0,
+            'bytes_sent': 0,
+            'processing_seconds_total': 0.0,
+            'responses_by_status': {}
+        }
+
+    async def start(self) -> int:
+        """
+        启动服务
+
+        Returns:
+            实际监听的端口
+        """
+        warm_params = []
+        for name in self.template_storage.list_templates():
+            params = self.load_template_params(name)
+            if params is not None:
+                warm_params.append(params)
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(warm_params,)
+        )
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.started_at = time.time()
+        return self.port
+
+    async def stop(self) -> None:
+        """停止服务并关闭工作进程"""
+        if self.server is not None:
+            self.server.close()
+            # 关闭空闲的长连接，否则服务无法退出
+            tasks = list(self._connections.values())
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.server.wait_closed()
+            self.server = None
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    async def serve_forever(self) -> None:
+        """启动服务并持续运行"""
+        await self.start()
+        print(f"水印服务已启动: http://{self.host}:{self.port}")
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    def load_template_params(self, name: str) -> Optional[Dict]:
+        """
+        加载模板并转换为水印参数
+
+        Args:
+            name: 模板名称
+
+        Returns:
+            水印参数字典，模板不存在时返回None
+        """
+        # 模板名称不允许包含路径，避免读取模板目录以外的文件
+        if not name or os.path.basename(name) != name:
+            return None
+
+        template = self.template_storage.load_template(name)
+        if template is None:
+            return None
+        return self.watermark_processor.normalize_params(template)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理一个客户端连接，支持HTTP/1.1长连接"""
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    header_data = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send_json(writer, 400, {'error': '请求头过大'}, keep_alive=False)
+                    break
+
+                keep_alive = await self.handle_request(header_data, reader, writer)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def handle_request(self, header_data: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        """
+        处理单个HTTP请求
+
+        Returns:
+            是否保持连接
+        """
+        self.metrics['requests_total'] += 1
+        self.metrics['requests_in_flight'] += 1
+        try:
+            try:
+                method, target, version, headers = self.parse_request_head(header_data)
+            except ValueError as e:
+                await self.send_json(writer, 400, {'error': str(e)}, keep_alive=False)
+                return False
+
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+            url = urlsplit(target)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+            # 读取请求体
+            body = b''
+            length = headers.get('content-length')
+            if length is not None:
+                try:
+                    length = int(length)
+                except ValueError:
+                    await self.send_json(writer, 400, {'error': '无效的Content-Length'}, keep_alive=False)
+                    return False
+                if length > self.max_body_size:
+                    await self.send_json(writer, 413, {'error': '图片过大'}, keep_alive=False)
+                    return False
+                body = await reader.readexactly(length)
+                self.metrics['bytes_received'] += length
+
+            if url.path == '/health':
+                if method != 'GET':
+                    await self.send_json(writer, 405, {'error': '仅支持GET'}, keep_alive)
+                    return keep_alive
+                await self.send_json(writer, 200, self.get_health(), keep_alive)
+            elif url.path == '/metrics':
+                if method != 'GET':
+                    await self.send_json(writer, 405, {'error': '仅支持GET'}, keep_alive)
+                    return keep_alive
+                await self.send_json(writer, 200, self.get_metrics(), keep_alive)
+            elif url.path == '/watermark':
+                if method != 'POST':
+                    await self.send_json(writer, 405, {'error': '仅支持POST'}, keep_alive)
+                    return keep_alive
+                if length is None:
+                    await self.send_json(writer, 411, {'error': '需要Content-Length'}, keep_alive=False)
+                    return False
+                await self.handle_watermark(query, body, writer, keep_alive)
+            else:
+                await self.send_json(writer, 404, {'error': f'未知路径: {url.path}'}, keep_alive)
+
+            return keep_alive
+        finally:
+            self.metrics['requests_in_flight'] -= 1
+
+    async def handle_watermark(self, query: Dict[str, str], body: bytes, writer: asyncio.StreamWriter, keep_alive: bool) -> None:
+        """处理水印请求：/watermark?template=名称&format=JPEG&quality=90"""
+        if not body:
+            await self.send_json(writer, 400, {'error': '请求体为空'}, keep_alive)
+            return
+
+        template_name = query.get('template', '')
+        watermark_params = self.load_template_params(template_name)
+        if watermark_params is None:
+            await self.send_json(writer, 404, {'error': f'模板不存在: {template_name}'}, keep_alive)
+            return
+
+        try:
+            quality = int(query.get('quality', 90))
+        except ValueError:
+            await self.send_json(writer, 400, {'error': '无效的quality参数'}, keep_alive)
+            return
+
+        start_time = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            data, file_format = await loop.run_in_executor(
+                self.executor,
+                _watermark_bytes,
+                body,
+                watermark_params,
+                query.get('format'),
+                max(1, min(quality, 100))
+            )
+        except Exception as e:
+            await self.send_json(writer, 500, {'error': f'处理图片失败: {str(e)}'}, keep_alive)
+            return
+        finally:
+            self.metrics['processing_seconds_total'] += time.perf_counter() - start_time
+
+        self.metrics['images_processed'] += 1
+
+        # 分块写出结果，等待缓冲区排空后再写下一块
+        self.write_head(writer, 200, self.CONTENT_TYPES.get(file_format, 'application/octet-stream'), len(data), keep_alive)
+        view = memoryview(data)
+        for offset in range(0, len(data), self.chunk_size):
+            writer.write(view[offset:offset + self.chunk_size])
+            await writer.drain()
+        self.metrics['bytes_sent'] += len(data)
+
+    def parse_request_head(self, header_data: bytes) -> Tuple[str, str, str, Dict[str, str]]:
+        """
+        解析请求行和请求头
+
+        Returns:
+            (方法, 请求目标, HTTP版本, 请求头字典) 元组，请求头名称为小写
+        """
+        lines = header_data.decode('latin-1').split('\r\n')
+        parts = lines[0].split()
+        if len(parts) != 3:
+            raise ValueError('无效的请求行')
+
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(':')
+            if not sep:
+                raise ValueError('无效的请求头')
+            headers[name.strip().lower()] = value.strip()
+
+        return parts[0].upper(), parts[1], parts[2], headers
+
+    def write_head(self, writer: asyncio.StreamWriter, status: int, content_type: str, length: int, keep_alive: bool) -> None:
+        """写出响应行和响应头"""
+        counts = self.metrics['responses_by_status']
+        counts[str(status)] = counts.get(str(status), 0) + 1
+        if status >= 400:
+            self.metrics['errors_total'] += 1
+
+        head = (
+            f"HTTP/1.1 {status} {self.STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {length}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode('latin-1'))
+
+    async def send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict, keep_alive: bool = True) -> None:
+        """发送JSON响应"""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.write_head(writer, status, 'application/json; charset=utf-8', len(body), keep_alive)
+        writer.write(body)
+        await writer.drain()
+        self.metrics['bytes_sent'] += len(body)
+
+    def get_health(self) -> Dict:
+        """获取服务健康状态"""
+        return {
+            'status': 'ok' if self.executor is not None else 'stopped',
+            'workers': self.workers,
+            'templates': self.template_storage.list_templates()
+        }
+
+    def get_metrics(self) -> Dict:
+        """获取服务统计指标"""
+        metrics = dict(self.metrics)
+        metrics['responses_by_status'] = dict(self.metrics['responses_by_status'])
+        metrics['uptime_seconds'] = time.time() - self.started_at if self.started_at else 0.0
+        processed = metrics['images_processed']
+        metrics['average_processing_seconds'] = (
+            metrics['processing_seconds_total'] / processed if processed else 0.0
+        )
+        return metrics
@@ -0,0 +1,233 @@
+"""
+图片缓存模块
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+
+from PIL import Image
+
+
+# 默认内存预算：1GB
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+
+
+class ImageCache:
+    """图片缓存模块，按内存预算缓存已解码的图片，超出预算时淘汰最久未使用的图片
+
+    所有方法均为线程安全，淘汰回调在释放锁之后调用。
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_CACHE_BYTES,
+        on_evict: Optional[Callable[[Hashable, Image.Image], None]] = None
+    ):
+        """
+        初始化图片缓存
+
+        Args:
+            max_bytes: 内存预算（字节），按 宽 × 高 × 通道数 计算
+            on_evict: 图片被淘汰时的回调，参数为缓存键和图片对象
+        """
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # 缓存键 -> (图片对象, 占用字节数)，按最近使用排序
+        self._pins = {}  # 缓存键 -> 固定次数，固定的图片不会被淘汰
+        self._lock = threading.RLock()
+
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def image_nbytes(image: Image.Image) -> int:
+        """
+        计算图片像素占用的字节数
+
+        Args:
+            image: PIL图片对象
+
+        Returns:
+            宽 × 高 × 通道数
+        """
+        return image.width * image.height * len(image.getbands())
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def keys(self) -> List[Hashable]:
+        """获取所有缓存键，按最近使用排序"""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def get(self, key: Hashable) -> Optional[Image.Image]:
+        """
+        获取缓存的图片，并标记为最近使用
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            PIL图片对象，未缓存时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, image: Image.Image) -> None:
+        """
+        缓存图片，必要时淘汰最久未使用的图片
+
+        Args:
+            key: 缓存键
+            image: PIL图片对象
+        """
+        nbytes = self.image_nbytes(image)
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.resident_bytes -= old_entry[1]
+
+            self._entries[key] = (image, nbytes)
+            self.resident_bytes += nbytes
+            evicted = self._evict()
+        self._notify_evicted(evicted)
+
+    def remove(self, key: Hashable) -> bool:
+        """
+        移除缓存的图片，不触发淘汰回调
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            是否移除成功
+        """
+        with self._lock:
+            self._pins.pop(key, None)
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False
+
+            self.resident_bytes -= entry[1]
+            return True
+
+    def clear(self) -> None:
+        """清空缓存和固定标记"""
+        with self._lock:
+            self._entries.clear()
+            self._pins.clear()
+            self.resident_bytes = 0
+
+    def pin(self, key: Hashable) -> None:
+        """
+        固定图片，使其不会被淘汰（如当前选中或正在预览的图片）
+
+        可以在图片缓存之前固定；多次固定需要对应次数的取消固定。
+
+        Args:
+            key: 缓存键
+        """
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, key: Hashable) -> None:
+        """
+        取消固定图片
+
+        Args:
+            key: 缓存键
+        """
+        evicted = []
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+                evicted = self._evict()
+        self._notify_evicted(evicted)
+
+    def is_pinned(self, key: Hashable) -> bool:
+        """检查图片是否被固定"""
+        with self._lock:
+            return key in self._pins
+
+    def set_max_bytes(self, max_bytes: int) -> None:
+        """
+        修改内存预算，立即淘汰超出预算的图片
+
+        Args:
+            max_bytes: 内存预算（字节）
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            evicted = self._evict()
+        self._notify_evicted(evicted)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            包含命中、未命中、淘汰次数和当前占用字节数的字典
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'resident_bytes': self.resident_bytes,
+                'max_bytes': self.max_bytes,
+                'entries': len(self._entries),
+                'pinned': len(self._pins)
+            }
+
+    def _evict(self) -> list:
+        """
+        按最久未使用顺序淘汰图片，直到占用不超过预算，跳过固定的图片；需在持有锁时调用
+
+        Returns:
+            被淘汰的(缓存键, 图片对象)列表
+        """
+        evicted = []
+        if self.resident_bytes <= self.max_bytes:
+            return evicted
+
+        for key in list(self._entries.keys()):
+            if self.resident_bytes <= self.max_bytes:
+                break
+            if key in self._pins:
+                continue
+
+            image, nbytes = self._entries.pop(key)
+            self.resident_bytes -= nbytes
+            self.evictions += 1
+            evicted.append((key, image))
+
+        return evicted
+
+    def _notify_evicted(self, evicted: list) -> None:
+        """在释放锁之后调用淘汰回调，回调中的耗时操作（如写入磁盘）不会阻塞其他线程"""
+        if self.on_evict is None:
+            return
+
+        for key, image in evicted:
+            try:
+                self.on_evict(key, image)
+            except Exception as e:
+                print(f"图片淘汰回调失败: {key}, 错误: {str(e)}")
@@ -0,0 +1,447 @@
+"""
+图片目录模块
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+from utils.archive_utils import ArchiveReader, stat_source
+from utils.image_utils import sniff_image_header, SIGNATURE_LENGTH, compute_quick_hash, read_exif_metadata
+
+
+# 目录表结构，各排序字段与id组成联合索引，排序分页时无需全表排序
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    width INTEGER,
+    height INTEGER,
+    pixels INTEGER,
+    format TEXT,
+    taken_at TEXT,
+    camera TEXT,
+    content_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_images_name ON images (name COLLATE NOCASE, id);
+CREATE INDEX IF NOT EXISTS idx_images_size ON images (size, id);
+CREATE INDEX IF NOT EXISTS idx_images_mtime ON images (mtime, id);
+CREATE INDEX IF NOT EXISTS idx_images_pixels ON images (pixels, id);
+CREATE INDEX IF NOT EXISTS idx_images_taken_at ON images (taken_at, id);
+CREATE INDEX IF NOT EXISTS idx_images_camera ON images (camera, taken_at);
+CREATE INDEX IF NOT EXISTS idx_images_content_hash ON images (content_hash);
+"""
+
+# 目录记录的字段
+CATALOG_COLUMNS = (
+    'path', 'name', 'size', 'mtime', 'width', 'height', 'pixels',
+    'format', 'taken_at', 'camera', 'content_hash'
+)
+
+# 排序方式 -> 排序表达式
+SORT_COLUMNS = {
+    'imported': 'id',
+    'name': 'name COLLATE NOCASE',
+    'size': 'size',
+    'mtime': 'mtime',
+    'pixels': 'pixels',
+    'taken_at': 'taken_at'
+}
+
+# 默认批量写入的记录数
+DEFAULT_BATCH_SIZE = 500
+
+
+class ImageCatalog:
+    """图片目录模块，使用SQLite保存图片的文件信息、尺寸、格式、EXIF拍摄时间和相机型号，
+    支持按索引排序、筛选和分页查询，图片数量很多时无需遍历内存中的字典
+
+    所有方法均为线程安全；写入先放入缓冲区，达到批量大小或查询前统一提交。
+    """
+
+    def __init__(self, db_path: str = ':memory:', batch_size: int = DEFAULT_BATCH_SIZE):
+        """
+        初始化图片目录
+
+        Args:
+            db_path: 数据库文件路径，默认保存在内存中；指定文件时可跨会话保留
+            batch_size: 批量写入的记录数
+        """
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.archive_reader = ArchiveReader()  # 读取ZIP归档成员
+
+        self._lock = threading.RLock()  # 保护数据库连接和写入缓冲区
+        self._pending = []  # 尚未提交的记录
+
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if db_path != ':memory:':
+            # WAL模式下读取不阻塞写入
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(CATALOG_SCHEMA)
+
+    @staticmethod
+    def describe(
+        file_path: str,
+        source: BinaryIO,
+        img: Image.Image,
+        content_hash: Optional[str] = None
+    ) -> Dict:
+        """
+        根据已打开的图片生成目录记录，只读取文件头
+
+        Args:
+            file_path: 图片文件路径或归档成员路径
+            source: 图片的文件对象，用于获取文件大小
+            img: 已打开的PIL图片对象
+            content_hash: 快速内容哈希
+
+        Returns:
+            目录记录字典，字段见CATALOG_COLUMNS，另含不写入目录的色彩模式mode；
+            归档成员的修改时间为所在归档的修改时间
+        """
+        record = {
+            'path': file_path,
+            'name': os.path.basename(file_path),
+            'size': None,
+            'mtime': None,
+            'width': img.width,
+            'height': img.height,
+            'pixels': img.width * img.height,
+            'format': img.format,
+            'mode': img.mode,
+            'content_hash': content_hash
+        }
+        record.update(read_exif_metadata(img))
+
+        try:
+            record['mtime'] = stat_source(file_path).st_mtime
+            record['size'] = source.seek(0, os.SEEK_END)
+        except (OSError, ValueError):
+            pass
+        return record
+
+    def probe_file(self, file_path: str) -> Optional[Dict]:
+        """
+        读取图片文件头并生成目录记录
+
+        Args:
+            file_path: 图片文件路径或归档成员路径
+
+        Returns:
+            目录记录字典，不是支持的图片或读取失败时返回None
+        """
+        try:
+            with self.archive_reader.open(file_path) as source:
+                if sniff_image_header(source.read(SIGNATURE_LENGTH)) is None:
+                    return None
+                source.seek(0)
+
+                content_hash = compute_quick_hash(source)
+                with Image.open(source) as img:
+                    return self.describe(file_path, source, img, content_hash)
+
+        except Exception as e:
+            print(f"读取图片信息失败: {file_path}, 错误: {str(e)}")
+            return None
+
+    def import_files(
+        self,
+        file_paths: Iterable[str],
+        workers: int = 4,
+        callback: Optional[Callable[[str, Optional[Dict]], None]] = None
+    ) -> int:
+        """
+        使用线程池并发读取文件头并写入目录，修改时间未变的已有记录不重新读取
+
+        Args:
+            file_paths: 图片文件路径列表，重复的路径只读取一次
+            workers: 读取线程数
+            callback: 每张图片处理完成时的回调，参数为图片路径和目录记录（失败时为None），
+                按输入顺序在调用线程中调用；未重新读取的记录来自目录，不含mode
+
+        Returns:
+            目录中新增或更新的记录数
+        """
+        file_paths = list(OrderedDict.fromkeys(file_paths))
+        known = self._get_mtimes(file_paths)
+        updated = 0
+
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='ImageCatalog') as executor:
+            results = executor.map(lambda path: self._probe_changed(path, known.get(path)), file_paths)
+            for file_path, (success, record) in zip(file_paths, results):
+                if record is not None:
+                    self.add(record)
+                    updated += 1
+                if callback is not None:
+                    if success and record is None:
+                        record = self.get(file_path)
+                    try:
+                        callback(file_path, record)
+                    except Exception as e:
+                        print(f"导入回调执行失败: {file_path}, 错误: {str(e)}")
+
+        self.flush()
+        return updated
+
+    def _probe_changed(self, file_path: str, known_mtime: Optional[float]) -> Tuple[bool, Optional[Dict]]:
+        """读取修改时间有变化的图片的文件头，返回是否成功和新记录（未变化时为None）"""
+        if known_mtime is not None:
+            try:
+                if stat_source(file_path).st_mtime == known_mtime:
+                    return True, None
+            except OSError:
+                return False, None
+
+        record = self.probe_file(file_path)
+        return record is not None, record
+
+    def _get_mtimes(self, file_paths: List[str]) -> Dict[str, float]:
+        """查询已有记录的修改时间"""
+        mtimes = {}
+        with self._lock:
+            self._flush()
+            # 分批查询，避免超出SQLite的参数数量限制
+            for start in range(0, len(file_paths), self.batch_size):
+                chunk = file_paths[start:start + self.batch_size]
+                rows = self._conn.execute(
+                    f"SELECT path, mtime FROM images WHERE path IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+                mtimes.update((row['path'], row['mtime']) for row in rows)
+        return mtimes
+
+    def add(self, record: Dict) -> None:
+        """
+        添加或更新目录记录，记录先放入缓冲区，达到批量大小时提交
+
+        Args:
+            record: 目录记录字典，由describe或probe_file生成
+        """
+        with self._lock:
+            self._pending.append(tuple(record.get(column) for column in CATALOG_COLUMNS))
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def flush(self) -> None:
+        """提交缓冲区中的记录"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        """提交缓冲区中的记录；需在持有锁时调用"""
+        if not self._pending:
+            return
+
+        updates = ', '.join(f"{column} = excluded.{column}" for column in CATALOG_COLUMNS[1:])
+        try:
+            # 路径已存在时更新记录，保留原有id（即导入顺序）
+            self._conn.executemany(
+                f"INSERT INTO images ({', '.join(CATALOG_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(CATALOG_COLUMNS))}) "
+                f"ON CONFLICT(path) DO UPDATE SET {updates}",
+                self._pending
+            )
+            self._conn.commit()
+        except Exception as e:
+            print(f"写入图片目录失败: {str(e)}")
+            self._conn.rollback()
+        self._pending = []
+
+    def remove(self, file_path: str) -> bool:
+        """
+        删除目录记录
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            是否删除了记录
+        """
+        with self._lock:
+            self._flush()
+            cursor = self._conn.execute("DELETE FROM images WHERE path = ?", (file_path,))
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    def clear(self) -> None:
+        """删除所有目录记录"""
+        with self._lock:
+            self._pending = []
+            self._conn.execute("DELETE FROM images")
+            self._conn.commit()
+
+    def close(self) -> None:
+        """提交缓冲区中的记录并关闭数据库"""
+        with self._lock:
+            self._flush()
+            self._conn.close()
+        self.archive_reader.close()
+
+    def get(self, file_path: str) -> Optional[Dict]:
+        """
+        获取图片的目录记录
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            目录记录字典，不存在时返回None
+        """
+        with self._lock:
+            self._flush()
+            row = self._conn.execute("SELECT * FROM images WHERE path = ?", (file_path,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def query(
+        self,
+        order_by: str = 'imported',
+        descending: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        **filters
+    ) -> List[Dict]:
+        """
+        按条件筛选、排序并分页查询目录记录
+
+        Args:
+            order_by: 排序方式，'imported'导入顺序，'name'文件名，'size'文件大小，
+                'mtime'修改时间，'pixels'像素数，'taken_at'拍摄时间；值相同时按导入顺序
+            descending: 是否降序
+            offset: 跳过的记录数
+            limit: 最多返回的记录数，为None时返回全部
+            **filters: 筛选条件，值为None时忽略：
+                name 文件名包含的文本（不区分大小写），camera 相机型号，format 图片格式，
+                taken_from/taken_to 拍摄时间范围（YYYY-MM-DD[ HH:MM:SS]，包含两端），
+                min_size/max_size 文件大小范围（字节），min_width/min_height 最小宽高，
+                content_hash 快速内容哈希
+
+        Returns:
+            目录记录字典列表
+        """
+        return [dict(row) for row in self._select('*', order_by, descending, offset, limit, filters)]
+
+    def get_paths(
+        self,
+        order_by: str = 'imported',
+        descending: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        **filters
+    ) -> List[str]:
+        """
+        按条件筛选、排序并分页查询图片路径，参数同query
+
+        Returns:
+            图片路径列表
+        """
+        return [row['path'] for row in self._select('path', order_by, descending, offset, limit, filters)]
+
+    def count(self, **filters) -> int:
+        """
+        统计符合条件的图片数量
+
+        Args:
+            **filters: 筛选条件，同query
+
+        Returns:
+            图片数量
+        """
+        where, params = self._build_where(filters)
+        with self._lock:
+            self._flush()
+            return self._conn.execute(f"SELECT COUNT(*) FROM images{where}", params).fetchone()[0]
+
+    def get_cameras(self) -> List[str]:
+        """
+        获取目录中出现过的相机型号
+
+        Returns:
+            按名称排序的相机型号列表
+        """
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(
+                "SELECT DISTINCT camera FROM images WHERE camera IS NOT NULL ORDER BY camera"
+            ).fetchall()
+        return [row['camera'] for row in rows]
+
+    def _select(
+        self,
+        columns: str,
+        order_by: str,
+        descending: bool,
+        offset: int,
+        limit: Optional[int],
+        filters: Dict
+    ) -> List[sqlite3.Row]:
+        """执行筛选、排序和分页查询"""
+        if order_by not in SORT_COLUMNS:
+            raise ValueError(f"不支持的排序方式: {order_by}")
+
+        direction = ' DESC' if descending else ''
+        where, params = self._build_where(filters)
+        sql = (
+            f"SELECT {columns} FROM images{where} "
+            f"ORDER BY {SORT_COLUMNS[order_by]}{direction}, id{direction} "
+            f"LIMIT ? OFFSET ?"
+        )
+        params.extend([-1 if limit is None else limit, max(0, offset)])
+
+        with self._lock:
+            self._flush()
+            return self._conn.execute(sql, params).fetchall()
+
+    def _build_where(self, filters: Dict) -> Tuple[str, list]:
+        """根据筛选条件生成WHERE子句和参数"""
+        conditions = []
+        params = []
+
+        for key, value in filters.items():
+            if value is None or value == '':
+                continue
+
+            if key == 'name':
+                # 转义LIKE通配符，按普通文本匹配
+                escaped = str(value).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                conditions.append("name LIKE ? ESCAPE '\\'")
+                params.append(f"%{escaped}%")
+            elif key in ('camera', 'format', 'content_hash'):
+                conditions.append(f"{key} = ?")
+                params.append(value)
+            elif key == 'taken_from':
+                conditions.append("taken_at >= ?")
+                params.append(value)
+            elif key == 'taken_to':
+                # 只指定日期时包含当天
+                conditions.append("taken_at <= ?")
+                params.append(value + ' 23:59:59' if len(value) == 10 else value)
+            elif key == 'min_size':
+                conditions.append("size >= ?")
+                params.append(value)
+            elif key == 'max_size':
+                conditions.append("size <= ?")
+                params.append(value)
+            elif key == 'min_width':
+                conditions.append("width >= ?")
+                params.append(value)
+            elif key == 'min_height':
+                conditions.append("height >= ?")
+                params.append(value)
+            else:
+                raise ValueError(f"不支持的筛选条件: {key}")
+
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        return where, params
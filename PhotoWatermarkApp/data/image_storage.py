@@ -2,24 +2,82 @@
 图片存储模块
 """
 
+import io
 import os
-from typing import Dict, List, Optional
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional
 from PIL import Image, ImageFile
 
+from data.image_cache import ImageCache, DEFAULT_CACHE_BYTES
+from data.image_catalog import ImageCatalog
+from data.pixel_cache import PixelCache, DEFAULT_SPILL_BYTES
+from data.read_ahead import ReadAhead, DEFAULT_READ_AHEAD_BYTES
+from utils.archive_utils import ArchiveReader, get_archive_format
+from utils.image_utils import sniff_image_header, SIGNATURE_LENGTH, compute_quick_hash, compute_file_hash
+
 # 允许加载截断的图像文件
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
+# 预览金字塔各层级的长边尺寸（像素）
+PREVIEW_LEVELS = (256, 1024, 2048)
+
 
 class ImageStorage:
-    """图片存储模块，负责图片文件的加载和管理"""
+    """图片存储模块，负责图片文件的加载和管理
+
+    所有方法均为线程安全；同一图片同时被多个线程加载或解码时只执行一次，
+    其他线程等待并共享结果。启用去重时（默认关闭），内容相同的文件只保留一份解码后的图片。
+    """
+
+    def __init__(
+        self,
+        lazy: bool = False,
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+        spill: bool = False,
+        spill_dir: Optional[str] = None,
+        spill_bytes: int = DEFAULT_SPILL_BYTES,
+        dedupe: bool = False,
+        catalog: Optional[ImageCatalog] = None
+    ):
+        """
+        初始化图片存储
 
-    def __init__(self):
-        self.images = {}  # 存储图片路径和图片对象的映射
+        Args:
+            lazy: 是否启用延迟加载。启用后导入时只读取文件头，
+                首次获取图片时才解码像素
+            cache_bytes: 已解码图片的内存预算（字节），超出时淘汰最久未使用的图片，
+                被淘汰的图片在下次获取时重新解码
+            spill: 是否将被淘汰的图片写入磁盘像素缓存，再次获取时通过内存映射读回，无需重新解码
+            spill_dir: 磁盘像素缓存目录，为None时使用默认目录
+            spill_bytes: 磁盘像素缓存的预算（字节）
+            dedupe: 是否按文件内容去重。导入时计算快速内容哈希，哈希相同时用完整哈希确认，
+                重复的图片与首次导入的图片共享解码结果
+            catalog: 图片目录，用于按拍摄时间、相机等排序筛选和分页查询；为None时导入不读取EXIF，
+                只支持按导入顺序查询
+        """
+        self.lazy = lazy
+        self.dedupe = dedupe
+        self.spill = PixelCache(spill_dir, spill_bytes) if spill else None
+        # 已解码图片的缓存，键为图片路径，预览图的键为(图片路径, 层级)
+        self.images = ImageCache(cache_bytes, on_evict=self.on_image_evicted if spill else None)
+        self.image_info = {}  # 存储图片路径和文件头信息的映射，保持导入顺序
         self.supported_formats = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.tif']
 
+        self._lock = threading.RLock()  # 保护image_info和进行中的任务表
+        self._loading = {}  # 图片路径 -> 进行中的加载任务
+        self._decoding = {}  # 缓存键 -> 进行中的解码任务
+        self.archive_reader = ArchiveReader()  # 读取ZIP归档成员（路径形如 shoot.zip!/day1/img.jpg）
+        self._content_index = {}  # 快速内容哈希 -> 内容各不相同的代表图片路径列表
+        self._file_hashes = {}  # 图片路径 -> 完整内容哈希，仅在快速哈希冲突时计算
+        # 本次会话已导入图片的目录，用于按拍摄时间、相机等排序筛选和分页查询
+        self.catalog = catalog
+
     def load_image(self, file_path: str) -> bool:
         """
-        加载图片文件
+        加载图片文件，同一图片正在加载时等待并共享其结果
 
         Args:
             file_path: 图片文件路径
@@ -27,41 +85,563 @@ class ImageStorage:
         Returns:
             是否成功加载
         """
+        return self._run_once(self._loading, file_path, lambda: self._load_image(file_path))
+
+    def import_files(
+        self,
+        file_paths: Iterable[str],
+        workers: int = 4,
+        callback: Optional[Callable[[str, bool], None]] = None
+    ) -> List[str]:
+        """
+        导入多张图片：由图片目录的ImageCatalog.import_files并发读取文件头和EXIF并写入目录，
+        再根据目录记录登记到图片存储，不重复读取文件；没有图片目录时逐张加载
+
+        Args:
+            file_paths: 图片文件路径列表
+            workers: 读取文件头的线程数
+            callback: 每张图片处理完成时的回调，参数为图片路径和是否成功，按输入顺序在调用线程中调用
+
+        Returns:
+            成功导入的图片路径列表
+        """
+        file_paths = list(OrderedDict.fromkeys(file_paths))
+        if self.catalog is None:
+            results = [(file_path, self.load_image(file_path)) for file_path in file_paths]
+        else:
+            probed = []
+            self.catalog.import_files(
+                file_paths, workers, callback=lambda file_path, record: probed.append((file_path, record))
+            )
+            results = []
+            for file_path, record in probed:
+                success = record is not None and self._run_once(
+                    self._loading, file_path, lambda path=file_path, record=record: self._add_record(path, record)
+                )
+                if record is not None and not success:
+                    self.catalog.remove(file_path)
+                results.append((file_path, success))
+
+        loaded = []
+        for file_path, success in results:
+            if success:
+                loaded.append(file_path)
+            if callback is not None:
+                try:
+                    callback(file_path, success)
+                except Exception as e:
+                    print(f"导入回调执行失败: {file_path}, 错误: {str(e)}")
+        return loaded
+
+    def load_images(
+        self,
+        file_paths: Iterable[str],
+        workers: int = 4,
+        callback: Optional[Callable[[str, bool], None]] = None
+    ) -> Dict[str, Future]:
+        """
+        使用线程池并发加载多张图片
+
+        Args:
+            file_paths: 图片文件路径列表，重复的路径只加载一次
+            workers: 工作线程数
+            callback: 每张图片加载完成时的回调，参数为图片路径和是否成功，在工作线程中调用
+
+        Returns:
+            字典，键为图片路径，值为结果为是否成功加载的Future，
+            可配合concurrent.futures.as_completed按完成顺序处理
+        """
+        executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='ImageStorage')
+        futures = {}
+
+        for file_path in file_paths:
+            if file_path in futures:
+                continue
+
+            future = executor.submit(self.load_image, file_path)
+            if callback is not None:
+                future.add_done_callback(
+                    lambda done, path=file_path: self._run_callback(callback, path, done)
+                )
+            futures[file_path] = future
+
+        # 不等待任务完成，已提交的任务会继续执行，线程在任务结束后退出
+        executor.shutdown(wait=False)
+        return futures
+
+    def _load_image(self, file_path: str) -> bool:
+        """读取文件头并登记图片，非延迟加载模式下同时解码"""
+        content_hash = None
         try:
-            # 检查文件是否存在
-            if not os.path.isfile(file_path):
+            # 检查文件或归档成员是否存在
+            if not self.archive_reader.exists(file_path):
                 return False
 
-            # 检查文件格式是否支持
-            file_ext = os.path.splitext(file_path)[1].lower()
-            if file_ext not in self.supported_formats:
-                return False
+            with self.open_source(file_path) as source:
+                # 根据文件头检查格式是否支持，不依赖扩展名
+                if sniff_image_header(source.read(SIGNATURE_LENGTH)) is None:
+                    return False
+                source.seek(0)
+
+                content_hash = compute_quick_hash(source) if self.dedupe else None
+                # 查找重复图片的同时登记内容哈希，同时导入的相同文件只有一张成为代表图片
+                duplicate_of = self._register_content(file_path, content_hash, source) if content_hash else None
+
+                # Image.open只解析文件头，此时尚未解码像素
+                with Image.open(source) as img:
+                    info = {
+                        'path': file_path,
+                        'format': img.format,
+                        'mode': img.mode,
+                        'size': img.size,
+                        'width': img.width,
+                        'height': img.height,
+                        'content_hash': content_hash,
+                        'duplicate_of': duplicate_of
+                    }
+
+                    if not self.lazy and duplicate_of is None:
+                        # 立即解码并保存到内存，重复的图片共享已有的解码结果
+                        self.images.put(file_path, self.decode_image(img))
 
-            # 加载图片
-            with Image.open(file_path) as img:
-                # 转换为RGB模式（如果不是）
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
+                    record = None
+                    if self.catalog is not None:
+                        record = self.catalog.describe(file_path, source, img, content_hash)
 
-                # 保存到内存
-                self.images[file_path] = img.copy()
-                return True
+            with self._lock:
+                self.image_info[file_path] = info
+            if record is not None:
+                self.catalog.add(record)
+            return True
+
+        except Exception as e:
+            print(f"加载图片失败: {file_path}, 错误: {str(e)}")
+            if content_hash:
+                self._unregister_content(file_path, content_hash)
+            return False
+
+    def _add_record(self, file_path: str, record: Dict) -> bool:
+        """根据图片目录的记录登记图片，不重新读取文件头；完整哈希只在快速哈希冲突时读取文件计算"""
+        content_hash = record.get('content_hash') if self.dedupe else None
+        try:
+            duplicate_of = self._register_content(file_path, content_hash) if content_hash else None
+            info = {
+                'path': file_path,
+                'format': record.get('format'),
+                'mode': record.get('mode'),
+                'size': (record['width'], record['height']),
+                'width': record['width'],
+                'height': record['height'],
+                'content_hash': content_hash,
+                'duplicate_of': duplicate_of
+            }
+
+            if not self.lazy and duplicate_of is None:
+                with self.open_source(file_path) as source, Image.open(source) as img:
+                    info['mode'] = img.mode
+                    self.images.put(file_path, self.decode_image(img))
+
+            with self._lock:
+                self.image_info[file_path] = info
+            return True
 
         except Exception as e:
             print(f"加载图片失败: {file_path}, 错误: {str(e)}")
+            if content_hash:
+                self._unregister_content(file_path, content_hash)
             return False
 
-    def get_image(self, file_path: str) -> Optional[Image.Image]:
+    def open_source(self, file_path: str, read_ahead: Optional[ReadAhead] = None) -> BinaryIO:
+        """
+        打开图片的原始数据，数据已被预读时直接返回内存中的数据
+
+        Args:
+            file_path: 图片文件路径或归档成员路径
+            read_ahead: prefetch返回的预读，只由使用它的调用者传入，其他线程的读取不会取走预读的数据
+
+        Returns:
+            可随机访问的二进制文件对象，由调用者关闭
+        """
+        data = read_ahead.take(file_path) if read_ahead is not None else None
+        if data is not None:
+            return io.BytesIO(data)
+        return self.archive_reader.open(file_path)
+
+    def expand_archives(self, file_paths: Iterable[str]) -> List[str]:
+        """
+        将路径列表中的ZIP归档展开为其中图片的成员路径，其他路径保持不变
+
+        Args:
+            file_paths: 文件路径列表
+
+        Returns:
+            展开后的路径列表
+        """
+        expanded = []
+        for file_path in file_paths:
+            if get_archive_format(file_path) == 'zip' and os.path.isfile(file_path):
+                expanded.extend(self.list_archive_images(file_path))
+            else:
+                expanded.append(file_path)
+        return expanded
+
+    def list_archive_images(self, archive_path: str) -> List[str]:
+        """
+        列出ZIP归档中的图片，返回的成员路径可直接传给load_image
+
+        Args:
+            archive_path: 归档文件路径
+
+        Returns:
+            按名称排序的归档成员路径列表，无法读取时返回空列表
+        """
+        try:
+            return self.archive_reader.list_images(archive_path)
+        except Exception as e:
+            print(f"读取归档失败: {archive_path}, 错误: {str(e)}")
+            return []
+
+    @contextmanager
+    def prefetch(
+        self,
+        file_paths: Iterable[str],
+        window: int = 8,
+        max_bytes: int = DEFAULT_READ_AHEAD_BYTES
+    ):
+        """
+        在with块内按顺序预读图片文件，适用于网络存储上的批量处理
+
+        后台线程提前读取后续window个文件的字节，将with返回的预读传给get_image时从内存读取，
+        网络延迟与解码、编码重叠。跳过的文件会自动释放缓冲。
+
+        Args:
+            file_paths: 按处理顺序排列的图片路径
+            window: 预读窗口，为0时不预读
+            max_bytes: 预读缓冲的预算（字节）
+
+        Yields:
+            ReadAhead预读，不预读时为None
+        """
+        if window <= 0:
+            yield None
+            return
+
+        read_ahead = ReadAhead(file_paths, window, max_bytes)
+        try:
+            yield read_ahead
+        finally:
+            read_ahead.close()
+
+    def decode_image(self, img: Image.Image) -> Image.Image:
         """
-        获取已加载的图片
+        解码已打开的图片并转换为RGB模式
+
+        Args:
+            img: 已打开的PIL图片对象
+
+        Returns:
+            与文件无关联的RGB图片对象
+        """
+        # 转换为RGB模式（如果不是），convert会生成新的图片，无需再复制
+        if img.mode != 'RGB':
+            return img.convert('RGB')
+        return img.copy()
+
+    def get_image(self, file_path: str, read_ahead: Optional[ReadAhead] = None) -> Optional[Image.Image]:
+        """
+        获取已加载的图片，延迟加载模式下首次获取时解码
 
         Args:
             file_path: 图片文件路径
+            read_ahead: prefetch返回的预读，解码时优先使用其中的数据
 
         Returns:
             PIL图片对象，如果不存在则返回None
         """
-        return self.images.get(file_path)
+        if not self.has_image(file_path):
+            return None
+
+        # 重复的图片使用代表图片的解码结果
+        file_path = self.get_canonical_path(file_path)
+        image = self.images.get(file_path)
+        if image is not None:
+            return image
+
+        return self._run_once(self._decoding, file_path, lambda: self._fetch_image(file_path, read_ahead))
+
+    def _fetch_image(self, file_path: str, read_ahead: Optional[ReadAhead] = None) -> Optional[Image.Image]:
+        """从磁盘像素缓存读取或解码原图，并放入缓存"""
+        # 等待锁期间其他线程可能已完成解码
+        if file_path in self.images:
+            image = self.images.get(file_path)
+            if image is not None:
+                return image
+
+        image = self.spill.get(file_path) if self.spill else None
+        if image is None:
+            try:
+                with self.open_source(file_path, read_ahead) as source, Image.open(source) as img:
+                    image = self.decode_image(img)
+            except Exception as e:
+                print(f"解码图片失败: {file_path}, 错误: {str(e)}")
+                return None
+
+        self.images.put(file_path, image)
+        return image
+
+    def get_preview(self, file_path: str, min_size: int) -> Optional[Image.Image]:
+        """
+        获取长边不小于min_size的最小预览图
+
+        预览图按PREVIEW_LEVELS分层缓存在图片缓存中，键为(图片路径, 层级)。
+        原图长边不超过所需层级时直接返回原图。
+
+        Args:
+            file_path: 图片文件路径
+            min_size: 所需的最小长边尺寸（像素）
+
+        Returns:
+            RGB模式的PIL预览图，如果不存在则返回None
+        """
+        if not self.has_image(file_path):
+            return None
+
+        file_path = self.get_canonical_path(file_path)
+        level = self.get_preview_level(file_path, min_size)
+        if level is None:
+            return self.get_image(file_path)
+
+        preview = self.images.get((file_path, level))
+        if preview is not None:
+            return preview
+
+        return self._run_once(
+            self._decoding, (file_path, level), lambda: self._fetch_preview(file_path, level)
+        )
+
+    def _fetch_preview(self, file_path: str, level: int) -> Optional[Image.Image]:
+        """从磁盘像素缓存读取或生成预览图，并放入缓存"""
+        key = (file_path, level)
+        if key in self.images:
+            preview = self.images.get(key)
+            if preview is not None:
+                return preview
+
+        preview = self.spill.get(file_path, level) if self.spill else None
+        if preview is None:
+            try:
+                preview = self.build_preview(file_path, level)
+            except Exception as e:
+                print(f"生成预览图失败: {file_path}, 错误: {str(e)}")
+                return None
+
+        self.images.put(key, preview)
+        return preview
+
+    def get_preview_level(self, file_path: str, min_size: int) -> Optional[int]:
+        """
+        选择长边不小于min_size的最小预览层级
+
+        Args:
+            file_path: 图片文件路径
+            min_size: 所需的最小长边尺寸（像素）
+
+        Returns:
+            预览层级，需要使用原图时返回None
+        """
+        with self._lock:
+            long_edge = max(self.image_info[file_path]['size'])
+        for level in PREVIEW_LEVELS:
+            if level >= long_edge:
+                break
+            if level >= min_size:
+                return level
+        return None
+
+    def build_preview(self, file_path: str, level: int) -> Image.Image:
+        """
+        生成指定层级的预览图
+
+        优先从已缓存的更大层级或原图缩小；都未缓存时直接读取文件，
+        JPEG使用draft在解码时按1/2、1/4、1/8缩小，其他格式用reduce按整数倍缩小，
+        最后用LANCZOS缩放到精确尺寸。
+
+        Args:
+            file_path: 图片文件路径
+            level: 预览层级（长边像素）
+
+        Returns:
+            RGB模式的PIL预览图
+        """
+        with self._lock:
+            width, height = self.image_info[file_path]['size']
+        scale = level / max(width, height)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+        # 查找已缓存的更大层级或原图，避免重新解码
+        for key in [(file_path, larger) for larger in PREVIEW_LEVELS if larger > level] + [file_path]:
+            if key in self.images:
+                return self.reduce_image(self.images.get(key), size)
+
+        with self.open_source(file_path) as source, Image.open(source) as img:
+            img.draft('RGB', size)
+            return self.reduce_image(self.decode_image(img), size)
+
+    def reduce_image(self, image: Image.Image, size: tuple) -> Image.Image:
+        """
+        将图片缩小到指定尺寸
+
+        Args:
+            image: PIL图片对象
+            size: 目标尺寸 (width, height)
+
+        Returns:
+            缩小后的新图片对象
+        """
+        # 先按整数倍快速缩小，保留至少2倍余量供LANCZOS抗锯齿
+        factor = min(image.width // size[0], image.height // size[1]) // 2
+        if factor > 1:
+            image = image.reduce(factor)
+
+        if image.size == size:
+            return image.copy()
+        return image.resize(size, Image.Resampling.LANCZOS)
+
+    def on_image_evicted(self, key, image: Image.Image) -> None:
+        """
+        图片被淘汰出内存时写入磁盘像素缓存
+
+        Args:
+            key: 缓存键，图片路径或(图片路径, 层级)
+            image: 被淘汰的图片对象
+        """
+        file_path, level = key if isinstance(key, tuple) else (key, None)
+        # 淘汰时图片可能已被移除
+        if self.has_image(file_path):
+            self.spill.put(file_path, image, level)
+
+    def get_canonical_path(self, file_path: str) -> str:
+        """
+        获取内容相同的图片中首次导入的代表图片路径
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            代表图片路径，图片不重复或未加载时返回自身
+        """
+        with self._lock:
+            info = self.image_info.get(file_path)
+            if info and info.get('duplicate_of'):
+                return info['duplicate_of']
+            return file_path
+
+    def get_duplicates(self) -> Dict[str, List[str]]:
+        """
+        获取所有重复图片分组
+
+        Returns:
+            字典，键为代表图片路径，值为与其内容相同的其他图片路径列表（按导入顺序）
+        """
+        groups = {}
+        with self._lock:
+            for file_path, info in self.image_info.items():
+                if info.get('duplicate_of'):
+                    groups.setdefault(info['duplicate_of'], []).append(file_path)
+        return groups
+
+    def _register_content(
+        self,
+        file_path: str,
+        content_hash: str,
+        source: Optional[BinaryIO] = None
+    ) -> Optional[str]:
+        """
+        查找内容相同的已导入图片，快速哈希相同时用完整哈希确认；没有重复时登记为代表图片
+
+        登记前在锁内重新检查候选，多个线程同时导入相同的文件时只有一张成为代表图片，
+        其余的都被识别为重复。完整哈希只在快速哈希冲突时计算，读取文件时不持有锁。
+
+        Args:
+            file_path: 图片文件路径
+            content_hash: 快速内容哈希
+            source: 已打开的图片数据，读取后回到开头；为None时需要完整哈希再打开文件
+
+        Returns:
+            代表图片路径，没有重复时返回None
+        """
+        with self._lock:
+            paths = self._content_index.setdefault(content_hash, [])
+            if not any(path != file_path for path in paths):
+                if file_path not in paths:
+                    paths.append(file_path)
+                return None
+
+        if source is None:
+            file_hash = self._get_file_hash(file_path)
+        else:
+            file_hash = compute_file_hash(source)
+            source.seek(0)
+            with self._lock:
+                self._file_hashes[file_path] = file_hash
+
+        checked = set()
+        while True:
+            with self._lock:
+                paths = self._content_index.setdefault(content_hash, [])
+                candidates = [path for path in paths if path != file_path and path not in checked]
+                if not candidates:
+                    # 所有候选都已确认内容不同，登记为代表图片
+                    if file_path not in paths:
+                        paths.append(file_path)
+                    return None
+
+            # 在锁外计算候选的完整哈希，期间登记的新代表图片在下一轮检查
+            for candidate in candidates:
+                if file_hash is not None and self._get_file_hash(candidate) == file_hash:
+                    return candidate
+                checked.add(candidate)
+
+    def _unregister_content(self, file_path: str, content_hash: str) -> None:
+        """撤销导入失败的图片登记的内容哈希"""
+        with self._lock:
+            if file_path in self.image_info:
+                return
+            self._file_hashes.pop(file_path, None)
+            paths = self._content_index.get(content_hash, [])
+            if file_path in paths:
+                paths.remove(file_path)
+            if not paths:
+                self._content_index.pop(content_hash, None)
+
+    def _get_file_hash(self, file_path: str) -> Optional[str]:
+        """获取图片的完整内容哈希，结果会被缓存"""
+        with self._lock:
+            if file_path in self._file_hashes:
+                return self._file_hashes[file_path]
+
+        try:
+            with self.open_source(file_path) as source:
+                file_hash = compute_file_hash(source)
+        except OSError:
+            file_hash = None
+
+        with self._lock:
+            self._file_hashes[file_path] = file_hash
+        return file_hash
+
+    def has_image(self, file_path: str) -> bool:
+        """
+        检查图片是否已加载
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            是否已加载
+        """
+        with self._lock:
+            return file_path in self.image_info
 
     def get_all_image_paths(self) -> List[str]:
         """
@@ -70,7 +650,67 @@ class ImageStorage:
         Returns:
             图片路径列表
         """
-        return list(self.images.keys())
+        with self._lock:
+            return list(self.image_info.keys())
+
+    def query_image_paths(
+        self,
+        order_by: str = 'imported',
+        descending: bool = False,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        **filters
+    ) -> List[str]:
+        """
+        从图片目录中按条件筛选、排序并分页查询已加载图片的路径
+
+        Args:
+            order_by: 排序方式，见ImageCatalog.query
+            descending: 是否降序
+            offset: 跳过的图片数
+            limit: 最多返回的图片数，为None时返回全部
+            **filters: 筛选条件，见ImageCatalog.query
+
+        Returns:
+            图片路径列表
+
+        Raises:
+            ValueError: 没有图片目录时按导入顺序以外的方式排序或筛选
+        """
+        if self.catalog is not None:
+            return self.catalog.get_paths(order_by, descending, offset, limit, **filters)
+
+        self._check_query(order_by, filters)
+        paths = self.get_all_image_paths()
+        if descending:
+            paths.reverse()
+        offset = max(0, offset)
+        return paths[offset:] if limit is None else paths[offset:offset + limit]
+
+    def count_images(self, **filters) -> int:
+        """
+        统计符合条件的已加载图片数量
+
+        Args:
+            **filters: 筛选条件，见ImageCatalog.query
+
+        Returns:
+            图片数量
+
+        Raises:
+            ValueError: 没有图片目录时指定了筛选条件
+        """
+        if self.catalog is not None:
+            return self.catalog.count(**filters)
+
+        self._check_query('imported', filters)
+        with self._lock:
+            return len(self.image_info)
+
+    def _check_query(self, order_by: str, filters: Dict) -> None:
+        """没有图片目录时只支持按导入顺序查询全部图片"""
+        if order_by != 'imported' or any(value not in (None, '') for value in filters.values()):
+            raise ValueError("未设置图片目录，只支持按导入顺序查询")
 
     def remove_image(self, file_path: str) -> bool:
         """
@@ -82,14 +722,118 @@ class ImageStorage:
         Returns:
             是否成功移除
         """
-        if file_path in self.images:
-            del self.images[file_path]
-            return True
-        return False
+        with self._lock:
+            if file_path not in self.image_info:
+                return False
+            info = self.image_info.pop(file_path)
+            self._file_hashes.pop(file_path, None)
+
+            # 移除代表图片时，由下一张重复的图片接替
+            if info.get('content_hash') and not info.get('duplicate_of'):
+                paths = self._content_index.get(info['content_hash'], [])
+                successor = None
+                for path, other in self.image_info.items():
+                    if other.get('duplicate_of') == file_path:
+                        if successor is None:
+                            successor = path
+                            other['duplicate_of'] = None
+                        else:
+                            other['duplicate_of'] = successor
+
+                if file_path in paths:
+                    paths.remove(file_path)
+                if successor is not None:
+                    paths.append(successor)
+                if not paths:
+                    self._content_index.pop(info['content_hash'], None)
+
+        if self.catalog is not None:
+            self.catalog.remove(file_path)
+        self.images.remove(file_path)
+        for level in PREVIEW_LEVELS:
+            self.images.remove((file_path, level))
+        return True
 
     def clear(self) -> None:
         """清空所有已加载的图片"""
+        with self._lock:
+            self.image_info.clear()
+            self._content_index.clear()
+            self._file_hashes.clear()
+        if self.catalog is not None:
+            self.catalog.clear()
         self.images.clear()
+        self.archive_reader.close()
+
+    def pin_image(self, file_path: str) -> None:
+        """
+        固定图片，使其不会因超出内存预算而被淘汰
+
+        Args:
+            file_path: 图片文件路径
+        """
+        self.images.pin(self.get_canonical_path(file_path))
+
+    def unpin_image(self, file_path: str) -> None:
+        """
+        取消固定图片
+
+        Args:
+            file_path: 图片文件路径
+        """
+        self.images.unpin(self.get_canonical_path(file_path))
+
+    def pin_previews(self, file_path: str) -> None:
+        """
+        固定图片各层级的预览图，使其不会因超出内存预算而被淘汰；原图不被固定
+
+        Args:
+            file_path: 图片文件路径
+        """
+        for key in self._get_preview_keys(file_path):
+            self.images.pin(key)
+
+    def unpin_previews(self, file_path: str) -> None:
+        """
+        取消固定图片各层级的预览图
+
+        Args:
+            file_path: 图片文件路径
+        """
+        for key in self._get_preview_keys(file_path):
+            self.images.unpin(key)
+
+    def _get_preview_keys(self, file_path: str) -> List[tuple]:
+        """获取图片各预览层级的缓存键，只包含小于原图长边的层级"""
+        with self._lock:
+            info = self.image_info.get(file_path)
+            if info is None:
+                return []
+            long_edge = max(info['size'])
+        file_path = self.get_canonical_path(file_path)
+        return [(file_path, level) for level in PREVIEW_LEVELS if level < long_edge]
+
+    def set_cache_budget(self, max_bytes: int) -> None:
+        """
+        设置已解码图片的内存预算
+
+        Args:
+            max_bytes: 内存预算（字节）
+        """
+        self.images.set_max_bytes(max_bytes)
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """
+        获取已解码图片缓存的统计信息
+
+        Returns:
+            包含命中、未命中、淘汰次数和当前占用字节数的字典，
+            启用磁盘像素缓存时还包含磁盘占用字节数
+        """
+        stats = self.images.get_stats()
+        if self.spill:
+            stats.update(self.spill.get_stats())
+        return stats
 
     def get_image_info(self, file_path: str) -> Optional[Dict]:
         """
@@ -99,17 +843,51 @@ class ImageStorage:
             file_path: 图片文件路径
 
         Returns:
-            图片信息字典，如果不存在则返回None
+            图片信息字典，如果不存在则返回None；format和mode为原始文件的格式和色彩模式，
+            content_hash为快速内容哈希，duplicate_of为内容相同的代表图片路径（不重复时为None）
         """
-        if file_path not in self.images:
-            return None
+        with self._lock:
+            if file_path not in self.image_info:
+                return None
+            return dict(self.image_info[file_path])
+
+    def _run_once(self, inflight: Dict, key, func: Callable):
+        """
+        执行任务，同一键的任务正在执行时等待并共享其结果
+
+        Args:
+            inflight: 进行中的任务表
+            key: 任务键
+            func: 任务函数
 
-        image = self.images[file_path]
-        return {
-            'path': file_path,
-            'format': image.format,
-            'mode': image.mode,
-            'size': image.size,
-            'width': image.width,
-            'height': image.height
-        }
+        Returns:
+            任务函数的返回值
+        """
+        with self._lock:
+            future = inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                inflight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                inflight.pop(key, None)
+
+    def _run_callback(self, callback: Callable[[str, bool], None], file_path: str, future: Future) -> None:
+        """调用加载完成回调，忽略回调中的异常"""
+        try:
+            callback(file_path, not future.cancelled() and future.exception() is None and future.result())
+        except Exception as e:
+            print(f"图片加载回调失败: {file_path}, 错误: {str(e)}")
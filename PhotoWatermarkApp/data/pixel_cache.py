@@ -0,0 +1,207 @@
+"""
+像素缓存模块
+"""
+
+import os
+import mmap
+import struct
+import hashlib
+import tempfile
+import threading
+from typing import Dict, Optional
+
+from PIL import Image
+
+from utils.archive_utils import stat_source
+
+
+# 默认磁盘预算：4GB
+DEFAULT_SPILL_BYTES = 4 * 1024 * 1024 * 1024
+
+# 文件头：标识、色彩模式、宽、高
+HEADER_FORMAT = '<4s8sII'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+HEADER_MAGIC = b'PWPX'
+
+
+class PixelCache:
+    """像素缓存模块，将已解码的像素以原始格式写入磁盘，通过内存映射快速读回"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_SPILL_BYTES):
+        """
+        初始化像素缓存
+
+        Args:
+            cache_dir: 缓存目录，为None时使用用户缓存目录下的PhotoWatermarkApp/pixels
+            max_bytes: 磁盘预算（字节），超出时删除最久未使用的缓存文件
+        """
+        self.cache_dir = cache_dir or self.default_cache_dir()
+        self.max_bytes = max_bytes
+        self._total_bytes = None  # 缓存目录占用的字节数，首次写入时统计
+        self._lock = threading.RLock()  # 保护占用字节数的统计和淘汰，多个线程可能同时写入
+
+    @staticmethod
+    def default_cache_dir() -> str:
+        """获取默认缓存目录"""
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(cache_home, 'PhotoWatermarkApp', 'pixels')
+
+    def get_cache_path(self, file_path: str, level: Optional[int] = None) -> Optional[str]:
+        """
+        根据图片路径、修改时间和大小计算缓存文件路径，源文件变化后自动失效
+
+        Args:
+            file_path: 图片文件路径或归档成员路径（按所在归档的修改时间和大小计算）
+            level: 预览层级，为None时表示原图
+
+        Returns:
+            缓存文件路径，源文件不存在时返回None
+        """
+        try:
+            stat = stat_source(file_path)
+        except OSError:
+            return None
+
+        key = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{level or 0}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + '.raw')
+
+    def get(self, file_path: str, level: Optional[int] = None) -> Optional[Image.Image]:
+        """
+        读取缓存的像素
+
+        Args:
+            file_path: 图片文件路径
+            level: 预览层级，为None时表示原图
+
+        Returns:
+            PIL图片对象，未缓存时返回None
+        """
+        cache_path = self.get_cache_path(file_path, level)
+        if cache_path is None or not os.path.isfile(cache_path):
+            return None
+
+        try:
+            with open(cache_path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            magic, mode, width, height = struct.unpack_from(HEADER_FORMAT, mapped)
+            if magic != HEADER_MAGIC:
+                raise ValueError("缓存文件格式无效")
+            mode = mode.rstrip(b'\0').decode('ascii')
+
+            # RGBA等模式直接引用映射的内存，RGB按PIL内部格式展开一次，均无需解码
+            image = Image.frombuffer(
+                mode, (width, height), memoryview(mapped)[HEADER_SIZE:], 'raw', mode, 0, 1
+            )
+            # 更新修改时间，用于按最久未使用淘汰
+            os.utime(cache_path)
+            return image
+
+        except Exception as e:
+            print(f"读取像素缓存失败: {file_path}, 错误: {str(e)}")
+            self._remove_file(cache_path)
+            return None
+
+    def put(self, file_path: str, image: Image.Image, level: Optional[int] = None) -> bool:
+        """
+        将像素写入缓存，已缓存时跳过
+
+        Args:
+            file_path: 图片文件路径
+            image: PIL图片对象
+            level: 预览层级，为None时表示原图
+
+        Returns:
+            是否已缓存
+        """
+        cache_path = self.get_cache_path(file_path, level)
+        if cache_path is None:
+            return False
+        if os.path.isfile(cache_path):
+            return True
+
+        temp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            header = struct.pack(HEADER_FORMAT, HEADER_MAGIC, image.mode.encode('ascii'), image.width, image.height)
+
+            # 先写临时文件再替换，避免读到写了一半的缓存；临时文件名唯一，多个线程同时写入同一图片时互不干扰
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(image.tobytes('raw', image.mode))
+
+            # 替换和统计在同一次加锁中完成，同一图片被多个线程写入时只统计一次
+            with self._lock:
+                replaced = os.path.isfile(cache_path)
+                os.replace(temp_path, cache_path)
+                if self._total_bytes is None:
+                    self.get_total_bytes()
+                elif not replaced:
+                    self._total_bytes += os.path.getsize(cache_path)
+                self._trim()
+
+        except Exception as e:
+            print(f"写入像素缓存失败: {file_path}, 错误: {str(e)}")
+            if temp_path is not None:
+                self._remove_file(temp_path)
+            return False
+
+        return True
+
+    def get_total_bytes(self) -> int:
+        """获取缓存目录占用的字节数"""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(entry.stat().st_size for entry in self._scan())
+            return self._total_bytes
+
+    def clear(self) -> None:
+        """删除所有缓存文件"""
+        with self._lock:
+            for entry in self._scan():
+                self._remove_file(entry.path)
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            包含占用字节数和磁盘预算的字典
+        """
+        return {
+            'disk_bytes': self.get_total_bytes(),
+            'max_disk_bytes': self.max_bytes
+        }
+
+    def _scan(self) -> list:
+        """列出缓存目录中的缓存文件"""
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                return [entry for entry in entries if entry.name.endswith('.raw') and entry.is_file()]
+        except OSError:
+            return []
+
+    def _trim(self) -> None:
+        """按修改时间删除最久未使用的缓存文件，直到占用不超过预算，调用时需持有_lock"""
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        entries = sorted(self._scan(), key=lambda entry: entry.stat().st_mtime)
+        self._total_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            if self._remove_file(entry.path):
+                self._total_bytes -= size
+
+    def _remove_file(self, path: str) -> bool:
+        """删除文件，忽略不存在的文件"""
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
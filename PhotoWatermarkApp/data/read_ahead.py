@@ -0,0 +1,178 @@
+"""
+预读模块
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from utils.archive_utils import is_member_path
+
+
+# 默认预读窗口：提前读取的文件数
+DEFAULT_READ_AHEAD_WINDOW = 8
+
+# 默认缓冲预算：256MB
+DEFAULT_READ_AHEAD_BYTES = 256 * 1024 * 1024
+
+
+class ReadAhead:
+    """预读模块，在后台线程中按处理顺序提前读取后续文件的字节，
+    使网络存储（SMB/NFS）的访问延迟与解码、编码等计算重叠"""
+
+    def __init__(
+        self,
+        file_paths: Iterable[str],
+        window: int = DEFAULT_READ_AHEAD_WINDOW,
+        max_bytes: int = DEFAULT_READ_AHEAD_BYTES,
+        workers: int = 4
+    ):
+        """
+        初始化预读并开始读取前window个文件
+
+        Args:
+            file_paths: 按处理顺序排列的文件路径
+            window: 预读窗口，最多提前读取的文件数
+            max_bytes: 缓冲预算（字节），已读取未取走的数据超出预算时暂停预读；
+                单个文件超出预算时仍会读取，避免阻塞
+            workers: 读取线程数
+        """
+        self.window = max(1, window)
+        self.max_bytes = max_bytes
+
+        self._queue = list(OrderedDict.fromkeys(file_paths))
+        self._positions = {file_path: i for i, file_path in enumerate(self._queue)}
+        self._next = 0  # 下一个待调度的文件在队列中的位置
+        self._pending = {}  # 文件路径 -> 读取任务
+        self._buffered_bytes = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='ReadAhead')
+
+        self.hits = 0
+        self.misses = 0
+
+        with self._condition:
+            self._schedule()
+
+    def take(self, file_path: str) -> Optional[bytes]:
+        """
+        取走文件的预读数据，读取尚未完成时等待，并调度下一个文件
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            文件内容，文件不在预读队列中或读取失败时返回None
+        """
+        with self._condition:
+            future = self._pending.pop(file_path, None)
+            if future is None:
+                self.misses += 1
+                return None
+
+            # 按顺序处理时，排在前面仍未取走的文件已被跳过，释放其占用的缓冲
+            position = self._positions[file_path]
+            for skipped in [path for path in self._pending if self._positions[path] < position]:
+                self._discard(self._pending.pop(skipped))
+
+        data = future.result()
+
+        with self._condition:
+            if data is not None:
+                self._buffered_bytes -= len(data)
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._schedule()
+            self._condition.notify_all()
+        return data
+
+    def close(self) -> None:
+        """停止预读并释放缓冲"""
+        with self._condition:
+            self._closed = True
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+            self._condition.notify_all()
+
+        self._executor.shutdown(wait=True)
+        with self._condition:
+            self._buffered_bytes = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取预读统计信息
+
+        Returns:
+            包含命中、未命中次数和当前缓冲字节数的字典
+        """
+        with self._condition:
+            return {
+                'read_ahead_hits': self.hits,
+                'read_ahead_misses': self.misses,
+                'read_ahead_bytes': self._buffered_bytes,
+                'read_ahead_pending': len(self._pending)
+            }
+
+    def _schedule(self) -> None:
+        """补充预读任务直到窗口填满；需在持有锁时调用"""
+        while not self._closed and len(self._pending) < self.window and self._next < len(self._queue):
+            file_path = self._queue[self._next]
+            self._next += 1
+            self._pending[file_path] = self._executor.submit(self._read, file_path)
+
+    def _discard(self, future) -> None:
+        """丢弃预读任务，释放已读取数据占用的缓冲；需在持有锁时调用"""
+        if future.cancel():
+            return
+
+        def release(done):
+            if done.cancelled() or done.exception() is not None or done.result() is None:
+                return
+            with self._condition:
+                self._buffered_bytes -= len(done.result())
+                self._condition.notify_all()
+
+        # 已完成的任务会立即调用回调，Condition默认使用可重入锁，可在持有锁时调用
+        future.add_done_callback(release)
+
+    def _read(self, file_path: str) -> Optional[bytes]:
+        """读取文件内容，缓冲超出预算时等待已有数据被取走"""
+        # 归档成员从本地归档按需读取，不预读
+        if is_member_path(file_path):
+            return None
+
+        try:
+            size = os.path.getsize(file_path)
+
+            with self._condition:
+                # 超出预算时等待，但最先需要的文件（队首或已被等待的文件）总是立即读取，避免死锁
+                while (not self._closed and self._buffered_bytes > 0
+                       and self._buffered_bytes + size > self.max_bytes
+                       and file_path in self._pending and next(iter(self._pending)) != file_path):
+                    self._condition.wait()
+                if self._closed:
+                    return None
+                # 先按文件大小占用预算，避免多个线程同时超出
+                self._buffered_bytes += size
+
+            try:
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+            except Exception:
+                with self._condition:
+                    self._buffered_bytes -= size
+                    self._condition.notify_all()
+                raise
+
+            with self._condition:
+                self._buffered_bytes += len(data) - size
+            return data
+
+        except Exception as e:
+            print(f"预读文件失败: {file_path}, 错误: {str(e)}")
+            return None
@@ -6,8 +6,6 @@ import os
 import json
 from typing import Dict, List, Optional, Tuple
 
-from PyQt6.QtWidgets import QInputDialog, QMessageBox
-
 
 class TemplateStorage:
     """模板存储模块，负责水印模板的保存和加载"""
@@ -135,6 +133,9 @@ class TemplateStorage:
         Returns:
             模板名称和是否确认的元组
         """
+        # 对话框依赖PyQt6，仅在需要时导入，以便无界面环境也能加载模板
+        from PyQt6.QtWidgets import QInputDialog
+
         name, ok = QInputDialog.getText(
             parent, 
             "保存模板", 
@@ -158,6 +159,8 @@ class TemplateStorage:
         if not templates:
             return "", False
 
+        from PyQt6.QtWidgets import QInputDialog
+
         # 使用QInputDialog选择模板
         name, ok = QInputDialog.getItem(
             parent,
@@ -181,6 +184,8 @@ class TemplateStorage:
         Returns:
             是否导入成功
         """
+        from PyQt6.QtWidgets import QInputDialog, QMessageBox
+
         try:
             # 检查文件是否存在
             if not os.path.exists(template_file):
@@ -221,6 +226,8 @@ class TemplateStorage:
         Returns:
             是否导出成功
         """
+        from PyQt6.QtWidgets import QMessageBox
+
         try:
             # 加载模板
             template = self.load_template(name)
@@ -0,0 +1,291 @@
+"""
+缩略图缓存模块
+"""
+
+import os
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image, PngImagePlugin
+
+from utils.archive_utils import ArchiveReader, stat_source
+from utils.image_utils import create_thumbnail_from_file
+
+
+# 缩略图尺寸，与freedesktop缩略图规范的normal/large目录对应
+THUMBNAIL_SIZES = {'normal': 128, 'large': 256}
+
+# 默认磁盘预算：256MB
+DEFAULT_THUMBNAIL_BYTES = 256 * 1024 * 1024
+
+
+class ThumbnailCache:
+    """缩略图缓存模块，参照freedesktop缩略图规范在磁盘上保存PNG缩略图，跨会话复用"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        flavor: str = 'normal',
+        max_bytes: int = DEFAULT_THUMBNAIL_BYTES
+    ):
+        """
+        初始化缩略图缓存
+
+        Args:
+            cache_dir: 缓存根目录，为None时使用用户缓存目录下的PhotoWatermarkApp/thumbnails
+            flavor: 缩略图规格，'normal'为128像素，'large'为256像素
+            max_bytes: 磁盘预算（字节），超出时删除最久未使用的缩略图
+        """
+        self.flavor = flavor
+        self.size = THUMBNAIL_SIZES[flavor]
+        self.cache_dir = os.path.join(cache_dir or self.default_cache_dir(), flavor)
+        self.max_bytes = max_bytes
+        self._total_bytes = None  # 缓存目录占用的字节数，首次写入时统计
+        self.sources = {'exif': 0, 'draft': 0, 'full': 0}  # 各生成方式的次数
+        self._lock = threading.RLock()  # 保护统计计数和占用字节数，导入线程和图标线程同时生成缩略图
+        self.archive_reader = ArchiveReader()  # 读取ZIP归档成员
+
+    @staticmethod
+    def default_cache_dir() -> str:
+        """获取默认缓存根目录"""
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(cache_home, 'PhotoWatermarkApp', 'thumbnails')
+
+    def get_cache_path(self, file_path: str) -> str:
+        """
+        计算缩略图文件路径，文件名为源文件URI的MD5
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            缩略图文件路径
+        """
+        uri = Path(os.path.abspath(file_path)).as_uri()
+        return os.path.join(self.cache_dir, hashlib.md5(uri.encode('utf-8')).hexdigest() + '.png')
+
+    def get_thumbnail_path(self, file_path: str) -> Optional[str]:
+        """
+        获取有效的缩略图文件路径，缺失或源文件已修改时重新生成
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            缩略图文件路径，生成失败时返回None
+        """
+        try:
+            # 归档成员按所在归档的修改时间和大小判断是否有效
+            stat = stat_source(file_path)
+        except OSError:
+            return None
+
+        cache_path = self._lookup(file_path, stat)
+        if cache_path is not None:
+            return cache_path
+
+        cache_path = self.get_cache_path(file_path)
+        if self.create_thumbnail(file_path, cache_path, stat):
+            return cache_path
+        return None
+
+    def find_thumbnail_path(self, file_path: str) -> Optional[str]:
+        """
+        查找已缓存的有效缩略图，不生成缺失的缩略图，适合在界面线程中调用
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            缩略图文件路径，未缓存或已失效时返回None
+        """
+        try:
+            stat = stat_source(file_path)
+        except OSError:
+            return None
+        return self._lookup(file_path, stat)
+
+    def _lookup(self, file_path: str, stat: os.stat_result) -> Optional[str]:
+        """检查缓存的缩略图是否有效，有效时更新修改时间并返回路径"""
+        cache_path = self.get_cache_path(file_path)
+        if not self.is_valid(cache_path, stat):
+            return None
+
+        # 更新修改时间，用于按最久未使用淘汰
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+        return cache_path
+
+    def get_thumbnail(self, file_path: str) -> Optional[Image.Image]:
+        """
+        获取缩略图
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            PIL缩略图对象，生成失败时返回None
+        """
+        cache_path = self.get_thumbnail_path(file_path)
+        if cache_path is None:
+            return None
+
+        try:
+            with Image.open(cache_path) as img:
+                img.load()
+                return img
+        except Exception as e:
+            print(f"读取缩略图失败: {cache_path}, 错误: {str(e)}")
+            return None
+
+    def is_valid(self, cache_path: str, stat: os.stat_result) -> bool:
+        """
+        检查缩略图是否与源文件的修改时间和大小一致
+
+        Args:
+            cache_path: 缩略图文件路径
+            stat: 源文件的状态信息
+
+        Returns:
+            缩略图是否有效
+        """
+        try:
+            # 文本块位于图像数据之前，只需读取文件头
+            with Image.open(cache_path) as img:
+                text = img.text
+        except Exception:
+            return False
+
+        return (
+            text.get('Thumb::MTime') == str(int(stat.st_mtime))
+            and text.get('Thumb::Size') == str(stat.st_size)
+        )
+
+    def render_thumbnail(self, file_path: str) -> Image.Image:
+        """
+        从源文件生成缩略图图像，优先使用EXIF内嵌预览图
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            RGB或RGBA模式的PIL缩略图对象
+        """
+        with self.archive_reader.open(file_path) as data:
+            thumbnail, source = create_thumbnail_from_file(data, (self.size, self.size))
+        with self._lock:
+            self.sources[source] += 1
+        return thumbnail
+
+    def create_thumbnail(self, file_path: str, cache_path: str, stat: os.stat_result) -> bool:
+        """
+        生成缩略图并写入缓存
+
+        Args:
+            file_path: 图片文件路径
+            cache_path: 缩略图文件路径
+            stat: 源文件的状态信息
+
+        Returns:
+            是否生成成功
+        """
+        temp_path = None
+        try:
+            thumbnail = self.render_thumbnail(file_path)
+
+            info = PngImagePlugin.PngInfo()
+            info.add_text('Thumb::URI', Path(os.path.abspath(file_path)).as_uri())
+            info.add_text('Thumb::MTime', str(int(stat.st_mtime)))
+            info.add_text('Thumb::Size', str(stat.st_size))
+
+            # 先写临时文件再替换，避免读到写了一半的缩略图；临时文件名唯一，多个线程同时生成时互不干扰
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+            with os.fdopen(fd, 'wb') as f:
+                thumbnail.save(f, format='PNG', pnginfo=info)
+
+            # 替换和统计在同一次加锁中完成，替换已失效或其他线程刚生成的缩略图时只统计大小的差值
+            with self._lock:
+                old_size = os.path.getsize(cache_path) if os.path.isfile(cache_path) else 0
+                os.replace(temp_path, cache_path)
+                if self._total_bytes is None:
+                    self.get_total_bytes()
+                else:
+                    self._total_bytes += os.path.getsize(cache_path) - old_size
+                self._trim(keep=cache_path)
+
+        except Exception as e:
+            print(f"生成缩略图失败: {file_path}, 错误: {str(e)}")
+            if temp_path is not None:
+                self._remove_file(temp_path)
+            return False
+
+        return True
+
+    def get_total_bytes(self) -> int:
+        """获取缓存目录占用的字节数"""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(entry.stat().st_size for entry in self._scan())
+            return self._total_bytes
+
+    def clear(self) -> None:
+        """删除所有缩略图"""
+        with self._lock:
+            for entry in self._scan():
+                self._remove_file(entry.path)
+            self._total_bytes = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            包含缩略图数量、占用字节数、磁盘预算和本次会话各生成方式次数的字典
+        """
+        entries = self._scan()
+        stats = {
+            'thumbnails': len(entries),
+            'disk_bytes': sum(entry.stat().st_size for entry in entries),
+            'max_disk_bytes': self.max_bytes
+        }
+        with self._lock:
+            stats.update({f'source_{source}': count for source, count in self.sources.items()})
+        return stats
+
+    def _scan(self) -> list:
+        """列出缓存目录中的缩略图文件"""
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                return [entry for entry in entries if entry.name.endswith('.png') and entry.is_file()]
+        except OSError:
+            return []
+
+    def _trim(self, keep: Optional[str] = None) -> None:
+        """按修改时间删除最久未使用的缩略图，直到占用不超过预算，保留刚写入的文件，调用时需持有_lock"""
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        entries = sorted(self._scan(), key=lambda entry: entry.stat().st_mtime)
+        self._total_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            if entry.path == keep:
+                continue
+            size = entry.stat().st_size
+            if self._remove_file(entry.path):
+                self._total_bytes -= size
+
+    def _remove_file(self, path: str) -> bool:
+        """删除文件，忽略不存在的文件"""
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
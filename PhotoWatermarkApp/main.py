@@ -7,18 +7,138 @@
 
 import sys
 import os
-from PyQt6.QtWidgets import QApplication
-from PyQt6.QtGui import QIcon
+import argparse
 
 # 添加项目根目录到系统路径，以便导入其他模块
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from ui.main_window import MainWindow
 
-def main():
-    """应用程序主函数"""
+def parse_args(argv):
+    """解析命令行参数，未识别的参数留给Qt处理"""
+    parser = argparse.ArgumentParser(description="照片水印应用")
+    parser.add_argument('--watch', metavar='INPUT_FOLDER',
+                        help="以守护进程模式监视文件夹，自动为新图片添加水印")
+    parser.add_argument('--output', metavar='OUTPUT_FOLDER',
+                        help="监视模式的输出文件夹")
+    parser.add_argument('--template', metavar='NAME',
+                        help="使用的水印模板名称，默认使用配置中的默认水印")
+    parser.add_argument('--workers', type=int, default=4,
+                        help="处理图片的工作线程（监视模式）或进程（服务模式）数量")
+    parser.add_argument('--interval', type=float, default=1.0,
+                        help="轮询间隔（秒）")
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help="文件大小保持不变多久后开始处理（秒）")
+    parser.add_argument('--recursive', action='store_true',
+                        help="同时监视子文件夹")
+    parser.add_argument('--state-file', metavar='PATH',
+                        help="记录已处理文件的状态文件路径")
+    parser.add_argument('--serve', action='store_true',
+                        help="启动本地HTTP水印服务")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="HTTP服务监听地址")
+    parser.add_argument('--port', type=int, default=8765,
+                        help="HTTP服务监听端口")
+    parser.add_argument('--template-dir', default='templates',
+                        help="HTTP服务使用的模板目录")
+    return parser.parse_known_args(argv)
+
+
+def load_watermark_params(template_name=None):
+    """从模板或默认配置加载水印参数"""
+    from core.config_manager import ConfigManager
+    from core.watermark_processor import WatermarkProcessor
+    from data.template_storage import TemplateStorage
+
+    if template_name:
+        template = TemplateStorage().load_template(template_name)
+        if template is None:
+            return None
+        return WatermarkProcessor().normalize_params(template)
+
+    config = ConfigManager()
+    return {
+        'type': config.get('watermark', 'default_type'),
+        'text': config.get('watermark', 'default_text'),
+        'font': config.get('watermark', 'default_font'),
+        'font_size': config.get('watermark', 'default_font_size'),
+        'color': tuple(config.get('watermark', 'default_color')),
+        'opacity': config.get('watermark', 'default_opacity'),
+        'position': config.get('watermark', 'default_position'),
+        'effects': {
+            'shadow': False,
+            'outline': False
+        }
+    }
+
+
+def run_watch(args):
+    """以守护进程模式运行监视文件夹"""
+    from core.config_manager import ConfigManager
+    from core.watch_folder import WatchFolder
+
+    if not args.output:
+        print("监视模式需要指定 --output 输出文件夹")
+        return 2
+
+    watermark_params = load_watermark_params(args.template)
+    if watermark_params is None:
+        print(f"水印模板不存在: {args.template}")
+        return 2
+
+    config = ConfigManager()
+    export_options = {
+        'file_format': config.get('export', 'default_format', 'JPEG'),
+        'quality': config.get('export', 'default_quality', 90),
+        'filename_pattern': config.get('export', 'default_filename_pattern', '{original_name}_watermarked')
+    }
+
+    watcher = WatchFolder(
+        args.watch,
+        args.output,
+        watermark_params=watermark_params,
+        export_options=export_options,
+        state_file=args.state_file,
+        workers=args.workers,
+        poll_interval=args.interval,
+        settle_time=args.settle,
+        recursive=args.recursive
+    )
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+        print("已停止监视")
+    return 0
+
+
+def run_serve(args):
+    """运行本地HTTP水印服务"""
+    import asyncio
+    from core.watermark_service import WatermarkService
+
+    service = WatermarkService(
+        host=args.host,
+        port=args.port,
+        template_dir=args.template_dir,
+        workers=args.workers
+    )
+
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        print("水印服务已停止")
+    return 0
+
+
+def run_gui(qt_argv):
+    """运行图形界面"""
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtGui import QIcon
+    from ui.main_window import MainWindow
+
     # 创建应用程序实例
-    app = QApplication(sys.argv)
+    app = QApplication(qt_argv)
 
     # 设置应用程序图标
     app.setWindowIcon(QIcon(os.path.join(os.path.dirname(__file__), 'resources', 'icons', 'app_icon.png')))
@@ -28,7 +148,20 @@ def main():
     window.show()
 
     # 进入应用程序主循环
-    sys.exit(app.exec())
+    return app.exec()
+
+
+def main():
+    """应用程序主函数"""
+    args, qt_args = parse_args(sys.argv[1:])
+
+    if args.watch:
+        sys.exit(run_watch(args))
+
+    if args.serve:
+        sys.exit(run_serve(args))
+
+    sys.exit(run_gui(sys.argv[:1] + qt_args))
 
 if __name__ == "__main__":
     main()
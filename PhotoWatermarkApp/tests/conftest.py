@@ -0,0 +1,49 @@
+"""
+测试公共配置：添加项目目录到系统路径，界面测试使用offscreen平台
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """整个测试会话共用的QApplication"""
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    yield app
+
+
+@pytest.fixture
+def wait_until(qapp):
+    """处理界面事件直到条件成立，超时时测试失败"""
+    def wait(predicate, timeout=10.0):
+        deadline = time.time() + timeout
+        while not predicate():
+            if time.time() > deadline:
+                pytest.fail("等待超时")
+            qapp.processEvents()
+            time.sleep(0.005)
+    return wait
+
+
+@pytest.fixture
+def make_image(tmp_path):
+    """在临时目录中生成测试图片，返回文件路径"""
+    from PIL import Image
+
+    def make(name, size=(320, 240), color=(200, 100, 50), noise=False, fmt=None):
+        path = str(tmp_path / name)
+        if noise:
+            image = Image.effect_noise(size, 60).convert('RGB')
+        else:
+            image = Image.new('RGB', size, color)
+        image.save(path, fmt)
+        return path
+    return make
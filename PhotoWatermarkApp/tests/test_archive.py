@@ -0,0 +1,117 @@
+"""
+归档导出、ZIP归档导入和归档读取器的并发测试
+"""
+
+import io
+import os
+import tarfile
+import threading
+import time
+import zipfile
+
+from PIL import Image
+
+from core.file_processor import FileProcessor
+from utils.archive_utils import ArchiveReader, join_member_path
+
+
+def test_export_images_to_zip_and_tar(make_image, tmp_path):
+    paths = [make_image(f'{i}.png', color=(i * 40, 0, 0)) for i in range(3)]
+    processor = FileProcessor()
+    processor.import_images(paths)
+    output_folder = str(tmp_path / 'out')
+
+    results = processor.export_images(output_folder, file_format='PNG', archive_path='out.zip')
+    assert all(results.values()) and len(results) == 3
+    with zipfile.ZipFile(os.path.join(output_folder, 'out.zip')) as archive:
+        names = archive.namelist()
+        assert len(names) == 3
+        with archive.open(names[0]) as member:
+            assert Image.open(member).size == (320, 240)
+
+    results = processor.export_images(output_folder, file_format='JPEG', archive_path='out.tar')
+    assert all(results.values())
+    with tarfile.open(os.path.join(output_folder, 'out.tar')) as archive:
+        assert len(archive.getnames()) == 3
+
+
+def write_zip(path, images, mtime=None):
+    """写入包含PNG图片的ZIP归档，images为 成员名称 -> 颜色"""
+    temp_path = path + '.tmp'
+    with zipfile.ZipFile(temp_path, 'w') as archive:
+        for name, color in images.items():
+            data = io.BytesIO()
+            Image.new('RGB', (64, 48), color).save(data, 'PNG')
+            archive.writestr(name, data.getvalue())
+    os.replace(temp_path, path)
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+
+
+def test_import_images_from_zip(tmp_path):
+    archive_path = str(tmp_path / 'shoot.zip')
+    write_zip(archive_path, {'day1/a.png': (255, 0, 0), 'day1/b.png': (0, 255, 0)})
+    with zipfile.ZipFile(archive_path, 'a') as archive:
+        archive.writestr('notes.txt', 'not an image')
+        archive.writestr('__MACOSX/day1/._a.png', 'resource fork')
+
+    processor = FileProcessor()
+    results = processor.import_images([archive_path])
+
+    assert sorted(results) == [join_member_path(archive_path, 'day1/a.png'), join_member_path(archive_path, 'day1/b.png')]
+    assert all(results.values())
+    image = processor.image_storage.get_image(join_member_path(archive_path, 'day1/b.png'))
+    assert image.size == (64, 48)
+    assert image.getpixel((0, 0)) == (0, 255, 0)
+
+
+def test_replaced_archive_stays_open_for_readers(tmp_path):
+    archive_path = str(tmp_path / 'a.zip')
+    write_zip(archive_path, {'a.png': (255, 0, 0)}, mtime=10 ** 9)
+    reader = ArchiveReader()
+
+    with reader.use_archive(archive_path) as old:
+        # 读取期间归档被修改，新的读取者获得重新打开的归档，旧的仍可读取
+        write_zip(archive_path, {'a.png': (0, 0, 255)}, mtime=2 * 10 ** 9)
+        with reader.use_archive(archive_path) as new:
+            assert new is not old
+        assert old.fp is not None
+        assert Image.open(io.BytesIO(old.read('a.png'))).getpixel((0, 0)) == (255, 0, 0)
+
+    # 最后一个读取者结束后关闭被替换的归档
+    assert old.fp is None
+    with reader.open(join_member_path(archive_path, 'a.png')) as source:
+        assert Image.open(source).getpixel((0, 0)) == (0, 0, 255)
+    reader.close()
+
+
+def test_archive_reader_concurrent_rewrites(tmp_path):
+    archive_path = str(tmp_path / 'a.zip')
+    colors = {f'{i}.png': (i * 50, 0, 0) for i in range(4)}
+    write_zip(archive_path, colors, mtime=10 ** 9)
+    reader = ArchiveReader()
+    errors = []
+    stop = time.time() + 1.0
+
+    def read():
+        while time.time() < stop:
+            try:
+                for name in colors:
+                    with reader.open(join_member_path(archive_path, name)) as source:
+                        Image.open(source).load()
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    version = 2
+    while time.time() < stop:
+        write_zip(archive_path, colors, mtime=version * 10 ** 9)
+        version += 1
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    reader.close()
+    assert reader._users == {} and reader._retired == set()
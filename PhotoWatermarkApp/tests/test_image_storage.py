@@ -0,0 +1,109 @@
+"""
+图片存储的并发加载、去重、预读和目录导入测试
+"""
+
+import shutil
+import threading
+from concurrent.futures import wait
+
+from PIL import Image
+
+import data.image_storage
+from data.image_catalog import ImageCatalog
+from data.image_storage import ImageStorage
+
+
+def test_concurrent_loads_share_one_decode(make_image):
+    paths = [make_image(f'{i}.png', color=(i * 20, 0, 0)) for i in range(6)]
+    storage = ImageStorage(lazy=True)
+    results = []
+
+    def worker():
+        futures = storage.load_images(paths + paths, workers=3)
+        wait(list(futures.values()))
+        loaded = [future.result() for future in futures.values()]
+        results.append((loaded, [storage.get_image(path) for path in paths]))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(storage.get_all_image_paths()) == sorted(paths)
+    assert all(all(loaded) for loaded, _ in results)
+    # 同一张图片只解码一次，所有线程得到同一个对象
+    for column in zip(*[images for _, images in results]):
+        assert all(image is column[0] for image in column)
+
+
+def test_dedupe_concurrent_identical_files(make_image, tmp_path):
+    original = make_image('0.jpg', noise=True)
+    copies = [original]
+    for i in range(1, 12):
+        copy = str(tmp_path / f'{i}.jpg')
+        shutil.copy(original, copy)
+        copies.append(copy)
+    other = make_image('other.jpg', color=(1, 2, 3))
+
+    storage = ImageStorage(lazy=True, dedupe=True)
+    wait(list(storage.load_images(copies + [other], workers=8).values()))
+
+    duplicates = storage.get_duplicates()
+    assert len(duplicates) == 1
+    representative, group = next(iter(duplicates.items()))
+    assert sorted([representative] + group) == sorted(copies)
+    assert storage.get_canonical_path(other) == other
+
+
+def test_dedupe_confirms_quick_hash_collisions(make_image, tmp_path, monkeypatch):
+    # 所有文件的快速哈希都相同，只能由完整哈希区分
+    monkeypatch.setattr(data.image_storage, 'compute_quick_hash', lambda source: 'collision')
+    paths = [make_image(f'{i}.png', color=(i, 0, 0)) for i in range(4)]
+    copy = str(tmp_path / 'copy.png')
+    shutil.copy(paths[0], copy)
+
+    storage = ImageStorage(lazy=True, dedupe=True)
+    wait(list(storage.load_images(paths + [copy], workers=4).values()))
+
+    assert storage.get_canonical_path(copy) == storage.get_canonical_path(paths[0])
+    assert len({storage.get_canonical_path(path) for path in paths}) == 4
+
+
+def test_read_ahead_only_used_by_its_caller(make_image):
+    paths = [make_image(f'{i}.png', color=(0, i * 30, 0)) for i in range(3)]
+    storage = ImageStorage(lazy=True)
+    for path in paths:
+        assert storage.load_image(path)
+
+    with storage.prefetch(paths, window=3) as read_ahead:
+        # 其他调用者（如预览）解码时不会取走导出的预读数据
+        assert storage.get_image(paths[0]) is not None
+        assert read_ahead.get_stats()['read_ahead_pending'] == 3
+
+        assert storage.get_image(paths[1], read_ahead) is not None
+        stats = read_ahead.get_stats()
+        assert stats['read_ahead_hits'] == 1
+        assert stats['read_ahead_misses'] == 0
+
+
+
+def test_import_files_reads_each_file_once(make_image, monkeypatch):
+    paths = [make_image(f'{i}.jpg', size=(100 + i, 80)) for i in range(5)]
+    opened = []
+    real_open = Image.open
+
+    def counting_open(*args, **kwargs):
+        opened.append(args[0])
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(Image, 'open', counting_open)
+    storage = ImageStorage(lazy=True, dedupe=True, catalog=ImageCatalog())
+
+    assert storage.import_files(paths) == paths
+    assert len(opened) == len(paths)
+    info = storage.get_image_info(paths[2])
+    assert info['size'] == (102, 80)
+    assert info['format'] == 'JPEG'
+    assert info['mode'] == 'RGB'
+    assert storage.catalog.count() == len(paths)
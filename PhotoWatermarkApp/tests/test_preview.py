@@ -0,0 +1,167 @@
+"""
+预览后台渲染、草稿与精细切换和分块缩放预览测试（offscreen界面）
+"""
+
+import threading
+
+import pytest
+
+from data.image_storage import ImageStorage
+
+
+WATERMARK = {
+    'type': 'text',
+    'text': 'Preview',
+    'font_size': 200,
+    'color': (255, 255, 255),
+    'opacity': 0.6,
+    'position': 'center',
+    'rotation': 0
+}
+
+
+def test_renderer_keeps_only_latest_request(qapp, wait_until):
+    from ui.preview_renderer import PreviewRenderer
+
+    renderer = PreviewRenderer(debounce_ms=20)
+    delivered = []
+    renderer.layer_ready.connect(lambda *args: delivered.append(args))
+
+    for size in range(100, 200, 10):
+        renderer.request(dict(WATERMARK, font_size=size))
+    wait_until(lambda: delivered)
+
+    # 连续的请求被合并，只交付最后一次请求的图层
+    generation, key, layer, base = delivered[-1]
+    assert len(delivered) == 1
+    assert generation == renderer.generation
+    assert key == renderer.watermark_processor.get_layer_key(dict(WATERMARK, font_size=190))
+    assert layer is not None
+    assert base is None
+    renderer.shutdown()
+
+
+def test_renderer_shutdown_stops_delivery(qapp, wait_until):
+    import time
+    from PyQt6.QtCore import QObject
+    from core.watermark_processor import WatermarkProcessor
+    from ui.preview_renderer import PreviewRenderer
+
+    delivered = []
+    started = threading.Event()
+
+    class Receiver(QObject):
+        def on_layer_ready(self, *args):
+            delivered.append(args)
+
+    class SlowProcessor(WatermarkProcessor):
+        def get_watermark_layer(self, watermark_params):
+            started.set()
+            time.sleep(0.3)
+            return super().get_watermark_layer(watermark_params)
+
+    receiver = Receiver()
+    renderer = PreviewRenderer(SlowProcessor(), parent=receiver)
+    renderer.layer_ready.connect(receiver.on_layer_ready)
+
+    renderer.request(dict(WATERMARK, font_size=20), immediate=True)
+    assert started.wait(5)
+    renderer.shutdown()
+    receiver.deleteLater()
+    deadline = time.time() + 0.6
+    while time.time() < deadline:
+        qapp.processEvents()
+        time.sleep(0.01)
+    assert delivered == []
+
+
+@pytest.fixture
+def preview(qapp, make_image):
+    """显示一张大图的预览区域，图片存储为延迟加载模式"""
+    from ui.preview_area import PreviewArea
+
+    path = make_image('large.jpg', size=(4000, 3000), noise=True)
+    storage = ImageStorage(lazy=True)
+    assert storage.load_image(path)
+
+    area = PreviewArea()
+    area.set_image_storage(storage)
+    area.resize(900, 700)
+    area.show()
+    qapp.processEvents()
+    yield area, storage, path
+    area.renderer.shutdown()
+    area.tiled.shutdown()
+    area.close()
+
+
+def is_settled(area):
+    """预览没有等待中的代理图，且显示的水印图层与当前参数一致"""
+    if area.pending_proxy is not None or area.compositor.frame is None:
+        return False
+    return area.compositor.layer_key == area.watermark_processor.get_layer_key(area.get_layer_params())
+
+
+def test_select_does_not_decode_original(preview, wait_until):
+    from ui.preview_area import QUALITY_DRAFT
+
+    area, storage, path = preview
+    area.update_preview(path, dict(WATERMARK))
+    area.refine_timer.stop()
+
+    # 代理图在后台线程中从预览层级生成，界面线程不解码原图
+    assert area.compositor.frame is None
+    wait_until(lambda: is_settled(area))
+    assert area.quality == QUALITY_DRAFT
+    assert path not in storage.images
+
+
+def test_drag_during_refine_keeps_draft_layer(preview, wait_until):
+    from ui.preview_area import QUALITY_DRAFT, QUALITY_FINAL
+
+    area, _, path = preview
+    area.update_preview(path, dict(WATERMARK))
+    area.refine_timer.stop()
+    wait_until(lambda: is_settled(area))
+    draft_key = area.compositor.layer_key
+
+    # 细化开始后、精细图层交付前开始拖动，回到草稿代理图
+    area.refine_preview()
+    assert area.pending_proxy[0][0] == QUALITY_FINAL
+    if area.begin_interaction():
+        area.render_preview()
+    area.refine_timer.stop()
+    wait_until(lambda: is_settled(area))
+
+    assert area.quality == QUALITY_DRAFT
+    assert area.compositor.layer_key == draft_key
+
+
+def test_tiled_preview_renders_off_gui_thread(preview, wait_until, monkeypatch):
+    area, storage, path = preview
+    area.update_preview(path, dict(WATERMARK))
+    area.refine_timer.stop()
+    wait_until(lambda: is_settled(area))
+
+    layer_threads = []
+    real_layer = area.watermark_processor.get_watermark_layer
+
+    def recording_layer(params):
+        layer_threads.append(threading.current_thread())
+        return real_layer(params)
+
+    monkeypatch.setattr(area.watermark_processor, 'get_watermark_layer', recording_layer)
+
+    area.set_zoom(1.0)
+    assert area.tiled.is_active()
+    area.preview_label.repaint()
+    wait_until(lambda: not area.tiled._futures and area.tiled._layer is not None)
+    area.preview_label.repaint()
+
+    # 原图、分块和水印图层都在后台线程中生成
+    assert area.tiled.tiles_rendered > 0
+    assert path in storage.images
+    assert layer_threads and threading.main_thread() not in layer_threads
+
+    area.tiled.shutdown()
+    assert area.tiled._closed
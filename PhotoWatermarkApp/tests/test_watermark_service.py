@@ -0,0 +1,83 @@
+"""
+水印HTTP服务测试
+"""
+
+import asyncio
+import io
+import json
+
+from PIL import Image
+
+from core.watermark_service import WatermarkService
+from data.template_storage import TemplateStorage
+
+
+TEMPLATE = {
+    'type': 'text',
+    'text': 'Test',
+    'font_size': 24,
+    'color': [255, 255, 255],
+    'opacity': 0.5,
+    'position': 'bottom_right',
+    'rotation': 0
+}
+
+
+async def request(port, method, target, body=b''):
+    """发送一个HTTP/1.1请求，返回状态码、响应头和响应体"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    head = f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+    if method == 'POST':
+        head += f"Content-Length: {len(body)}\r\n"
+    writer.write(head.encode('ascii') + b"\r\n" + body)
+    await writer.drain()
+
+    status_line = (await reader.readline()).decode('ascii')
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, value = line.split(':', 1)
+        headers[name.strip().lower()] = value.strip()
+    data = await reader.readexactly(int(headers['content-length']))
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1]), headers, data
+
+
+def test_service_watermarks_images(tmp_path):
+    template_dir = str(tmp_path / 'templates')
+    TemplateStorage(template_dir).save_template('sample', TEMPLATE)
+    source = io.BytesIO()
+    Image.new('RGB', (200, 150), (10, 20, 30)).save(source, 'PNG')
+
+    async def run():
+        service = WatermarkService(port=0, template_dir=template_dir, workers=1)
+        port = await service.start()
+        try:
+            status, _, data = await request(port, 'GET', '/health')
+            assert status == 200
+            health = json.loads(data)
+            assert health['status'] == 'ok' and health['templates'] == ['sample']
+
+            status, headers, data = await request(port, 'POST', '/watermark?template=sample&format=JPEG', source.getvalue())
+            assert status == 200
+            assert headers['content-type'] == 'image/jpeg'
+            result = Image.open(io.BytesIO(data))
+            assert result.format == 'JPEG' and result.size == (200, 150)
+
+            status, _, _ = await request(port, 'POST', '/watermark?template=missing', source.getvalue())
+            assert status == 404
+            status, _, _ = await request(port, 'POST', '/watermark?template=../sample', source.getvalue())
+            assert status == 404
+            status, _, _ = await request(port, 'GET', '/watermark?template=sample')
+            assert status == 405
+
+            status, _, data = await request(port, 'GET', '/metrics')
+            metrics = json.loads(data)
+            assert metrics['images_processed'] == 1
+        finally:
+            await service.stop()
+
+    asyncio.run(run())
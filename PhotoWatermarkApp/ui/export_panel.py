@@ -27,7 +27,9 @@ class ExportPanel(QWidget):
             'resize_height': 0,
             'keep_aspect_ratio': True,
             'filename_pattern': '{original_name}_watermarked',
-            'overwrite_existing': False
+            'overwrite_existing': False,
+            'archive_format': '',
+            'duplicates': 'export'
         }
         self.init_ui()
 
@@ -68,6 +70,35 @@ class ExportPanel(QWidget):
 
         output_layout.addLayout(format_layout)
 
+        # 输出方式：直接写入文件夹，或打包为归档文件
+        archive_layout = QHBoxLayout()
+        archive_label = QLabel("输出方式:")
+        self.archive_combo = QComboBox()
+        self.archive_combo.addItem("文件夹", '')
+        self.archive_combo.addItem("ZIP压缩包", 'zip')
+        self.archive_combo.addItem("TAR归档", 'tar')
+        self.archive_combo.currentIndexChanged.connect(self.on_archive_changed)
+
+        archive_layout.addWidget(archive_label)
+        archive_layout.addWidget(self.archive_combo)
+
+        output_layout.addLayout(archive_layout)
+
+        # 内容重复的图片：照常导出、跳过，或链接到同内容图片的导出结果
+        duplicates_layout = QHBoxLayout()
+        duplicates_label = QLabel("重复图片:")
+        self.duplicates_combo = QComboBox()
+        self.duplicates_combo.addItem("照常导出", 'export')
+        self.duplicates_combo.addItem("跳过", 'skip')
+        self.duplicates_combo.addItem("链接到首张", 'link')
+        self.duplicates_combo.setToolTip("内容完全相同的图片只处理一次")
+        self.duplicates_combo.currentIndexChanged.connect(self.on_duplicates_changed)
+
+        duplicates_layout.addWidget(duplicates_label)
+        duplicates_layout.addWidget(self.duplicates_combo)
+
+        output_layout.addLayout(duplicates_layout)
+
         # JPEG质量
         quality_layout = QHBoxLayout()
         quality_label = QLabel("JPEG质量:")
@@ -178,6 +209,16 @@ class ExportPanel(QWidget):
         self.export_params['file_format'] = format
         self.update_export_params()
 
+    def on_archive_changed(self, index):
+        """处理输出方式变更"""
+        self.export_params['archive_format'] = self.archive_combo.itemData(index)
+        self.update_export_params()
+
+    def on_duplicates_changed(self, index):
+        """处理重复图片处理方式变更"""
+        self.export_params['duplicates'] = self.duplicates_combo.itemData(index)
+        self.update_export_params()
+
     def on_quality_changed(self, quality):
         """处理JPEG质量变更"""
         self.export_params['quality'] = quality
@@ -2,26 +2,183 @@
 图片列表视图组件
 """
 
+import time
+import queue
+import itertools
+import threading
+
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem, QLabel,
-    QPushButton, QScrollArea, QFileDialog, QMessageBox
+    QPushButton, QScrollArea, QFileDialog, QMessageBox, QLineEdit, QComboBox, QCheckBox
 )
-from PyQt6.QtGui import QPixmap, QIcon
-from PyQt6.QtCore import Qt, pyqtSignal, QSize
+from PyQt6.QtGui import QPixmap, QIcon, QImage
+from PyQt6.QtCore import Qt, pyqtSignal, QSize, QThread, QTimer
 
+from core.file_processor import FileProcessor
 from data.image_storage import ImageStorage
+from data.thumbnail_cache import ThumbnailCache
+from utils.ui_utils import pil_to_qimage
+
+
+class FolderImportWorker(QThread):
+    """文件夹导入线程，在后台遍历文件夹，分批并发读取文件头导入图片，分批通知界面"""
+
+    # 一批图片加载完成时发出，参数为图片路径列表
+    images_loaded = pyqtSignal(list)
+    # 导入结束时发出，参数为成功数量和失败数量
+    import_finished = pyqtSignal(int, int)
+
+    def __init__(self, image_storage, folder, recursive=True, include=None, exclude=None,
+                 batch_size=50, batch_interval=0.1, thumbnail_cache=None):
+        super().__init__()
+        self.image_storage = image_storage
+        self.thumbnail_cache = thumbnail_cache
+        self.folder = folder
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+
+    def run(self):
+        """遍历文件夹并加载图片"""
+        file_processor = FileProcessor()
+        file_processor.image_storage = self.image_storage
+
+        loaded_count = 0
+        failed_count = 0
+        batch = []
+        last_emit = time.monotonic()
+        pending = []
+
+        file_paths = file_processor.scan_folder(self.folder, self.recursive, self.include, self.exclude)
+        for file_path in itertools.chain(file_paths, [None]):
+            if self.isInterruptionRequested():
+                break
+
+            # 跳过已导入的图片，其余的凑满一批再导入，由图片目录并发读取文件头和EXIF
+            if file_path is not None:
+                if not self.image_storage.has_image(file_path):
+                    pending.append(file_path)
+                if len(pending) < self.batch_size:
+                    continue
+            if not pending:
+                continue
+
+            loaded = self.image_storage.import_files(pending)
+            failed_count += len(pending) - len(loaded)
+            pending = []
+
+            for loaded_path in loaded:
+                if self.isInterruptionRequested():
+                    break
+                # 在后台线程中准备缩略图，界面线程只需读取缓存的小文件
+                if self.thumbnail_cache is not None:
+                    self.thumbnail_cache.get_thumbnail_path(loaded_path)
+                batch.append(loaded_path)
+                loaded_count += 1
+
+                # 按数量或时间分批通知，第一批图片尽快显示
+                if len(batch) >= self.batch_size or time.monotonic() - last_emit >= self.batch_interval:
+                    self.images_loaded.emit(batch)
+                    batch = []
+                    last_emit = time.monotonic()
+
+        if batch:
+            self.images_loaded.emit(batch)
+        self.import_finished.emit(loaded_count, failed_count)
+
+
+class ThumbnailWorker(QThread):
+    """缩略图线程，在后台生成列表中缺失的缩略图，生成后通知界面更新图标"""
+
+    # 图标图像准备好时发出，参数为图片路径和QImage
+    thumbnail_ready = pyqtSignal(str, object)
+
+    def __init__(self, thumbnail_cache, image_storage, icon_size):
+        super().__init__()
+        self.thumbnail_cache = thumbnail_cache
+        self.image_storage = image_storage
+        self.icon_size = icon_size
+        self.queue = queue.Queue()
+        self.pending = set()  # 已排队但尚未处理的图片路径，避免重复生成
+        self.lock = threading.Lock()
+
+    def enqueue(self, file_path):
+        """将图片加入生成队列，已在队列中时忽略"""
+        with self.lock:
+            if file_path in self.pending:
+                return
+            self.pending.add(file_path)
+        self.queue.put(file_path)
+
+    def clear_pending(self):
+        """放弃尚未处理的图片，列表清空或刷新后调用"""
+        with self.lock:
+            self.pending.clear()
+
+    def run(self):
+        """依次生成队列中的缩略图"""
+        while not self.isInterruptionRequested():
+            try:
+                file_path = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            with self.lock:
+                if file_path not in self.pending:
+                    continue
+
+            image = self.load_icon_image(file_path)
+            with self.lock:
+                self.pending.discard(file_path)
+            if image is not None:
+                self.thumbnail_ready.emit(file_path, image)
+
+    def load_icon_image(self, file_path):
+        """
+        生成图标图像，缩略图不可用时使用图片存储中最小的预览层级，不解码原图
+
+        Returns:
+            QImage对象，生成失败时返回None
+        """
+        thumbnail_path = self.thumbnail_cache.get_thumbnail_path(file_path)
+        if thumbnail_path:
+            image = QImage(thumbnail_path)
+            if not image.isNull():
+                return image
+
+        preview = self.image_storage.get_preview(file_path, self.icon_size)
+        return None if preview is None else pil_to_qimage(preview)
 
 
 class ImageView(QWidget):
-    """图片列表视图组件"""
+    """图片列表视图组件，列表内容从图片目录中分页查询，滚动到底部时加载下一页"""
 
-    # 自定义信号：当图片被选中时发出
+    # 自定义信号：当图片被选中时发出，参数为图片路径，清空列表时为None
     image_selected = pyqtSignal(object)
 
+    # 每页加载的图片数
+    PAGE_SIZE = 200
+
+    # 排序选项：显示名称和排序方式
+    SORT_OPTIONS = [
+        ("导入顺序", "imported"),
+        ("文件名", "name"),
+        ("拍摄时间", "taken_at"),
+        ("文件大小", "size"),
+        ("修改时间", "mtime"),
+        ("尺寸", "pixels")
+    ]
+
     def __init__(self):
         super().__init__()
         self.image_storage = None  # 将在主窗口中设置
-        self.current_image = None
+        self.current_image_path = None  # 当前选中的图片路径，该图片的预览图在缓存中被固定
+        self.folder_worker = None
+        self.thumbnail_cache = ThumbnailCache()  # 列表图标使用的磁盘缩略图缓存
+        self.thumbnail_worker = None  # 在后台生成缺失的缩略图，首次需要时启动
+        self.list_exhausted = True  # 列表是否已加载符合条件的全部图片
         self.init_ui()
         
     def set_image_storage(self, storage):
@@ -43,6 +200,13 @@ class ImageView(QWidget):
         import_btn.clicked.connect(self.import_images)
         toolbar_layout.addWidget(import_btn)
 
+        # 导入文件夹按钮
+        import_folder_btn = QPushButton("导入文件夹")
+        import_folder_btn.setIcon(QIcon("resources/icons/import_folder.png"))
+        import_folder_btn.setToolTip("导入文件夹及其子文件夹中的所有图片")
+        import_folder_btn.clicked.connect(self.import_folder)
+        toolbar_layout.addWidget(import_folder_btn)
+
         # 清空按钮
         clear_btn = QPushButton("清空列表")
         clear_btn.setIcon(QIcon("resources/icons/clear.png"))
@@ -54,6 +218,40 @@ class ImageView(QWidget):
 
         layout.addLayout(toolbar_layout)
 
+        # 筛选和排序工具栏
+        filter_layout = QHBoxLayout()
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("按文件名筛选")
+        self.search_edit.setClearButtonEnabled(True)
+        filter_layout.addWidget(self.search_edit, 1)
+
+        self.camera_combo = QComboBox()
+        self.camera_combo.addItem("全部相机", None)
+        self.camera_combo.setToolTip("按拍摄相机筛选")
+        filter_layout.addWidget(self.camera_combo)
+
+        filter_layout.addWidget(QLabel("排序:"))
+        self.sort_combo = QComboBox()
+        for name, order_by in self.SORT_OPTIONS:
+            self.sort_combo.addItem(name, order_by)
+        filter_layout.addWidget(self.sort_combo)
+
+        self.descending_check = QCheckBox("降序")
+        filter_layout.addWidget(self.descending_check)
+
+        layout.addLayout(filter_layout)
+
+        # 输入文字时延迟刷新，避免每输入一个字符都查询一次
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.refresh_list)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        self.camera_combo.currentIndexChanged.connect(self.refresh_list)
+        self.sort_combo.currentIndexChanged.connect(self.refresh_list)
+        self.descending_check.toggled.connect(self.refresh_list)
+
         # 图片列表区域
         self.image_list = QListWidget()
         self.image_list.setIconSize(QSize(100, 100))
@@ -64,6 +262,8 @@ class ImageView(QWidget):
 
         # 连接选择信号
         self.image_list.itemClicked.connect(self.on_image_selected)
+        # 滚动到底部时加载下一页
+        self.image_list.verticalScrollBar().valueChanged.connect(self.on_list_scrolled)
 
         # 添加到布局
         layout.addWidget(self.image_list)
@@ -73,26 +273,185 @@ class ImageView(QWidget):
         # 打开文件选择对话框
         file_dialog = QFileDialog()
         file_dialog.setFileMode(QFileDialog.FileMode.ExistingFiles)
-        file_dialog.setNameFilter("图片文件 (*.jpg *.jpeg *.png *.bmp *.tiff)")
+        file_dialog.setNameFilter("图片文件 (*.jpg *.jpeg *.png *.bmp *.tiff);;ZIP压缩包 (*.zip)")
 
         if file_dialog.exec():
             selected_files = file_dialog.selectedFiles()
             if selected_files:
-                # 加载选中的图片
-                loaded_count = 0
-                for file_path in selected_files:
-                    if self.image_storage.load_image(file_path):
-                        # 添加到列表
-                        item = QListWidgetItem(QIcon(file_path), file_path)
-                        self.image_list.addItem(item)
-                        loaded_count += 1
+                # 导入选中的图片，ZIP压缩包无需解压，直接导入其中的图片
+                loaded_paths = self.image_storage.import_files(self.image_storage.expand_archives(selected_files))
 
                 # 显示结果信息
-                if loaded_count > 0:
-                    self.show_status_message(f"成功导入 {loaded_count} 张图片")
+                if loaded_paths:
+                    self.add_image_items(loaded_paths)
+                    self.on_catalog_changed()
+                    self.show_status_message(f"成功导入 {len(loaded_paths)} 张图片")
                 else:
                     QMessageBox.warning(self, "导入失败", "没有成功导入任何图片")
 
+    def import_folder(self):
+        """导入文件夹"""
+        folder = QFileDialog.getExistingDirectory(self, "选择图片文件夹")
+        if folder:
+            self.start_folder_import(folder)
+
+    def start_folder_import(self, folder, recursive=True, include=None, exclude=None):
+        """
+        在后台线程中导入文件夹
+
+        Args:
+            folder: 文件夹路径
+            recursive: 是否包含子文件夹
+            include: 包含的文件通配符列表
+            exclude: 排除的文件或文件夹通配符列表
+        """
+        self.stop_folder_import()
+
+        self.folder_worker = FolderImportWorker(
+            self.image_storage, folder, recursive, include, exclude,
+            thumbnail_cache=self.thumbnail_cache
+        )
+        self.folder_worker.images_loaded.connect(self.add_image_items)
+        self.folder_worker.import_finished.connect(self.on_folder_import_finished)
+        self.folder_worker.start()
+        self.show_status_message(f"正在导入文件夹: {folder}")
+
+    def stop_folder_import(self):
+        """停止正在进行的文件夹导入"""
+        if self.folder_worker is not None:
+            self.folder_worker.requestInterruption()
+            self.folder_worker.wait()
+            self.folder_worker = None
+
+    def add_image_items(self, file_paths):
+        """
+        处理新加载的图片：按导入顺序显示且未筛选时，新图片位于列表末尾，
+        列表已加载到末尾时接着加载；排序或筛选时在导入完成后刷新列表
+        """
+        if self.list_exhausted and not self.is_filtered():
+            self.list_exhausted = False
+            self.fetch_more_items()
+
+        self.show_status_message(f"正在导入... 已导入 {self.image_storage.count_images()} 张图片")
+
+    def get_filters(self):
+        """获取当前的筛选条件"""
+        return {
+            'name': self.search_edit.text().strip() or None,
+            'camera': self.camera_combo.currentData()
+        }
+
+    def get_sort_order(self):
+        """获取当前的排序方式和是否降序"""
+        return self.sort_combo.currentData(), self.descending_check.isChecked()
+
+    def is_filtered(self):
+        """检查列表是否经过筛选或不按导入顺序排列"""
+        order_by, descending = self.get_sort_order()
+        return order_by != 'imported' or descending or any(self.get_filters().values())
+
+    def get_filtered_image_paths(self):
+        """获取符合当前筛选条件的所有图片路径，按当前排序方式排列"""
+        order_by, descending = self.get_sort_order()
+        return self.image_storage.query_image_paths(order_by, descending, **self.get_filters())
+
+    def refresh_list(self):
+        """按当前的筛选条件和排序方式重新查询列表的第一页"""
+        if self.image_storage is None:
+            return
+
+        self.image_list.clear()
+        if self.thumbnail_worker is not None:
+            self.thumbnail_worker.clear_pending()
+        self.list_exhausted = False
+        self.fetch_more_items()
+
+        if self.is_filtered():
+            self.show_status_message(f"符合条件的图片: {self.image_storage.count_images(**self.get_filters())} 张")
+
+    def fetch_more_items(self):
+        """从图片目录中查询下一页图片并添加到列表"""
+        if self.list_exhausted or self.image_storage is None:
+            return
+
+        order_by, descending = self.get_sort_order()
+        file_paths = self.image_storage.query_image_paths(
+            order_by, descending, offset=self.image_list.count(), limit=self.PAGE_SIZE, **self.get_filters()
+        )
+        for file_path in file_paths:
+            item = QListWidgetItem(self.create_icon(file_path), file_path)
+            self.image_list.addItem(item)
+
+        self.list_exhausted = len(file_paths) < self.PAGE_SIZE
+
+    def on_list_scrolled(self, value):
+        """滚动到接近底部时加载下一页"""
+        scroll_bar = self.image_list.verticalScrollBar()
+        if value >= scroll_bar.maximum() - scroll_bar.pageStep() // 2:
+            self.fetch_more_items()
+
+    def on_catalog_changed(self):
+        """图片目录变化后更新相机列表，排序或筛选时刷新列表"""
+        current_camera = self.camera_combo.currentData()
+        self.camera_combo.blockSignals(True)
+        self.camera_combo.clear()
+        self.camera_combo.addItem("全部相机", None)
+        cameras = self.image_storage.catalog.get_cameras() if self.image_storage.catalog is not None else []
+        for camera in cameras:
+            self.camera_combo.addItem(camera, camera)
+        index = self.camera_combo.findData(current_camera)
+        self.camera_combo.setCurrentIndex(max(0, index))
+        self.camera_combo.blockSignals(False)
+
+        if self.is_filtered():
+            self.refresh_list()
+
+    def create_icon(self, file_path):
+        """根据已缓存的缩略图创建列表图标，缩略图缺失时先显示空图标，由后台线程生成后更新"""
+        thumbnail_path = self.thumbnail_cache.find_thumbnail_path(file_path)
+        if thumbnail_path:
+            return QIcon(thumbnail_path)
+
+        self.get_thumbnail_worker().enqueue(file_path)
+        return QIcon()
+
+    def get_thumbnail_worker(self):
+        """获取缩略图线程，首次调用时启动"""
+        if self.thumbnail_worker is None:
+            icon_size = self.image_list.iconSize()
+            self.thumbnail_worker = ThumbnailWorker(
+                self.thumbnail_cache, self.image_storage, max(icon_size.width(), icon_size.height())
+            )
+            self.thumbnail_worker.thumbnail_ready.connect(self.on_thumbnail_ready)
+            self.thumbnail_worker.start()
+        return self.thumbnail_worker
+
+    def stop_thumbnail_worker(self):
+        """停止缩略图线程"""
+        if self.thumbnail_worker is not None:
+            self.thumbnail_worker.requestInterruption()
+            self.thumbnail_worker.wait()
+            self.thumbnail_worker = None
+
+    def on_thumbnail_ready(self, file_path, image):
+        """后台生成缩略图后更新对应列表项的图标"""
+        items = self.image_list.findItems(file_path, Qt.MatchFlag.MatchExactly)
+        if items:
+            icon = QIcon(QPixmap.fromImage(image))
+            for item in items:
+                item.setIcon(icon)
+
+    def on_folder_import_finished(self, loaded_count, failed_count):
+        """处理文件夹导入完成"""
+        self.on_catalog_changed()
+        if loaded_count > 0:
+            message = f"成功导入 {loaded_count} 张图片"
+            if failed_count > 0:
+                message += f"，{failed_count} 张导入失败"
+            self.show_status_message(message)
+        else:
+            QMessageBox.warning(self, "导入失败", "文件夹中没有可导入的图片")
+
     def clear_list(self):
         """清空图片列表"""
         reply = QMessageBox.question(
@@ -103,37 +462,42 @@ class ImageView(QWidget):
         )
 
         if reply == QMessageBox.StandardButton.Yes:
+            self.stop_folder_import()
             self.image_list.clear()
+            if self.thumbnail_worker is not None:
+                self.thumbnail_worker.clear_pending()
             self.image_storage.clear()
-            self.current_image = None
+            self.list_exhausted = True
+            self.on_catalog_changed()
+            self.current_image_path = None
             self.image_selected.emit(None)
             self.show_status_message("图片列表已清空")
 
     def on_image_selected(self, item):
-        """处理图片选择事件"""
+        """
+        处理图片选择事件：只读取图片信息，不在界面线程中解码原图；
+        预览从图片存储的预览图生成，原图只在缩放查看细节和导出时按需解码
+        """
         if item:
             file_path = item.text()
-            image = self.image_storage.get_image(file_path)
 
-            if image:
-                self.current_image = image
-                self.image_selected.emit(image)
-                self.show_status_message(f"已选择: {file_path}")
-            else:
+            if self.image_storage.get_image_info(file_path) is None:
                 QMessageBox.warning(self, "加载失败", f"无法加载图片: {file_path}")
+                return
+
+            # 固定选中图片的预览图，避免预览期间被缓存淘汰；先固定再生成，生成后立即受保护
+            if file_path != self.current_image_path:
+                self.image_storage.pin_previews(file_path)
+                if self.current_image_path:
+                    self.image_storage.unpin_previews(self.current_image_path)
+                self.current_image_path = file_path
 
-    def get_selected_image(self):
-        """获取当前选中的图片"""
-        return self.current_image
+            self.image_selected.emit(file_path)
+            self.show_status_message(f"已选择: {file_path}")
 
     def get_selected_image_path(self):
         """获取当前选中图片的路径"""
-        if self.current_image:
-            # 获取当前选中的列表项
-            selected_items = self.image_list.selectedItems()
-            if selected_items:
-                return selected_items[0].text()
-        return None
+        return self.current_image_path
 
     def show_status_message(self, message):
         """显示状态消息"""
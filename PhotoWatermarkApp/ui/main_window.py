@@ -2,6 +2,8 @@
 主窗口UI组件
 """
 
+from datetime import datetime
+
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QMenuBar, 
     QMenu, QStatusBar, QMessageBox
@@ -14,6 +16,7 @@ from .preview_area import PreviewArea
 from .watermark_panel import WatermarkPanel
 from .export_panel import ExportPanel
 from data.image_storage import ImageStorage
+from data.image_catalog import ImageCatalog
 
 
 class MainWindow(QMainWindow):
@@ -21,8 +24,10 @@ class MainWindow(QMainWindow):
 
     def __init__(self):
         super().__init__()
-        # 创建共享的图片存储实例
-        self.image_storage = ImageStorage()
+        # 创建共享的图片存储实例，导入时只读取文件头，选中或导出时才解码；
+        # 超出内存预算的图片写入磁盘像素缓存，再次选中时无需重新解码；内容相同的图片只解码一次
+        # 图片目录用于列表的排序、筛选和分页查询
+        self.image_storage = ImageStorage(lazy=True, spill=True, dedupe=True, catalog=ImageCatalog())
         self.init_ui()
 
     def init_ui(self):
@@ -49,6 +54,8 @@ class MainWindow(QMainWindow):
 
         # 中间：预览区域
         self.preview_area = PreviewArea()
+        # 预览的代理图从图片存储的预览图生成
+        self.preview_area.set_image_storage(self.image_storage)
         main_layout.addWidget(self.preview_area, 2)
 
         # 右侧：控制面板（垂直分为水印设置和导出设置）
@@ -92,6 +99,13 @@ class MainWindow(QMainWindow):
         import_action.triggered.connect(self.import_images)
         file_menu.addAction(import_action)
 
+        # 导入文件夹
+        import_folder_action = QAction(QIcon("resources/icons/import_folder.png"), "导入文件夹(&D)", self)
+        import_folder_action.setShortcut("Ctrl+Shift+O")
+        import_folder_action.setStatusTip("导入文件夹及其子文件夹中的所有图片")
+        import_folder_action.triggered.connect(self.import_folder)
+        file_menu.addAction(import_folder_action)
+
         # 导出图片
         export_action = QAction(QIcon("resources/icons/export.png"), "导出图片(&E)", self)
         export_action.setShortcut("Ctrl+E")
@@ -171,6 +185,14 @@ class MainWindow(QMainWindow):
         manual_action.triggered.connect(self.show_manual)
         help_menu.addAction(manual_action)
 
+        # 调试：在预览左上角显示当前预览质量
+        quality_overlay_action = QAction("显示预览质量(&Q)", self)
+        quality_overlay_action.setShortcut("F12")
+        quality_overlay_action.setCheckable(True)
+        quality_overlay_action.setStatusTip("在预览左上角显示当前预览质量和代理图尺寸")
+        quality_overlay_action.toggled.connect(self.toggle_quality_overlay)
+        help_menu.addAction(quality_overlay_action)
+
         help_menu.addSeparator()
 
         # 关于
@@ -190,9 +212,9 @@ class MainWindow(QMainWindow):
         # 导出参数变化信号
         self.export_panel.export_params_changed.connect(self.on_export_params_changed)
         
-    def on_image_selected(self, image):
+    def on_image_selected(self, file_path):
         """处理图片选择事件"""
-        if image:
+        if file_path:
             # 获取当前水印参数
             watermark_params = self.watermark_panel.get_watermark_params()
             # 确保水印参数中的图片类型与当前面板一致
@@ -200,8 +222,8 @@ class MainWindow(QMainWindow):
                 watermark_params['type'] = self.watermark_panel.watermark_type
                 self.watermark_panel.watermark_params = watermark_params
             # 更新预览
-            self.preview_area.update_preview(image, watermark_params)
-            self.status_bar.showMessage(f"已选择图片: {self.image_view.get_selected_image_path()}")
+            self.preview_area.update_preview(file_path, watermark_params)
+            self.status_bar.showMessage(f"已选择图片: {file_path}")
         else:
             self.preview_area.update_preview(None)
             self.status_bar.showMessage("请选择一张图片")
@@ -209,10 +231,10 @@ class MainWindow(QMainWindow):
     def on_watermark_params_changed(self, params):
         """处理水印参数变化"""
         # 获取当前选中的图片
-        current_image = self.image_view.get_selected_image()
-        if current_image:
-            # 更新预览
-            self.preview_area.update_preview(current_image, params)
+        current_path = self.image_view.get_selected_image_path()
+        if current_path:
+            # 参数连续变化时合并请求，在后台线程中渲染最新的预览
+            self.preview_area.schedule_preview(current_path, params)
             self.status_bar.showMessage("水印参数已更新")
         else:
             # 如果没有选择图片，仍然更新水印参数，但不更新预览
@@ -228,6 +250,10 @@ class MainWindow(QMainWindow):
         # 调用image_view的导入功能
         self.image_view.import_images()
 
+    def import_folder(self):
+        """导入文件夹"""
+        self.image_view.import_folder()
+
     def export_images(self):
         """导出图片"""
         # 获取导出参数
@@ -238,8 +264,9 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "警告", "请先选择输出文件夹")
             return
             
-        # 检查是否有图片可导出
-        if not self.image_storage.get_all_image_paths():
+        # 导出列表中符合当前筛选条件的图片，按列表的排序方式编号
+        image_paths = self.image_view.get_filtered_image_paths()
+        if not image_paths:
             QMessageBox.warning(self, "警告", "没有可导出的图片")
             return
             
@@ -253,9 +280,19 @@ class MainWindow(QMainWindow):
             "file_format": export_params["file_format"],
             "quality": export_params["quality"],
             "filename_pattern": export_params["filename_pattern"],
-            "overwrite_existing": export_params["overwrite_existing"]
+            "overwrite_existing": export_params["overwrite_existing"],
+            "duplicates": export_params.get("duplicates", "export"),
+            # 预读后续原图，原图位于网络存储时读取与处理重叠
+            "read_ahead": 4,
+            "image_paths": image_paths
         }
         
+        # 如果选择了归档输出，所有图片直接写入一个归档文件
+        if export_params.get("archive_format"):
+            date_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+            export_kwargs["archive_path"] = f"watermarked_{date_str}.{export_params['archive_format']}"
+            export_kwargs["archive_format"] = export_params["archive_format"]
+
         # 如果设置了调整尺寸，添加到导出参数
         if export_params["resize_width"] > 0 and export_params["resize_height"] > 0:
             export_kwargs["resize_size"] = (export_params["resize_width"], export_params["resize_height"])
@@ -280,6 +317,14 @@ class MainWindow(QMainWindow):
             self.status_bar.showMessage(f"导出完成: {success_count}/{total_count} 张图片成功")
             QMessageBox.warning(self, "部分成功", f"导出完成: {success_count}/{total_count} 张图片成功")
 
+    def closeEvent(self, event):
+        """关闭窗口前停止后台导入、缩略图生成和预览渲染"""
+        self.image_view.stop_folder_import()
+        self.image_view.stop_thumbnail_worker()
+        self.preview_area.renderer.shutdown()
+        self.preview_area.tiled.shutdown()
+        super().closeEvent(event)
+
     def undo_action(self):
         """撤销操作"""
         self.status_bar.showMessage("撤销功能待实现")
@@ -296,8 +341,8 @@ class MainWindow(QMainWindow):
         self.watermark_panel.type_combo.setCurrentIndex(0)
 
         # 获取当前选中的图片
-        current_image = self.image_view.get_selected_image()
-        if current_image is None:
+        current_path = self.image_view.get_selected_image_path()
+        if current_path is None:
             QMessageBox.warning(self, "警告", "请先选择一张图片")
             return
 
@@ -310,7 +355,7 @@ class MainWindow(QMainWindow):
             self.watermark_panel.watermark_params = watermark_params
 
         # 更新预览区域
-        self.preview_area.update_preview(current_image, watermark_params)
+        self.preview_area.update_preview(current_path, watermark_params)
 
         self.status_bar.showMessage("已添加文本水印")
         QMessageBox.information(self, "提示", "已添加文本水印，您可以在右侧面板调整水印设置")
@@ -335,6 +380,10 @@ class MainWindow(QMainWindow):
         self.status_bar.showMessage("用户手册功能待实现")
         QMessageBox.information(self, "提示", "用户手册功能待实现")
 
+    def toggle_quality_overlay(self, checked):
+        """切换预览质量调试信息的显示"""
+        self.preview_area.set_quality_overlay(checked)
+
     def show_about(self):
         """显示关于对话框"""
         QMessageBox.about(self, "关于照片水印应用", 
@@ -2,124 +2,672 @@
 图片预览区域组件
 """
 
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QScrollArea
-from PyQt6.QtGui import QPixmap, QPainter, QColor, QPen, QBrush, QCursor, QFont, QFontMetrics
-from PyQt6.QtCore import Qt, QPoint, pyqtSignal
+import math
+from collections import OrderedDict
+
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel
+from PyQt6.QtGui import QPainter, QColor
+from PyQt6.QtCore import Qt, QEvent, QPointF, QRectF, QTimer
 
 from PIL import Image
-from PIL.ImageQt import ImageQt
 
-from core.watermark_processor import WatermarkProcessor
+from core.watermark_processor import WatermarkProcessor, PRESET_MARGIN
+from .preview_compositor import PreviewCompositor
+from .preview_renderer import PreviewRenderer
+from .tiled_preview import TiledPreview
+
+
+# 预览质量：交互期间使用草稿，输入停止后细化为精细
+QUALITY_DRAFT = 'draft'
+QUALITY_FINAL = 'final'
+
+# 草稿代理图相对显示分辨率的比例
+DRAFT_SCALE = 0.5
+
+# 输入停止多久后细化预览（毫秒）
+REFINE_DELAY_MS = 250
+
+# 滚轮每格的缩放倍数，缩放比例取适应窗口比例乘以其整数次幂，分块缓存可在各档之间复用
+ZOOM_STEP = 1.25
+
+# 预览区域大小变化停止多久后按新尺寸重新生成代理图（毫秒）
+RESIZE_DELAY_MS = 150
+
+# 每张图片缓存的代理图数量（按质量和显示尺寸），窗口在几种尺寸间切换时无需重新缩放
+PROXY_CACHE_SIZE = 4
+
+
+class PreviewCanvas(QLabel):
+    """预览画布，居中绘制合成后的帧，帧的部分区域变化时只重绘该区域"""
+
+    def __init__(self):
+        super().__init__()
+        self.frame = None  # 合成后的帧（QImage），由PreviewCompositor更新
+        self.frame_dpr = 1.0  # 帧的设备像素比
+        self.display_size = None  # 帧的显示尺寸（物理像素），与帧尺寸不同时缩放显示
+        self.overlay_text = None  # 调试信息，显示在画布左上角
+        self.tiled = None  # 分块缩放预览，处于缩放状态时代替帧绘制
+
+    def set_frame(self, frame, device_pixel_ratio=1.0, display_size=None):
+        """
+        设置要绘制的帧并重绘整个画布
+
+        Args:
+            frame: 合成后的帧（QImage）
+            device_pixel_ratio: 设备像素比
+            display_size: 显示尺寸 (width, height)，单位为物理像素，为None时按帧尺寸一比一显示
+        """
+        self.frame = frame
+        self.frame_dpr = device_pixel_ratio
+        self.display_size = display_size or (frame.width(), frame.height())
+        self.update()
+
+    def set_overlay_text(self, text):
+        """设置画布左上角显示的调试信息，为None时不显示"""
+        if text != self.overlay_text:
+            self.overlay_text = text
+            self.update()
+
+    def clear(self):
+        """清除帧"""
+        self.frame = None
+        self.display_size = None
+        super().clear()
+        self.update()
+
+    def viewport_size(self):
+        """获取画布尺寸（物理像素）"""
+        dpr = self.devicePixelRatioF()
+        return (round(self.width() * dpr), round(self.height() * dpr))
+
+    def frame_rect(self):
+        """
+        获取帧在画布中的显示区域（逻辑像素）
+
+        Returns:
+            QRectF对象，没有帧时返回None
+        """
+        if self.frame is None or self.frame.isNull():
+            return None
+        width = self.display_size[0] / self.frame_dpr
+        height = self.display_size[1] / self.frame_dpr
+        return QRectF((self.width() - width) / 2, (self.height() - height) / 2, width, height)
+
+    def update_frame_region(self, rects):
+        """
+        重绘帧中发生变化的区域
+
+        Args:
+            rects: 帧中的区域（QRect，物理像素）列表
+        """
+        target = self.frame_rect()
+        if target is None:
+            return
+        scale = target.width() / self.frame.width()
+        for rect in rects:
+            region = QRectF(
+                target.x() + rect.x() * scale,
+                target.y() + rect.y() * scale,
+                rect.width() * scale,
+                rect.height() * scale
+            )
+            # 向外扩展一个像素，避免小数坐标取整后遗漏边缘
+            self.update(region.toAlignedRect().adjusted(-1, -1, 1, 1))
+
+    def paintEvent(self, event):
+        """绘制边框和背景，再绘制帧；Qt将绘制限制在需要重绘的区域内"""
+        super().paintEvent(event)
+        target = self.frame_rect()
+        if target is None:
+            return
+        painter = QPainter(self)
+        if self.tiled is not None and self.tiled.is_active():
+            # 缩放状态下只绘制可见的分块
+            self.tiled.paint(painter, self.viewport_size(), self.devicePixelRatioF())
+            target = QRectF(0, 0, self.width(), self.height())
+        else:
+            if self.display_size != (self.frame.width(), self.frame.height()):
+                # 草稿帧放大显示时使用双线性插值
+                painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+            painter.drawImage(target, self.frame)
+
+        if self.overlay_text:
+            rect = painter.boundingRect(QRectF(0, 0, self.width(), self.height()), 0, self.overlay_text)
+            rect.adjust(-4, -2, 4, 2)
+            rect.moveTopLeft(target.topLeft() + QPointF(4, 4))
+            painter.fillRect(rect, QColor(0, 0, 0, 160))
+            painter.setPen(QColor(255, 255, 255))
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, self.overlay_text)
+        painter.end()
 
 
 class PreviewArea(QWidget):
-    """图片预览区域组件"""
+    """图片预览区域组件
+
+    预览在按显示分辨率缩小的代理图上渲染，水印参数按同一比例缩放，
+    效果与原图一致；代理图从图片存储中长边不小于显示尺寸的最小预览层级缩小，选中图片时只读取图片信息，
+    不在界面线程中解码原图。代理图未缓存时在后台线程中生成。
+    代理图与水印图层由PreviewCompositor分别保存，水印位置或透明度变化时只重绘水印所在区域。
+    水印图层全部由PreviewRenderer在后台线程中生成，完成前继续显示上一帧；切换图片、质量或显示尺寸时，
+    新的代理图等待对应的图层生成后一起显示，水印不会消失一帧。
+
+    拖动水印、连续调整参数或切换图片时先使用草稿质量：代理图为显示分辨率的一半，
+    用快速的采样方法生成；输入停止REFINE_DELAY_MS毫秒后细化为显示分辨率的LANCZOS代理图，
+    精细代理图与精细图层一起在后台线程中生成。
+
+    滚轮放大后由TiledPreview按分块显示原图，原图在生成分块的后台线程中解码，
+    只生成可见的分块，拖动空白处平移，双击切换原图大小。
+    """
 
     def __init__(self):
         super().__init__()
-        self.current_image = None
-        self.watermark_image = None
-        self.watermark_position = 'center'
+        self.proxy_image = None  # 当前质量的代理图
+        self.proxy_scale = 1.0  # 代理图尺寸 / 原图尺寸
+        self.proxies = OrderedDict()  # 当前图片的代理图，按 (质量, 显示尺寸) LRU缓存
+        self.proxy_key = None  # 当前代理图的缓存键
+        self.pending_proxy = None  # 等待水印图层的代理图 (缓存键, 代理图)，图层生成后一起显示；
+                                   # 代理图为None时由后台线程与图层一起生成
+        self.layer_request = None  # 最新的图层请求 (请求序号, 生成图层时使用的代理图缓存键)
+        self.quality = None  # 当前预览的质量，QUALITY_DRAFT或QUALITY_FINAL
+        self.show_quality_overlay = False  # 是否在预览左上角显示当前质量
+        self.image_size = None  # 原图尺寸，水印参数和拖动均使用原图坐标
+        self.display_size = None  # 预览的显示尺寸（物理像素）
+        self.source_path = None  # 原图的文件路径，用于判断图片是否变化和从图片存储获取预览图
+        self.image_storage = None  # 图片存储实例，将在主窗口中设置
         self.watermark_params = None
         self.dragging = False
         self.drag_start = None
+        self.drag_origin = None  # 开始拖动时水印在原图中的位置
+        self.panning = False  # 缩放状态下是否正在平移
+        self.wheel_delta = 0  # 累计不足一格的滚轮角度，触控板滚动时按整格缩放
         self.watermark_processor = WatermarkProcessor()
 
+        # 代理图和水印图层分别保存，只重绘变化的区域
+        self.compositor = PreviewCompositor()
+
+        # 滚轮缩放后按分块显示原图，只生成可见的分块，分块在后台线程中生成
+        self.tiled = TiledPreview(self.watermark_processor, parent=self)
+        self.tiled.tile_ready.connect(self.on_tile_ready)
+        self.tiled.layer_ready.connect(self.on_tiled_layer_ready)
+
+        # 水印图层变化时在后台线程中生成，只使用最新的结果
+        self.renderer = PreviewRenderer(self.watermark_processor, parent=self)
+        self.renderer.layer_ready.connect(self.on_layer_ready)
+
+        # 输入停止后细化预览
+        self.refine_timer = QTimer(self)
+        self.refine_timer.setSingleShot(True)
+        self.refine_timer.setInterval(REFINE_DELAY_MS)
+        self.refine_timer.timeout.connect(self.refine_preview)
+
+        # 预览区域大小或设备像素比变化停止后按新尺寸更新预览
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(RESIZE_DELAY_MS)
+        self.resize_timer.timeout.connect(self.refresh_display_size)
+
         # 设置布局
         self.layout = QVBoxLayout(self)
 
-        # 预览标签
-        self.preview_label = QLabel()
+        # 预览画布
+        self.preview_label = PreviewCanvas()
         self.preview_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.preview_label.setMinimumSize(400, 400)
         self.preview_label.setStyleSheet("border: 1px solid #ccc; background-color: #f5f5f5;")
+        self.preview_label.tiled = self.tiled
         self.layout.addWidget(self.preview_label)
 
         # 启用鼠标事件
         self.setMouseTracking(True)
         self.preview_label.setMouseTracking(True)
 
-        # 用于实时渲染的QPixmap
-        self.preview_pixmap = None
+    def set_image_storage(self, storage):
+        """设置图片存储实例"""
+        self.image_storage = storage
 
-    def update_preview(self, image, watermark_params=None):
-        """更新预览"""
-        if image is None:
-            self.preview_label.clear()
+    def update_preview(self, file_path, watermark_params=None):
+        """
+        立即更新预览，切换图片时先显示草稿，输入停止后细化
+
+        Args:
+            file_path: 图片存储中的图片路径
+            watermark_params: 水印参数
+        """
+        if file_path is None:
+            self.clear_preview()
             return
 
         try:
-            # 保存当前图像和参数
-            self.current_image = image
+            # 图片变化时重新生成代理图
+            if self.set_source(file_path):
+                self.begin_interaction()
+            else:
+                self.refine_timer.stop()
+                self.set_quality(QUALITY_FINAL)
+        except Exception as e:
+            print(f"生成预览代理图失败: {str(e)}")
+            self.clear_preview()
+            return
+
+        self.watermark_params = watermark_params
+        self.render_preview()
+
+    def schedule_preview(self, file_path, watermark_params=None):
+        """
+        更新预览，适用于水印参数连续变化的场景；
+
+        调整期间使用草稿质量。只有水印位置或透明度变化时直接重绘水印所在区域，其他参数
+        变化时在后台线程中生成新的水印图层，短时间内的多次调用只生成最新的一次，完成前继续显示上一帧
+
+        Args:
+            file_path: 图片存储中的图片路径
+            watermark_params: 水印参数
+        """
+        if file_path is None or not watermark_params:
+            self.update_preview(file_path, watermark_params)
+            return
+
+        try:
+            self.set_source(file_path)
             self.watermark_params = watermark_params
+            quality_changed = self.begin_interaction()
+        except Exception as e:
+            print(f"生成预览代理图失败: {str(e)}")
+            self.clear_preview()
+            return
+
+        # 切换到草稿时立即开始生成草稿图层，其他参数变化时合并连续的请求
+        self.render_preview(immediate=quality_changed)
+
+    def on_layer_ready(self, generation, key, qimage, proxy):
+        """使用后台生成的水印图层更新预览，等待中的代理图与图层一起显示；已有更新的请求时丢弃"""
+        if not self.renderer.is_current(generation):
+            return
+
+        target = self.get_target_proxy()
+        if (self.layer_request is None or self.layer_request[0] != generation
+                or target is None or target[0] != self.layer_request[1]):
+            # 图层按其他质量或尺寸的代理图生成（例如等待中的精细代理图已被草稿取代），重新请求
+            self.render_preview()
+            return
+
+        if self.pending_proxy is not None and self.pending_proxy[1] is None:
+            if proxy is None:
+                # 代理图生成失败，继续显示当前的代理图
+                self.pending_proxy = None
+            else:
+                self.cache_proxy(self.pending_proxy[0], proxy)
+                self.pending_proxy = (self.pending_proxy[0], proxy)
+        self.apply_pending_proxy()
+        self.compositor.set_layer(key, qimage)
+        self.compose_preview()
+
+    def clear_preview(self):
+        """清除预览和代理图"""
+        self.renderer.cancel()
+        self.refine_timer.stop()
+        self.resize_timer.stop()
+        self.compositor.clear()
+        self.tiled.clear()
+        self.preview_label.clear()
+        self.proxy_image = None
+        self.proxies.clear()
+        self.proxy_key = None
+        self.pending_proxy = None
+        self.quality = None
+        self.image_size = None
+        self.display_size = None
+        self.source_path = None
+
+    def set_source(self, file_path):
+        """
+        设置预览的图片，只读取图片信息；代理图在切换质量时按需生成，同一张图片每种质量只生成一次
+
+        Args:
+            file_path: 图片存储中的图片路径
+
+        Returns:
+            图片是否变化
+        """
+        if file_path == self.source_path:
+            return False
+
+        info = self.image_storage.get_image_info(file_path) if self.image_storage is not None else None
+        if info is None:
+            raise ValueError(f"图片未加载: {file_path}")
+
+        self.proxies.clear()
+        self.proxy_key = None
+        self.pending_proxy = None
+        self.image_size = info['size']
+        self.display_size = self.get_display_size(self.image_size)
+        self.source_path = file_path
+        # 原图只在缩放后生成分块时由后台线程解码
+        self.tiled.set_source(self.image_size, lambda: self.image_storage.get_image(file_path))
+        return True
+
+    def set_quality(self, quality):
+        """
+        切换预览质量，准备对应质量和当前显示尺寸的代理图；水印图层需重新生成，
+        代理图等待图层生成后一起显示，还没有显示任何帧时立即显示。
+        代理图未缓存时留给render_preview在后台线程中生成，界面线程不读取和缩放图片
+
+        Args:
+            quality: QUALITY_DRAFT或QUALITY_FINAL
+
+        Returns:
+            是否需要重新渲染：代理图变化，或放弃了等待中的代理图
+        """
+        key = (quality, self.display_size)
+        if key == self.proxy_key:
+            if self.pending_proxy is not None:
+                # 放弃等待中的代理图，其图层尚未交付时按当前代理图重新生成
+                self.pending_proxy = None
+                self.renderer.cancel()
+                return True
+            return False
+        if self.pending_proxy is not None and self.pending_proxy[0] == key:
+            return False
+
+        proxy = self.proxies.get(key)
+        if proxy is not None:
+            self.proxies.move_to_end(key)
+
+        self.pending_proxy = (key, proxy)
+        if self.compositor.frame is None and proxy is not None:
+            self.apply_pending_proxy()
+        return True
+
+    def cache_proxy(self, key, proxy):
+        """缓存代理图，超出PROXY_CACHE_SIZE时淘汰最久未使用的"""
+        self.proxies[key] = proxy
+        while len(self.proxies) > PROXY_CACHE_SIZE:
+            self.proxies.popitem(last=False)
+
+    def get_proxy_job(self):
+        """
+        获取在后台线程中生成等待中的代理图的函数
+
+        Returns:
+            无参数的函数，返回代理图；不需要生成时返回None
+        """
+        if self.pending_proxy is None or self.pending_proxy[1] is not None:
+            return None
+
+        # 在界面线程中取出所需的状态，后台线程不读取本组件的属性
+        key = self.pending_proxy[0]
+        file_path = self.source_path
+        return lambda: self.create_proxy(self.get_proxy_source(file_path, key[1]), key)
+
+    def apply_pending_proxy(self):
+        """显示等待中的代理图，底图变化时重建整帧并清除旧的水印图层"""
+        if self.pending_proxy is None:
+            return
 
-            # 创建预览图像副本
-            preview_image = image.copy()
+        key, proxy = self.pending_proxy
+        self.pending_proxy = None
+        self.proxy_key = key
+        self.quality = key[0]
+        self.proxy_image = proxy
+        self.proxy_scale = proxy.width / self.image_size[0]
+
+        self.compositor.set_base(proxy)
+        self.compositor.set_layer(None, None)
+        self.tiled.set_placeholder(self.compositor.base)
+        self.preview_label.set_frame(self.compositor.frame, self.devicePixelRatioF(), key[1])
+        self.update_quality_overlay()
+
+    def get_target_proxy(self):
+        """
+        获取下一帧使用的代理图：等待中的代理图，没有时为当前显示的代理图
+
+        Returns:
+            (缓存键, 代理图)，没有代理图时返回None
+        """
+        if self.pending_proxy is not None:
+            return self.pending_proxy
+        if self.proxy_image is None:
+            return None
+        return self.proxy_key, self.proxy_image
+
+    def begin_interaction(self):
+        """
+        开始或继续交互：切换到草稿质量，并在输入停止后细化
+
+        Returns:
+            质量是否变化，变化时需要重新生成水印图层
+        """
+        self.refine_timer.start()
+        return self.set_quality(QUALITY_DRAFT)
+
+    def refine_preview(self):
+        """
+        输入停止后细化为精细质量，拖动水印期间推迟到松开鼠标后，草稿代理图仍在后台生成时推迟到其显示后；
+        精细代理图和图层在后台线程中生成，完成前继续显示草稿
+        """
+        if self.dragging or (self.pending_proxy is not None and self.pending_proxy[1] is None):
+            self.refine_timer.start()
+            return
 
-            # 保存原始图像用于实时渲染
-            self.original_image = image.copy()
+        try:
+            if self.set_quality(QUALITY_FINAL):
+                self.render_preview()
+        except Exception as e:
+            print(f"细化预览失败: {str(e)}")
+
+    def resizeEvent(self, event):
+        """预览区域大小变化时先缩放显示现有的帧，停止变化后再按新尺寸重新生成代理图"""
+        super().resizeEvent(event)
+        if self.image_size is not None:
+            if self.preview_label.frame is not None:
+                self.preview_label.display_size = self.get_display_size(self.image_size)
+            self.resize_timer.start()
+
+    def event(self, event):
+        """设备像素比变化（如窗口移动到其他屏幕）时按新的物理像素尺寸更新预览"""
+        if event.type() == getattr(QEvent.Type, 'DevicePixelRatioChange', None) and self.image_size is not None:
+            self.resize_timer.start()
+        return super().event(event)
+
+    def refresh_display_size(self):
+        """按预览区域的当前尺寸和设备像素比更新显示尺寸，变化时使用对应尺寸的代理图"""
+        if self.image_size is None:
+            return
 
-            # 如果有水印参数，应用水印
-            if watermark_params:
-                # 应用水印
-                preview_image = self.watermark_processor.apply_watermark(
-                    preview_image,
-                    watermark_params
-                )
+        display_size = self.get_display_size(self.image_size)
+        dpr = self.devicePixelRatioF()
+        self.tiled.clamp_center(self.preview_label.viewport_size())
+        if display_size == self.display_size:
+            # 物理像素尺寸不变时代理图仍然适用，只按新的设备像素比显示
+            if self.compositor.frame is not None and dpr != self.preview_label.frame_dpr:
+                self.preview_label.set_frame(self.compositor.frame, dpr, self.proxy_key[1])
+            return
 
-                # 保存处理后的图像
-                self.processed_image = preview_image
+        self.display_size = display_size
+        target = self.get_target_proxy()
+        try:
+            self.set_quality(target[0][0] if target is not None else QUALITY_FINAL)
+            self.render_preview()
+        except Exception as e:
+            print(f"更新预览尺寸失败: {str(e)}")
+
+    def set_quality_overlay(self, enabled):
+        """设置是否在预览左上角显示当前质量，用于调试"""
+        self.show_quality_overlay = enabled
+        self.update_quality_overlay()
+
+    def update_quality_overlay(self):
+        """更新预览左上角显示的当前质量"""
+        text = None
+        if self.show_quality_overlay and self.proxy_image is not None:
+            if self.tiled.is_active():
+                text = f"分块 {self.tiled.zoom:.0%}"
             else:
-                # 如果没有水印参数，清除处理后的图像
-                self.processed_image = None
-
-            # 转换为QPixmap并显示
-            qimage = ImageQt(preview_image)
-            self.preview_pixmap = QPixmap.fromImage(qimage)
-
-            # 确保预览标签有内容
-            if self.preview_pixmap.isNull():
-                print("警告: 生成的预览图像为空")
-                # 尝试直接使用原始图像
-                qimage = ImageQt(image)
-                self.preview_pixmap = QPixmap.fromImage(qimage)
-                if self.preview_pixmap.isNull():
-                    print("错误: 原始图像也无法转换为QPixmap")
-                    return
-
-            # 设置缩放模式以保持宽高比
-            self.preview_label.setPixmap(self.preview_pixmap)
-            self.preview_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            self.preview_label.setScaledContents(False)
-
-            # 设置最小尺寸和最大尺寸
-            self.preview_label.setMinimumSize(400, 400)
-
-            # 如果图像比预览区域大，缩放图像以适应
-            if self.preview_pixmap.width() > self.preview_label.width() or self.preview_pixmap.height() > self.preview_label.height():
-                scaled_pixmap = self.preview_pixmap.scaled(
-                    self.preview_label.size(),
-                    Qt.AspectRatioMode.KeepAspectRatio,
-                    Qt.TransformationMode.SmoothTransformation
-                )
-                self.preview_label.setPixmap(scaled_pixmap)
+                name = "草稿" if self.quality == QUALITY_DRAFT else "精细"
+                text = f"{name} {self.proxy_image.width}×{self.proxy_image.height}"
+        self.preview_label.set_overlay_text(text)
+
+    def get_display_size(self, image_size):
+        """
+        计算图片在预览区域中的显示尺寸（物理像素），保持宽高比，不放大
+
+        Args:
+            image_size: 原图尺寸 (width, height)
+
+        Returns:
+            显示尺寸 (width, height)
+        """
+        dpr = self.devicePixelRatioF()
+        width, height = image_size
+        ratio = min(
+            self.preview_label.width() * dpr / width,
+            self.preview_label.height() * dpr / height,
+            1
+        )
+        return (max(1, round(width * ratio)), max(1, round(height * ratio)))
+
+    def get_proxy_source(self, file_path, display_size):
+        """
+        获取生成代理图的源图：图片存储中长边不小于显示尺寸的最小预览图，
+        预览图按层级缓存，再次选中同一张图片时无需从原图缩小；在后台线程中调用
+
+        Args:
+            file_path: 图片存储中的图片路径
+            display_size: 显示尺寸 (width, height)，单位为物理像素
+
+        Returns:
+            PIL图片对象
+        """
+        preview = self.image_storage.get_preview(file_path, max(display_size))
+        if preview is None:
+            raise ValueError(f"无法读取图片: {file_path}")
+        return preview
+
+    def get_proxy_size(self, key):
+        """
+        计算代理图尺寸
+
+        Args:
+            key: 代理图的缓存键 (质量, 显示尺寸)
+
+        Returns:
+            代理图尺寸 (width, height)
+        """
+        quality, (width, height) = key
+        if quality == QUALITY_DRAFT:
+            return (max(1, round(width * DRAFT_SCALE)), max(1, round(height * DRAFT_SCALE)))
+        return (width, height)
+
+    def create_proxy(self, image, key):
+        """
+        按显示尺寸缩小图片，可在后台线程中调用
+
+        精细代理图与显示尺寸相同，按物理像素一比一显示；草稿代理图为显示尺寸的DRAFT_SCALE倍，
+        先按两倍尺寸最近邻采样再按2x2取平均，比LANCZOS快一个数量级，显示时放大。
+
+        Args:
+            image: 原图或预览图
+            key: 代理图的缓存键 (质量, 显示尺寸)
+
+        Returns:
+            代理图，精细代理图与源图尺寸相同时直接返回源图
+        """
+        width, height = self.get_proxy_size(key)
+        if key[0] == QUALITY_DRAFT:
+            return image.resize((width * 2, height * 2), Image.Resampling.NEAREST).reduce(2)
+
+        if (width, height) == image.size:
+            return image
+        # reducing_gap先按整数倍快速缩小，再用LANCZOS缩放到目标尺寸
+        return image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    def get_layer_params(self):
+        """
+        获取在下一帧的代理图上生成水印图层的参数
+
+        参数按代理图比例缩放，透明度固定为不透明，由PreviewCompositor在绘制时应用，
+        因此透明度变化时可以复用已有的图层；草稿质量下图片水印使用快速的缩放方法。
+
+        Returns:
+            水印参数字典
+        """
+        # 精细代理图可能尚未生成，按缓存键计算其尺寸
+        key, _ = self.get_target_proxy()
+        scale = self.get_proxy_size(key)[0] / self.image_size[0]
+        params = dict(self.watermark_processor.scale_params(self.watermark_params, scale))
+        params['opacity'] = 1.0
+        if key[0] == QUALITY_DRAFT:
+            params['draft'] = True
+        return params
+
+    def render_preview(self, immediate=True):
+        """
+        更新预览：图层未变化时直接合成，否则由后台线程生成水印图层，完成前继续显示上一帧；
+        等待中的代理图在同一次渲染中生成
+
+        Args:
+            immediate: 是否立即开始生成图层，为False时合并短时间内的连续请求
+        """
+        if self.get_target_proxy() is None:
+            self.renderer.cancel()
+            return
+
+        prepare = self.get_proxy_job()
+        if not self.watermark_params:
+            if prepare is not None:
+                self.request_layer(None, immediate, prepare)
+                return
+            # 没有水印时无需等待图层
+            self.renderer.cancel()
+            self.apply_pending_proxy()
+            self.compose_preview()
+            return
+
+        try:
+            layer_params = self.get_layer_params()
+            key = self.watermark_processor.get_layer_key(layer_params)
         except Exception as e:
             print(f"预览更新失败: {str(e)}")
-            # 如果水印应用失败，至少显示原始图片
-            if image:
-                try:
-                    qimage = ImageQt(image)
-                    self.preview_pixmap = QPixmap.fromImage(qimage)
-                    if not self.preview_pixmap.isNull():
-                        self.preview_label.setPixmap(self.preview_pixmap)
-                        self.preview_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-                        self.preview_label.setScaledContents(False)
-                    else:
-                        # 如果连原始图片都无法显示，清空预览
-                        self.preview_label.clear()
-                except Exception as img_error:
-                    print(f"显示原始图片失败: {str(img_error)}")
-                    self.preview_label.clear()
+            return
+
+        if self.pending_proxy is None and key == self.compositor.layer_key:
+            # 取消后台尚未完成的请求，避免旧的结果覆盖
+            self.renderer.cancel()
+            self.compose_preview()
+        else:
+            self.request_layer(layer_params, immediate, prepare)
+
+    def request_layer(self, layer_params, immediate, prepare):
+        """请求后台生成水印图层，并记录生成时使用的代理图，交付时据此检查图层与代理图是否匹配"""
+        generation = self.renderer.request(layer_params, immediate, prepare)
+        self.layer_request = (generation, self.get_target_proxy()[0])
+
+    def compose_preview(self):
+        """按当前水印参数在帧中绘制水印，只重绘水印原来和现在所在的区域"""
+        position = None
+        opacity = 1.0
+        layer = self.compositor.layer
+        if self.watermark_params and layer is not None:
+            scaled_params = self.watermark_processor.scale_params(self.watermark_params, self.proxy_scale)
+            # 与apply_watermark相同的方法计算代理图中的位置
+            position = self.watermark_processor.calculate_position(
+                scaled_params['position'],
+                self.proxy_image.size,
+                (layer.width(), layer.height()),
+                scaled_params.get('margin', PRESET_MARGIN)
+            )
+            opacity = self.watermark_params.get('opacity', 0.7)
+
+        try:
+            dirty = self.compositor.compose(position, opacity)
+            self.tiled.watermark_params = self.watermark_params
+            if self.tiled.is_active():
+                self.preview_label.update()
+            else:
+                self.preview_label.update_frame_region(dirty)
+        except Exception as e:
+            print(f"显示预览失败: {str(e)}")
+            self.clear_preview()
 
     def mousePressEvent(self, event):
         """处理鼠标按下事件"""
@@ -132,58 +680,112 @@ class PreviewArea(QWidget):
 
                 # 如果当前是预设位置，转换为自定义坐标
                 if self.watermark_params and isinstance(self.watermark_params['position'], str):
-                    img_width, img_height = self.current_image.size
-                    wm_width, wm_height = self.get_watermark_size()
-
-                    position = self.watermark_params['position']
-                    if position == 'top-left':
-                        pos_x, pos_y = 10, 10
-                    elif position == 'top-right':
-                        pos_x, pos_y = img_width - wm_width - 10, 10
-                    elif position == 'bottom-left':
-                        pos_x, pos_y = 10, img_height - wm_height - 10
-                    elif position == 'bottom-right':
-                        pos_x, pos_y = img_width - wm_width - 10, img_height - wm_height - 10
-                    elif position == 'center':
-                        pos_x, pos_y = (img_width - wm_width) // 2, (img_height - wm_height) // 2
-                    else:
-                        pos_x, pos_y = 10, 10
-
-                    # 更新为自定义位置
-                    self.watermark_params['position'] = (pos_x, pos_y)
+                    self.watermark_params['position'] = self.get_watermark_position()
+                # 按相对于按下位置的距离移动，放大时不会因逐次取整丢失移动距离
+                self.drag_origin = self.get_watermark_position()
+
+                # 拖动期间使用草稿质量，松开鼠标并停止输入后细化
+                if self.begin_interaction():
+                    self.render_preview()
+            elif self.tiled.is_active():
+                # 缩放状态下拖动空白处平移视口
+                self.panning = True
+                self.drag_start = event.pos()
+                self.setCursor(Qt.CursorShape.ClosedHandCursor)
 
     def mouseReleaseEvent(self, event):
         """处理鼠标释放事件"""
         if event.button() == Qt.MouseButton.LeftButton:
+            if self.dragging:
+                self.refine_timer.start()
             self.dragging = False
+            self.panning = False
             self.drag_start = None
             self.setCursor(Qt.CursorShape.ArrowCursor)
 
-            # 重新应用最终水印
-            if self.watermark_params and hasattr(self, 'processed_image'):
-                self.update_preview(self.original_image, self.watermark_params)
+    def mouseDoubleClickEvent(self, event):
+        """双击在适应窗口和原图大小（100%）之间切换"""
+        if event.button() != Qt.MouseButton.LeftButton or self.image_size is None:
+            return
+        self.set_zoom(None if self.tiled.is_active() else 1.0, event.position())
+
+    def wheelEvent(self, event):
+        """滚轮以鼠标位置为中心按整格缩放预览，缩小到适应窗口时退出缩放"""
+        if self.image_size is None or event.angleDelta().y() == 0:
+            return
+        event.accept()
+
+        # 缩放比例取离散的档位，同一档位的分块缓存可以复用
+        self.wheel_delta += event.angleDelta().y()
+        steps = int(self.wheel_delta / 120)
+        if steps == 0:
+            return
+        self.wheel_delta -= steps * 120
+
+        fit_zoom = self.display_size[0] / self.image_size[0]
+        current = self.tiled.zoom if self.tiled.is_active() else fit_zoom
+        level = round(math.log(current / fit_zoom, ZOOM_STEP)) + steps
+        self.set_zoom(fit_zoom * ZOOM_STEP ** level if level > 0 else None, event.position())
+
+    def on_tile_ready(self, source_id, key, tile):
+        """缓存后台生成的分块，属于当前缩放比例时重绘画布"""
+        if self.tiled.add_tile(source_id, key, tile) and self.tiled.is_active() and key[0] == self.tiled.zoom:
+            self.preview_label.update()
+
+    def on_tiled_layer_ready(self, source_id, key, layer):
+        """保存后台生成的缩放预览水印图层并重绘画布"""
+        if self.tiled.set_layer(source_id, key, layer) and self.tiled.is_active():
+            self.preview_label.update()
+
+    def set_zoom(self, zoom, pos=None):
+        """
+        设置预览的缩放比例
+
+        Args:
+            zoom: 缩放比例（物理像素 / 原图像素），为None时适应窗口显示
+            pos: 缩放中心在本组件中的坐标（QPointF），为None时以视口中心缩放
+        """
+        anchor = None
+        image_point = None
+        if pos is not None:
+            label_pos = self.preview_label.mapFrom(self, pos.toPoint())
+            dpr = self.devicePixelRatioF()
+            anchor = (label_pos.x() * dpr, label_pos.y() * dpr)
+            if not self.tiled.is_active():
+                image_point = self.map_to_image(pos.toPoint())
+
+        self.tiled.set_zoom(zoom, self.preview_label.viewport_size(), anchor, image_point)
+        self.tiled.watermark_params = self.watermark_params
+        self.update_quality_overlay()
+        self.preview_label.update()
 
     def mouseMoveEvent(self, event):
         """处理鼠标移动事件"""
         # 确保当前图像存在
-        if not self.current_image:
+        if self.proxy_image is None:
             return
 
-        if self.dragging and self.drag_start:
-            # 计算移动距离
+        if self.panning and self.drag_start:
+            dpr = self.devicePixelRatioF()
             delta = event.pos() - self.drag_start
-
+            self.tiled.pan(delta.x() * dpr, delta.y() * dpr, self.preview_label.viewport_size())
+            self.drag_start = event.pos()
+            self.preview_label.update()
+        elif self.dragging and self.drag_start:
             # 更新水印位置
             if self.watermark_params:
                 try:
+                    # 将鼠标移动距离换算为原图坐标
+                    start_x, start_y = self.map_to_image(self.drag_start)
+                    end_x, end_y = self.map_to_image(event.pos())
+
                     # 获取图片和水印的实际尺寸
-                    img_width, img_height = self.current_image.size
+                    img_width, img_height = self.image_size
                     wm_width, wm_height = self.get_watermark_size()
 
                     # 计算新位置
-                    current_pos = self.get_watermark_position()
-                    new_x = current_pos[0] + delta.x()
-                    new_y = current_pos[1] + delta.y()
+                    new_x = round(self.drag_origin[0] + end_x - start_x)
+                    new_y = round(self.drag_origin[1] + end_y - start_y)
 
                     # 限制在图片范围内
                     new_x = max(0, min(new_x, img_width - wm_width))
@@ -192,11 +794,8 @@ class PreviewArea(QWidget):
                     # 更新水印位置参数
                     self.watermark_params['position'] = (new_x, new_y)
 
-                    # 实时更新预览
-                    self.update_preview(self.current_image, self.watermark_params)
-
-                    # 更新起始点
-                    self.drag_start = event.pos()
+                    # 只重绘水印原来和现在所在的区域
+                    self.compose_preview()
                 except Exception as e:
                     print(f"鼠标移动事件处理失败: {str(e)}")
                     self.dragging = False
@@ -211,114 +810,59 @@ class PreviewArea(QWidget):
 
     def is_watermark_clicked(self, pos):
         """检查点击位置是否在水印上"""
-        if not self.watermark_params or not self.current_image:
+        geometry = self.get_watermark_geometry()
+        if geometry is None:
             return False
 
-        # 获取图片和水印的实际尺寸
-        img_width, img_height = self.current_image.size
-        wm_width, wm_height = self.get_watermark_size()
-
-        # 获取水印位置
-        pos_x, pos_y = self.get_watermark_position()
-
         # 获取缩放后的实际位置
-        scaled_pos = self.get_scaled_position(pos)
-        scaled_pos_x, scaled_pos_y = scaled_pos
+        scaled_pos_x, scaled_pos_y = self.get_scaled_position(pos)
 
         # 检查点击位置是否在水印范围内
-        return (pos_x <= scaled_pos_x <= pos_x + wm_width and
-                pos_y <= scaled_pos_y <= pos_y + wm_height)
+        left, top, right, bottom = geometry['box']
+        return left <= scaled_pos_x <= right and top <= scaled_pos_y <= bottom
 
-    def get_watermark_size(self):
-        """获取水印尺寸"""
-        if not self.watermark_params:
-            return 0, 0
-
-        if self.watermark_params['type'] == 'text':
-            # 对于文本水印，需要根据文本内容计算尺寸
-            text = self.watermark_params['text']
-            font_size = self.watermark_params['font_size']
+    def get_watermark_geometry(self):
+        """
+        获取水印在原图中的位置和范围，由水印处理器计算并缓存，与导出结果一致
 
-            # 使用QFontMetrics更准确地计算文本尺寸
-            font = QFont(self.watermark_params['font'], font_size)
-            font_metrics = QFontMetrics(font)
-            # 在PyQt6中，width方法已被替换为horizontalAdvance
-            text_width = font_metrics.horizontalAdvance(text)
-            text_height = font_metrics.height()
+        Returns:
+            WatermarkProcessor.measure的结果，没有水印时返回None
+        """
+        if not self.watermark_params or self.image_size is None:
+            return None
+        return self.watermark_processor.measure(self.watermark_params, self.image_size)
 
-            return text_width, text_height
-        else:
-            # 对于图片水印，使用设置的大小
-            return self.watermark_params['width'], self.watermark_params['height']
+    def get_watermark_size(self):
+        """获取水印尺寸"""
+        geometry = self.get_watermark_geometry()
+        return geometry['size'] if geometry else (0, 0)
 
     def get_watermark_position(self):
-        """获取水印位置"""
-        if not self.watermark_params or not self.current_image:
-            return (0, 0)
-
-        position = self.watermark_params['position']
-        if isinstance(position, str):
-            # 如果是预设位置，计算实际坐标
-            img_width, img_height = self.current_image.size
-            wm_width, wm_height = self.get_watermark_size()
-
-            if position == 'top-left':
-                return (10, 10)
-            elif position == 'top-right':
-                return (img_width - wm_width - 10, 10)
-            elif position == 'bottom-left':
-                return (10, img_height - wm_height - 10)
-            elif position == 'bottom-right':
-                return (img_width - wm_width - 10, img_height - wm_height - 10)
-            elif position == 'center':
-                return ((img_width - wm_width) // 2, (img_height - wm_height) // 2)
-            else:
-                return (0, 0)
-        else:
-            # 如果是自定义位置，直接返回
-            return position
+        """获取水印在原图中的位置"""
+        geometry = self.get_watermark_geometry()
+        return geometry['anchor'] if geometry else (0, 0)
 
     def get_scaled_position(self, pos):
-        """获取在预览图上缩放后的实际位置"""
-        if not self.preview_pixmap or not self.current_image:
-            return pos
-
-        # 计算缩放比例
-        preview_width = self.preview_pixmap.width()
-        preview_height = self.preview_pixmap.height()
-
-        img_width, img_height = self.current_image.size
-
-        # 计算实际显示尺寸（保持宽高比）
-        display_width = self.preview_label.width()
-        display_height = self.preview_label.height()
-
-        if display_width == 0 or display_height == 0:
-            return pos
-
-        # 计算实际显示的图片尺寸
-        if preview_width / preview_height > display_width / display_height:
-            # 以宽度为准
-            scale = display_width / preview_width
-            actual_display_height = int(preview_height * scale)
-            y_offset = (display_height - actual_display_height) // 2
-            x_offset = 0
-        else:
-            # 以高度为准
-            scale = display_height / preview_height
-            actual_display_width = int(preview_width * scale)
-            x_offset = (display_width - actual_display_width) // 2
-            y_offset = 0
-
-        # 转换鼠标坐标到实际图片坐标
-        if x_offset > 0:
-            scaled_x = int((pos.x() - x_offset) / scale)
-        else:
-            scaled_x = int(pos.x() / scale)
-
-        if y_offset > 0:
-            scaled_y = int((pos.y() - y_offset) / scale)
-        else:
-            scaled_y = int(pos.y() / scale)
-
-        return (scaled_x, scaled_y)
+        """将预览区域中的鼠标坐标转换为原图坐标（取整）"""
+        x, y = self.map_to_image(pos)
+        return (int(x), int(y))
+
+    def map_to_image(self, pos):
+        """将预览区域中的鼠标坐标转换为原图坐标"""
+        # 鼠标事件坐标相对于本组件，换算为相对于预览画布
+        label_pos = self.preview_label.mapFrom(self, pos)
+
+        if self.tiled.is_active():
+            dpr = self.devicePixelRatioF()
+            return self.tiled.map_to_image(
+                (label_pos.x() * dpr, label_pos.y() * dpr),
+                self.preview_label.viewport_size()
+            )
+
+        frame_rect = self.preview_label.frame_rect()
+        if frame_rect is None or frame_rect.width() == 0 or self.image_size is None:
+            return (pos.x(), pos.y())
+
+        # 预览图在画布中居中显示，按逻辑像素计算显示尺寸
+        scale = frame_rect.width() / self.image_size[0]
+        return ((label_pos.x() - frame_rect.x()) / scale, (label_pos.y() - frame_rect.y()) / scale)
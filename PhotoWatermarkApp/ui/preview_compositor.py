@@ -0,0 +1,104 @@
+"""
+预览合成组件
+"""
+
+from PyQt6.QtGui import QImage, QPainter
+from PyQt6.QtCore import QPoint, QRect
+
+from utils.ui_utils import pil_to_qimage
+
+
+class PreviewCompositor:
+    """预览合成组件
+
+    分别保存底图和水印图层，在一张帧图像上合成预览。水印位置或透明度变化时，
+    只从底图恢复原来的水印区域并在新位置绘制水印，耗时与水印面积成正比，与图片大小无关。
+    透明度在绘制时应用，图层本身按不透明生成，透明度变化无需重新生成图层。
+    """
+
+    def __init__(self):
+        self.base = None  # 底图（不含水印）
+        self.frame = None  # 合成后的帧
+        self.layer = None  # 水印图层，预乘透明度格式
+        self.layer_key = None  # 水印图层对应的缓存键
+        self.rect = None  # 帧中水印所在的区域
+        self.full_updates = 0  # 重建整帧的次数
+        self.partial_updates = 0  # 只更新水印区域的次数
+
+    def set_base(self, image):
+        """
+        设置底图并重建整帧，之前绘制的水印被清除
+
+        Args:
+            image: PIL底图
+        """
+        qimage = pil_to_qimage(image)
+        image_format = (
+            QImage.Format.Format_ARGB32_Premultiplied if qimage.hasAlphaChannel()
+            else QImage.Format.Format_RGB32
+        )
+        # 转换为Qt绘制最快的格式，同时得到独立于PIL缓冲区的副本
+        self.base = qimage.convertToFormat(image_format)
+        self.frame = self.base.copy()
+        self.rect = None
+        self.full_updates += 1
+
+    def set_layer(self, key, layer):
+        """
+        设置水印图层
+
+        Args:
+            key: 图层的缓存键，键相同时无需重新设置
+            layer: 不透明生成的水印图层（QImage），为None时不绘制水印
+        """
+        self.layer = None if layer is None else layer.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+        self.layer_key = key
+
+    def clear(self):
+        """清除底图、帧和水印图层"""
+        self.base = None
+        self.frame = None
+        self.layer = None
+        self.layer_key = None
+        self.rect = None
+
+    def compose(self, position=None, opacity=1.0):
+        """
+        在指定位置以指定透明度绘制水印，恢复原水印区域的底图
+
+        Args:
+            position: 水印左上角在帧中的坐标 (x, y)，为None时只清除水印
+            opacity: 水印透明度 (0-1)
+
+        Returns:
+            帧中发生变化的区域（QRect）列表
+        """
+        if self.frame is None:
+            return []
+
+        new_rect = None
+        if position is not None and self.layer is not None and opacity > 0:
+            new_rect = QRect(int(position[0]), int(position[1]), self.layer.width(), self.layer.height())
+            new_rect = new_rect.intersected(self.frame.rect())
+            if new_rect.isEmpty():
+                new_rect = None
+
+        dirty = [rect for rect in (self.rect, new_rect) if rect is not None]
+        if not dirty:
+            return []
+
+        painter = QPainter(self.frame)
+        # 先从底图恢复原水印区域和新水印区域，两者重叠时不会重复叠加
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+        for rect in dirty:
+            painter.drawImage(rect.topLeft(), self.base, rect)
+
+        if new_rect is not None:
+            painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceOver)
+            painter.setOpacity(opacity)
+            painter.drawImage(QPoint(int(position[0]), int(position[1])), self.layer)
+        painter.end()
+
+        self.rect = new_rect
+        self.partial_updates += 1
+        return dirty
@@ -0,0 +1,169 @@
+"""
+预览渲染调度组件
+"""
+
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QImage
+
+from core.watermark_processor import WatermarkProcessor
+from utils.ui_utils import pil_to_qimage
+
+
+class PreviewRenderer(QObject):
+    """预览渲染调度组件
+
+    合并短时间内的连续请求，在后台线程中生成水印图层；后台正在渲染时只保留最新的请求，
+    渲染完成后立即开始最新的请求，已被新请求取代的结果直接丢弃。请求可附带生成底图的任务，
+    底图与图层在同一次渲染中生成并一起交付。
+    图层与底图的合成由界面线程中的PreviewCompositor完成，只重绘水印所在区域。
+    """
+
+    # 渲染完成时发出，参数为请求序号、图层缓存键、水印图层(QImage，无水印时为None)和底图
+    # （请求附带的任务的结果，没有时为None），在界面线程中处理；没有水印或生成失败时缓存键为空字符串
+    layer_ready = pyqtSignal(int, str, object, object)
+
+    def __init__(self, watermark_processor=None, debounce_ms=40, parent=None):
+        """
+        初始化预览渲染调度
+
+        Args:
+            watermark_processor: 水印处理器，为None时新建
+            debounce_ms: 合并请求的等待时间（毫秒），最后一次请求后等待该时间再开始渲染
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.watermark_processor = watermark_processor or WatermarkProcessor()
+        self.generation = 0  # 最新请求的序号
+        self.rendered = 0  # 完成并交付的渲染次数
+        self.discarded = 0  # 被新请求取代而丢弃的请求次数
+
+        self._lock = threading.Lock()  # 保护请求序号和待渲染的请求
+        self._request = None  # 尚未开始渲染的最新请求 (序号, 水印参数)
+        self._rendering = False  # 后台线程是否正在渲染
+        self._closed = False  # 是否已停止，停止后不再发出layer_ready
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='PreviewRenderer')
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self._submit)
+
+    def request(self, watermark_params, immediate=False, prepare=None):
+        """
+        请求生成水印图层，连续的请求会被合并，只渲染最新的一次
+
+        Args:
+            watermark_params: 按代理图缩放后的水印参数，请求时复制，之后的修改不影响本次渲染；
+                为None时只执行prepare
+            immediate: 是否不等待合并立即开始渲染，适用于切换图片或预览质量等单次变化
+            prepare: 在后台线程中生成底图的函数，结果与图层一起交付，为None时不生成
+
+        Returns:
+            请求序号
+        """
+        with self._lock:
+            if self._request is not None:
+                self.discarded += 1
+            self.generation += 1
+            self._request = (self.generation, copy.deepcopy(watermark_params), prepare)
+            generation = self.generation
+
+        if immediate:
+            self._timer.stop()
+            self._submit()
+        else:
+            # 重新计时，连续请求期间不开始渲染
+            self._timer.start()
+        return generation
+
+    def cancel(self):
+        """取消尚未完成的请求，之后交付的渲染结果都会被丢弃"""
+        self._timer.stop()
+        with self._lock:
+            if self._request is not None:
+                self.discarded += 1
+            self.generation += 1
+            self._request = None
+
+    def is_current(self, generation):
+        """
+        检查渲染结果是否对应最新的请求
+
+        Args:
+            generation: 请求序号
+
+        Returns:
+            是否为最新的请求
+        """
+        with self._lock:
+            return generation == self.generation
+
+    def shutdown(self):
+        """
+        取消请求并停止后台线程，不等待正在进行的渲染结束；
+        返回后不再发出layer_ready，界面组件随后销毁也不会收到渲染结果
+        """
+        self.cancel()
+        with self._lock:
+            self._closed = True
+        try:
+            self.layer_ready.disconnect()
+        except TypeError:
+            # 没有连接的槽
+            pass
+        self._executor.shutdown(wait=False)
+
+    def _submit(self):
+        """将最新的请求交给后台线程；正在渲染时等待其完成后再提交"""
+        with self._lock:
+            if self._rendering or self._request is None:
+                return
+            request = self._request
+            self._request = None
+            self._rendering = True
+
+        try:
+            self._executor.submit(self._render, *request)
+        except RuntimeError:
+            # 已停止后台线程
+            with self._lock:
+                self._rendering = False
+
+    def _render(self, generation, watermark_params, prepare):
+        """在后台线程中生成底图和水印图层，图层转换为QImage"""
+        key = None
+        qimage = None
+        base = None
+        try:
+            if self.is_current(generation):
+                key = ''
+                if prepare is not None:
+                    base = prepare()
+                if watermark_params:
+                    key = self.watermark_processor.get_layer_key(watermark_params)
+                    layer = self.watermark_processor.get_watermark_layer(watermark_params)
+                    # QImage可在后台线程中创建和转换格式，QPixmap只能在界面线程中创建
+                    if layer is not None:
+                        qimage = pil_to_qimage(layer).convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+        except Exception as e:
+            print(f"后台生成水印图层失败: {str(e)}")
+            # 仍然交付结果，界面不再等待该图层；空的缓存键不与任何图层相同，下次请求时重新生成
+            key = ''
+            qimage = None
+        finally:
+            with self._lock:
+                self._rendering = False
+                current = generation == self.generation
+                if key is not None and not current:
+                    self.discarded += 1
+                if key is not None and current and not self._closed:
+                    # 持有锁时发出，shutdown返回后不会再有结果交付；跨线程的信号只投递事件，不在此处执行槽
+                    self.rendered += 1
+                    self.layer_ready.emit(generation, key, qimage, base)
+
+        # 渲染期间有新的请求时立即开始渲染
+        self._submit()
@@ -0,0 +1,489 @@
+"""
+分块缩放预览组件
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtGui import QImage, QPainter
+from PyQt6.QtCore import QObject, QPointF, QRect, QRectF, pyqtSignal
+
+from PIL import Image
+
+from utils.ui_utils import pil_to_qimage
+
+
+# 分块边长（物理像素）
+TILE_SIZE = 256
+
+# 分块缓存的内存上限（字节）
+TILE_CACHE_BYTES = 64 * 1024 * 1024
+
+# 最大缩放比例（屏幕物理像素 / 原图像素）
+MAX_ZOOM = 4.0
+
+# 生成分块的后台线程数
+TILE_WORKERS = 2
+
+
+class TiledPreview(QObject):
+    """分块缩放预览组件
+
+    按当前缩放比例把原图划分为固定大小的分块，只生成视口中可见的分块，直接从原图的对应区域
+    缩放得到，不生成整张缩放后的图片；分块按LRU缓存，总内存不超过TILE_CACHE_BYTES，
+    与原图大小无关。水印不写入缓存的分块，绘制时逐块合成，水印变化时分块缓存仍然有效。
+
+    分块在后台线程中生成，原图在生成第一个分块时才解码；生成前先放大显示适应窗口的代理图作为占位；
+    平移或缩放后不再可见的分块如果尚未开始生成则取消。水印图层同样在后台线程中生成，
+    完成前继续绘制上一个图层。
+    """
+
+    # 分块生成完成时发出，参数为原图序号、分块缓存键和分块(QImage，生成失败时为None)，在界面线程中处理
+    tile_ready = pyqtSignal(int, object, object)
+    # 水印图层生成完成时发出，参数为原图序号、图层缓存键和图层(QImage，生成失败时为None)，在界面线程中处理
+    layer_ready = pyqtSignal(int, str, object)
+
+    def __init__(self, watermark_processor, cache_bytes=TILE_CACHE_BYTES, parent=None):
+        """
+        初始化分块预览
+
+        Args:
+            watermark_processor: 水印处理器，用于生成水印图层和计算水印位置
+            cache_bytes: 分块缓存的内存上限（字节）
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.watermark_processor = watermark_processor
+        self.cache_bytes = cache_bytes
+        self.zoom = None  # 缩放比例（物理像素 / 原图像素），为None时未缩放
+        self.center = (0.0, 0.0)  # 视口中心对应的原图坐标
+        self.image_size = None
+        self.watermark_params = None  # 绘制时合成的水印参数（原图坐标）
+        self._loader = None  # 获取原图的函数，在后台线程中调用；原图由图片存储持有和缓存
+        self._layer = None  # 最近生成的水印图层 (缓存键, QImage)
+        self._layer_future = None  # 进行中的水印图层任务 (缓存键, Future)
+        self._tiles = OrderedDict()  # (缩放比例, 列, 行) -> QImage
+        self._tile_bytes = 0
+        self.tiles_rendered = 0  # 生成分块的次数
+        self.placeholder = None  # 分块生成前的占位图（QImage，覆盖整张原图）
+        self._source_id = 0  # 原图序号，原图变化后丢弃之前请求的分块
+        self._futures = {}  # 分块缓存键 -> 进行中的生成任务
+        self._lock = threading.Lock()  # 保证shutdown返回后后台线程不再发出信号
+        self._closed = False  # 是否已停止后台线程
+        self._executor = ThreadPoolExecutor(max_workers=TILE_WORKERS, thread_name_prefix='TiledPreview')
+
+    def set_source(self, image_size, loader):
+        """
+        设置原图，清空分块缓存并退出缩放；原图在生成第一个分块时才由后台线程获取
+
+        Args:
+            image_size: 原图尺寸 (width, height)
+            loader: 返回原图的函数，在后台线程中调用，原图不可用时返回None
+        """
+        self.clear()
+        self._loader = loader
+        self.image_size = image_size
+        self.center = (image_size[0] / 2, image_size[1] / 2)
+
+    def clear(self):
+        """清空分块缓存并退出缩放，取消尚未完成的分块"""
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        if self._layer_future is not None:
+            self._layer_future[1].cancel()
+            self._layer_future = None
+        self._source_id += 1
+        self._tiles.clear()
+        self._tile_bytes = 0
+        self._layer = None
+        self._loader = None
+        self.placeholder = None
+        self.image_size = None
+        self.zoom = None
+
+    def set_placeholder(self, image):
+        """
+        设置分块生成前显示的占位图
+
+        Args:
+            image: 覆盖整张原图的缩小图（QImage），通常为适应窗口的代理图
+        """
+        self.placeholder = image
+
+    def shutdown(self):
+        """取消尚未完成的分块并停止后台线程，返回后不再发出tile_ready"""
+        with self._lock:
+            self._closed = True
+        for signal in (self.tile_ready, self.layer_ready):
+            try:
+                signal.disconnect()
+            except TypeError:
+                # 没有连接的槽
+                pass
+        self.clear()
+        self._executor.shutdown(wait=False)
+
+    def is_active(self):
+        """是否处于缩放状态"""
+        return self.zoom is not None and self._loader is not None
+
+    def set_zoom(self, zoom, viewport_size, anchor=None, image_point=None):
+        """
+        设置缩放比例，缩放前后锚点下的原图位置保持不变
+
+        Args:
+            zoom: 缩放比例（物理像素 / 原图像素），为None时退出缩放
+            viewport_size: 视口尺寸 (width, height)，单位为物理像素
+            anchor: 视口中的锚点 (x, y)，单位为物理像素，为None时保持视口中心
+            image_point: 锚点下的原图坐标，为None时按当前缩放比例计算
+        """
+        if zoom is None or self.image_size is None:
+            self.zoom = None
+            return
+
+        zoom = min(zoom, MAX_ZOOM)
+        if image_point is None and anchor is not None and self.zoom is not None:
+            image_point = self.map_to_image(anchor, viewport_size)
+        if image_point is not None and anchor is not None:
+            # 锚点下的原图坐标在缩放前后保持不变
+            image_x, image_y = image_point
+            offset_x = anchor[0] - viewport_size[0] / 2
+            offset_y = anchor[1] - viewport_size[1] / 2
+            self.center = (image_x - offset_x / zoom, image_y - offset_y / zoom)
+        self.zoom = zoom
+        self.clamp_center(viewport_size)
+
+    def pan(self, dx, dy, viewport_size):
+        """
+        平移视口
+
+        Args:
+            dx, dy: 平移距离，单位为物理像素
+            viewport_size: 视口尺寸 (width, height)，单位为物理像素
+        """
+        if self.zoom is None:
+            return
+        self.center = (self.center[0] - dx / self.zoom, self.center[1] - dy / self.zoom)
+        self.clamp_center(viewport_size)
+
+    def clamp_center(self, viewport_size):
+        """限制视口中心，使视口不超出图片范围；图片小于视口的方向居中显示"""
+        if self.zoom is None or self.image_size is None:
+            return
+        center = []
+        for value, image_length, viewport_length in zip(self.center, self.image_size, viewport_size):
+            half = viewport_length / 2 / self.zoom
+            if half * 2 >= image_length:
+                center.append(image_length / 2)
+            else:
+                center.append(min(max(value, half), image_length - half))
+        self.center = tuple(center)
+
+    def get_origin(self, viewport_size):
+        """
+        获取视口左上角在缩放后图片中的坐标，取整以保证分块按物理像素对齐
+
+        Returns:
+            (x, y)，单位为物理像素
+        """
+        return (
+            round(self.center[0] * self.zoom - viewport_size[0] / 2),
+            round(self.center[1] * self.zoom - viewport_size[1] / 2)
+        )
+
+    def map_to_image(self, point, viewport_size):
+        """
+        将视口坐标转换为原图坐标
+
+        Args:
+            point: 视口中的坐标 (x, y)，单位为物理像素
+            viewport_size: 视口尺寸 (width, height)，单位为物理像素
+
+        Returns:
+            原图坐标 (x, y)
+        """
+        origin_x, origin_y = self.get_origin(viewport_size)
+        return ((point[0] + origin_x) / self.zoom, (point[1] + origin_y) / self.zoom)
+
+    def get_tile_rect(self, column, row):
+        """
+        获取分块在缩放后图片中的区域
+
+        Returns:
+            QRect对象，单位为物理像素
+        """
+        scaled_width = math.ceil(self.image_size[0] * self.zoom)
+        scaled_height = math.ceil(self.image_size[1] * self.zoom)
+        left, top = column * TILE_SIZE, row * TILE_SIZE
+        return QRect(left, top, min(TILE_SIZE, scaled_width - left), min(TILE_SIZE, scaled_height - top))
+
+    def get_tile(self, column, row):
+        """
+        获取当前缩放比例下的分块，未缓存时在后台线程中生成
+
+        Returns:
+            QImage对象，分块尚未生成时返回None
+        """
+        key = (self.zoom, column, row)
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+
+        if key not in self._futures:
+            self.request_tile(key)
+        return None
+
+    def request_tile(self, key):
+        """在后台线程中生成分块，完成后发出tile_ready"""
+        if self._loader is None:
+            return
+
+        zoom, column, row = key
+        rect = self.get_tile_rect(column, row)
+        if rect.isEmpty():
+            return
+
+        # 直接从原图对应区域缩放，不裁剪也不缩放整张图片
+        box = (
+            rect.left() / zoom, rect.top() / zoom,
+            min((rect.right() + 1) / zoom, self.image_size[0]), min((rect.bottom() + 1) / zoom, self.image_size[1])
+        )
+        source_id = self._source_id
+        try:
+            future = self._executor.submit(self.render_tile, self._loader, zoom, (rect.width(), rect.height()), box)
+        except RuntimeError:
+            # 已停止后台线程
+            return
+        self._futures[key] = future
+        future.add_done_callback(lambda done: self._on_tile_done(source_id, key, done))
+
+    @staticmethod
+    def render_tile(loader, zoom, size, box):
+        """
+        在后台线程中从原图区域生成分块，第一个分块会等待原图解码
+
+        Args:
+            loader: 返回原图的函数
+            zoom: 缩放比例
+            size: 分块尺寸 (width, height)
+            box: 原图中的区域 (left, top, right, bottom)
+
+        Returns:
+            QImage分块
+        """
+        source = loader()
+        if source is None:
+            raise ValueError("原图不可用")
+
+        if zoom < 1:
+            # reducing_gap先按整数倍快速缩小原图区域，再用LANCZOS缩放到分块尺寸
+            image = source.resize(size, Image.Resampling.LANCZOS, box=box, reducing_gap=2.0)
+        else:
+            # 放大时保留原始像素便于检查细节
+            image = source.resize(size, Image.Resampling.NEAREST, box=box)
+
+        # QImage可在后台线程中创建和转换格式
+        qimage = pil_to_qimage(image)
+        image_format = (
+            QImage.Format.Format_ARGB32_Premultiplied if qimage.hasAlphaChannel()
+            else QImage.Format.Format_RGB32
+        )
+        return qimage.convertToFormat(image_format)
+
+    def _on_tile_done(self, source_id, key, future):
+        """分块任务结束时在后台线程中调用，通过信号把结果交给界面线程"""
+        if future.cancelled():
+            return
+        try:
+            tile = future.result()
+        except Exception as e:
+            print(f"生成预览分块失败: {str(e)}")
+            tile = None
+        with self._lock:
+            if not self._closed:
+                self.tile_ready.emit(source_id, key, tile)
+
+    def add_tile(self, source_id, key, tile):
+        """
+        缓存后台生成的分块，超出内存上限时淘汰最久未使用的分块
+
+        Args:
+            source_id: 请求分块时的原图序号
+            key: 分块缓存键
+            tile: 分块（QImage），生成失败时为None
+
+        Returns:
+            分块是否属于当前原图且已缓存
+        """
+        if source_id != self._source_id:
+            return False
+        self._futures.pop(key, None)
+        if tile is None:
+            return False
+
+        self._tiles[key] = tile
+        self._tile_bytes += tile.sizeInBytes()
+        while self._tile_bytes > self.cache_bytes and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self._tile_bytes -= evicted.sizeInBytes()
+        self.tiles_rendered += 1
+        return True
+
+    def cancel_hidden(self, visible):
+        """取消不再可见且尚未开始的分块任务"""
+        for key in [key for key in self._futures if key not in visible]:
+            if self._futures[key].cancel():
+                del self._futures[key]
+
+    def get_watermark_layer(self, watermark_params):
+        """
+        获取当前缩放比例下的水印图层和在缩放后图片中的位置
+
+        放大时使用原图尺寸的图层，绘制时再放大，图层大小不超过原图中的水印大小。
+        图层变化时在后台线程中生成，完成前返回上一个图层，绘制到新的位置和大小。
+
+        Returns:
+            (QImage图层, QRectF位置)，没有水印或还没有生成过图层时返回None
+        """
+        geometry = self.watermark_processor.measure(watermark_params, self.image_size)
+        if geometry is None:
+            return None
+
+        layer_params = dict(self.watermark_processor.scale_params(watermark_params, min(self.zoom, 1.0)))
+        layer_params['opacity'] = 1.0
+        key = self.watermark_processor.get_layer_key(layer_params)
+        if (self._layer is None or self._layer[0] != key) and (
+                self._layer_future is None or self._layer_future[0] != key):
+            self.request_layer(key, layer_params)
+        if self._layer is None:
+            return None
+
+        left, top, right, bottom = geometry['box']
+        target = QRectF(left * self.zoom, top * self.zoom, (right - left) * self.zoom, (bottom - top) * self.zoom)
+        return self._layer[1], target
+
+    def request_layer(self, key, layer_params):
+        """在后台线程中生成水印图层，取消尚未开始的上一个请求，完成后发出layer_ready"""
+        if self._layer_future is not None:
+            self._layer_future[1].cancel()
+            self._layer_future = None
+
+        source_id = self._source_id
+        try:
+            future = self._executor.submit(self.render_layer, self.watermark_processor, layer_params)
+        except RuntimeError:
+            # 已停止后台线程
+            return
+        self._layer_future = (key, future)
+        future.add_done_callback(lambda done: self._on_layer_done(source_id, key, done))
+
+    @staticmethod
+    def render_layer(watermark_processor, layer_params):
+        """在后台线程中生成水印图层，返回预乘透明度格式的QImage，没有水印时返回None"""
+        layer = watermark_processor.get_watermark_layer(layer_params)
+        if layer is None:
+            return None
+        return pil_to_qimage(layer).convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+
+    def _on_layer_done(self, source_id, key, future):
+        """水印图层任务结束时在后台线程中调用，通过信号把结果交给界面线程"""
+        if future.cancelled():
+            return
+        try:
+            layer = future.result()
+        except Exception as e:
+            print(f"生成缩放预览水印失败: {str(e)}")
+            layer = None
+        with self._lock:
+            if not self._closed:
+                self.layer_ready.emit(source_id, key, layer)
+
+    def set_layer(self, source_id, key, layer):
+        """
+        保存后台生成的水印图层
+
+        Args:
+            source_id: 请求图层时的原图序号
+            key: 图层缓存键
+            layer: 水印图层（QImage），生成失败时为None
+
+        Returns:
+            图层是否为最新请求的结果且已保存
+        """
+        if source_id != self._source_id or self._layer_future is None or self._layer_future[0] != key:
+            return False
+        self._layer_future = None
+        if layer is None:
+            return False
+        self._layer = (key, layer)
+        return True
+
+    def paint(self, painter, viewport_size, device_pixel_ratio):
+        """
+        绘制视口中可见的分块，并按watermark_params逐块合成水印
+
+        Args:
+            painter: 画布的QPainter，坐标为逻辑像素
+            viewport_size: 视口尺寸 (width, height)，单位为物理像素
+            device_pixel_ratio: 设备像素比
+        """
+        if not self.is_active():
+            return
+
+        watermark_params = self.watermark_params
+        watermark = None
+        if watermark_params:
+            try:
+                watermark = self.get_watermark_layer(watermark_params)
+            except Exception as e:
+                print(f"生成缩放预览水印失败: {str(e)}")
+
+        origin_x, origin_y = self.get_origin(viewport_size)
+        scaled_width = math.ceil(self.image_size[0] * self.zoom)
+        scaled_height = math.ceil(self.image_size[1] * self.zoom)
+        first_column = max(0, origin_x // TILE_SIZE)
+        last_column = min((scaled_width - 1) // TILE_SIZE, (origin_x + viewport_size[0] - 1) // TILE_SIZE)
+        first_row = max(0, origin_y // TILE_SIZE)
+        last_row = min((scaled_height - 1) // TILE_SIZE, (origin_y + viewport_size[1] - 1) // TILE_SIZE)
+
+        painter.save()
+        # 按物理像素绘制，分块一比一显示
+        painter.scale(1 / device_pixel_ratio, 1 / device_pixel_ratio)
+        painter.translate(-origin_x, -origin_y)
+        opacity = watermark_params.get('opacity', 0.7) if watermark_params else 1.0
+        visible = set()
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                visible.add((self.zoom, column, row))
+                tile_rect = self.get_tile_rect(column, row)
+                tile = self.get_tile(column, row)
+                if tile is not None:
+                    painter.drawImage(QPointF(tile_rect.x(), tile_rect.y()), tile)
+                elif self.placeholder is not None:
+                    # 分块生成前放大显示占位图的对应区域
+                    scale = self.placeholder.width() / self.image_size[0] / self.zoom
+                    source_rect = QRectF(
+                        tile_rect.x() * scale, tile_rect.y() * scale,
+                        tile_rect.width() * scale, tile_rect.height() * scale
+                    )
+                    painter.save()
+                    painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+                    painter.drawImage(QRectF(tile_rect), self.placeholder, source_rect)
+                    painter.restore()
+                else:
+                    continue
+
+                # 只在与水印相交的分块中合成水印
+                if watermark is not None and QRectF(tile_rect).intersects(watermark[1]):
+                    painter.save()
+                    painter.setClipRect(tile_rect)
+                    painter.setOpacity(opacity)
+                    painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform, self.zoom < 1)
+                    painter.drawImage(watermark[1], watermark[0])
+                    painter.restore()
+        painter.restore()
+        self.cancel_hidden(visible)
@@ -0,0 +1,357 @@
+"""
+归档文件工具模块
+"""
+
+import io
+import os
+import time
+import tarfile
+import zipfile
+import threading
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from utils.image_utils import sniff_image_header, SIGNATURE_LENGTH
+
+
+# 已经压缩过的格式直接存储，不再重复压缩
+STORED_FORMATS = {'JPEG', 'PNG'}
+
+# 保存时需要随机访问输出流的格式，需先编码到内存
+SEEKABLE_FORMATS = {'TIFF'}
+
+# 归档成员路径中归档文件与成员名称的分隔符，如 shoot.zip!/day1/img.jpg
+MEMBER_SEPARATOR = '!/'
+
+
+def get_archive_format(archive_path: str) -> Optional[str]:
+    """
+    根据文件扩展名判断归档格式
+
+    Args:
+        archive_path: 归档文件路径
+
+    Returns:
+        'zip'、'tar'，无法识别时返回None
+    """
+    lower_path = archive_path.lower()
+    if lower_path.endswith('.zip'):
+        return 'zip'
+    if lower_path.endswith('.tar'):
+        return 'tar'
+    return None
+
+
+def split_member_path(path: str) -> Tuple[str, Optional[str]]:
+    """
+    拆分归档成员路径
+
+    Args:
+        path: 文件路径或归档成员路径
+
+    Returns:
+        (归档文件路径, 成员名称)，普通文件路径的成员名称为None
+    """
+    archive_path, separator, member = path.partition(MEMBER_SEPARATOR)
+    if separator and member and get_archive_format(archive_path) == 'zip':
+        return archive_path, member
+    return path, None
+
+
+def join_member_path(archive_path: str, member: str) -> str:
+    """
+    组合归档成员路径
+
+    Args:
+        archive_path: 归档文件路径
+        member: 成员名称
+
+    Returns:
+        归档成员路径
+    """
+    return f"{archive_path}{MEMBER_SEPARATOR}{member}"
+
+
+def is_member_path(path: str) -> bool:
+    """判断是否为归档成员路径"""
+    return split_member_path(path)[1] is not None
+
+
+def stat_source(path: str) -> os.stat_result:
+    """
+    获取文件状态，归档成员返回所在归档文件的状态（归档修改后成员视为已修改）
+
+    Args:
+        path: 文件路径或归档成员路径
+
+    Returns:
+        文件状态信息
+    """
+    return os.stat(split_member_path(path)[0])
+
+
+class ArchiveWriter:
+    """归档写入器，将导出的图片逐个写入ZIP或TAR流，无需先写入磁盘"""
+
+    def __init__(self, target: Union[str, BinaryIO], archive_format: str = 'zip'):
+        """
+        初始化归档写入器
+
+        Args:
+            target: 归档文件路径或可写的文件对象
+            archive_format: 归档格式，'zip'或'tar'
+        """
+        self.archive_format = archive_format.lower()
+        self.names = set()
+
+        if self.archive_format == 'zip':
+            self.archive = zipfile.ZipFile(target, 'w', allowZip64=True)
+        elif self.archive_format == 'tar':
+            if isinstance(target, str):
+                self.archive = tarfile.open(target, 'w')
+            else:
+                # 流模式支持不可随机访问的输出（如管道、网络连接）
+                self.archive = tarfile.open(fileobj=target, mode='w|')
+        else:
+            raise ValueError(f"不支持的归档格式: {archive_format}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def unique_name(self, name: str) -> str:
+        """
+        获取归档内唯一的成员名称，重名时添加序号
+
+        Args:
+            name: 期望的成员名称
+
+        Returns:
+            唯一的成员名称
+        """
+        name = name.replace(os.sep, '/')
+        if name in self.names:
+            counter = 1
+            base, ext = os.path.splitext(name)
+            while f"{base}_{counter}{ext}" in self.names:
+                counter += 1
+            name = f"{base}_{counter}{ext}"
+
+        self.names.add(name)
+        return name
+
+    def add_image(self, image: Image.Image, name: str, file_format: str, save_kwargs: Optional[Dict] = None) -> str:
+        """
+        编码图片并写入归档
+
+        Args:
+            image: PIL图片对象
+            name: 归档内的成员名称
+            file_format: 图片格式
+            save_kwargs: 传递给Image.save的参数
+
+        Returns:
+            实际写入的成员名称
+        """
+        file_format = file_format.upper()
+        save_kwargs = save_kwargs or {}
+        name = self.unique_name(name)
+
+        if self.archive_format == 'zip':
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED if file_format in STORED_FORMATS else zipfile.ZIP_DEFLATED
+
+            if file_format in SEEKABLE_FORMATS:
+                buffer = io.BytesIO()
+                image.save(buffer, format=file_format, **save_kwargs)
+                self.archive.writestr(info, buffer.getbuffer())
+            else:
+                # 直接编码到归档成员中，不产生中间文件
+                with self.archive.open(info, 'w', force_zip64=True) as member:
+                    image.save(member, format=file_format, **save_kwargs)
+        else:
+            # TAR成员头需要预先知道大小，先编码到内存
+            buffer = io.BytesIO()
+            image.save(buffer, format=file_format, **save_kwargs)
+            info = tarfile.TarInfo(name)
+            info.size = buffer.tell()
+            info.mtime = int(time.time())
+            buffer.seek(0)
+            self.archive.addfile(info, buffer)
+
+        return name
+
+    def add_link(self, name: str, target_name: str) -> str:
+        """
+        添加与已写入成员内容相同的成员，不重新编码图片
+
+        TAR写入硬链接成员；ZIP不支持链接，从归档中复制目标成员已编码的数据
+        （要求归档写入可随机访问的文件）。
+
+        Args:
+            name: 归档内的成员名称
+            target_name: 已写入的目标成员名称
+
+        Returns:
+            实际写入的成员名称
+        """
+        if self.archive_format == 'zip':
+            # 写入成员时不能同时读取归档，先读出目标成员的数据（单张编码后的图片）
+            source_info = self.archive.getinfo(target_name)
+            data = self.archive.read(source_info)
+
+            info = zipfile.ZipInfo(self.unique_name(name), date_time=time.localtime()[:6])
+            info.compress_type = source_info.compress_type
+            self.archive.writestr(info, data)
+            return info.filename
+
+        name = self.unique_name(name)
+        info = tarfile.TarInfo(name)
+        info.type = tarfile.LNKTYPE
+        info.linkname = target_name
+        info.mtime = int(time.time())
+        self.archive.addfile(info)
+        return name
+
+    def close(self) -> None:
+        """完成并关闭归档"""
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+
+class ArchiveReader:
+    """归档读取器，按需读取ZIP归档中的成员，无需先解压到磁盘
+
+    已打开的归档会被缓存，归档文件修改后自动重新打开；可在多个线程中同时使用。
+    被替换或关闭的归档等到正在读取它的线程全部结束后才关闭。
+    """
+
+    def __init__(self):
+        self._archives = {}  # 归档文件路径 -> (ZipFile, 修改时间)
+        self._users = {}  # ZipFile -> 正在读取的线程数
+        self._retired = set()  # 已从缓存移除、等待读取结束后关闭的ZipFile
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def use_archive(self, archive_path: str):
+        """
+        在with块内使用已打开的归档，期间归档不会被关闭
+
+        Args:
+            archive_path: 归档文件路径
+
+        Yields:
+            ZipFile对象
+        """
+        mtime = os.stat(archive_path).st_mtime_ns
+        with self._lock:
+            cached = self._archives.get(archive_path)
+            if cached is not None and cached[1] == mtime:
+                archive = cached[0]
+            else:
+                archive = zipfile.ZipFile(archive_path, 'r')
+                self._archives[archive_path] = (archive, mtime)
+                if cached is not None:
+                    self._retire(cached[0])
+            self._users[archive] = self._users.get(archive, 0) + 1
+
+        try:
+            yield archive
+        finally:
+            with self._lock:
+                self._users[archive] -= 1
+                if self._users[archive] == 0:
+                    del self._users[archive]
+                    if archive in self._retired:
+                        self._retired.discard(archive)
+                        archive.close()
+
+    def _retire(self, archive: zipfile.ZipFile) -> None:
+        """关闭已从缓存移除的归档，仍在读取时推迟到读取结束，调用时需持有锁"""
+        if archive in self._users:
+            self._retired.add(archive)
+        else:
+            archive.close()
+
+    def exists(self, path: str) -> bool:
+        """
+        检查文件或归档成员是否存在
+
+        Args:
+            path: 文件路径或归档成员路径
+
+        Returns:
+            是否存在
+        """
+        archive_path, member = split_member_path(path)
+        if member is None:
+            return os.path.isfile(path)
+
+        try:
+            with self.use_archive(archive_path) as archive:
+                archive.getinfo(member)
+            return True
+        except (OSError, KeyError, zipfile.BadZipFile):
+            return False
+
+    def open(self, path: str) -> BinaryIO:
+        """
+        打开文件或归档成员
+
+        ZIP成员流在定位时需要从头重新读取，成员会被读入内存后返回，
+        便于快速定位和解码；读取的只是单个成员，不需要解压整个归档。
+
+        Args:
+            path: 文件路径或归档成员路径
+
+        Returns:
+            可随机访问的二进制文件对象，由调用者关闭
+        """
+        archive_path, member = split_member_path(path)
+        if member is None:
+            return open(path, 'rb')
+
+        with self.use_archive(archive_path) as archive:
+            try:
+                info = archive.getinfo(member)
+            except KeyError:
+                raise FileNotFoundError(f"归档中不存在该成员: {path}")
+
+            with archive.open(info) as source:
+                return io.BytesIO(source.read())
+
+    def list_images(self, archive_path: str) -> List[str]:
+        """
+        列出归档中的图片成员，根据文件头识别格式
+
+        Args:
+            archive_path: 归档文件路径
+
+        Returns:
+            按名称排序的归档成员路径列表
+        """
+        paths = []
+        with self.use_archive(archive_path) as archive:
+            for info in sorted(archive.infolist(), key=lambda item: item.filename):
+                name = info.filename.rsplit('/', 1)[-1]
+                # 跳过目录、隐藏文件和macOS资源文件
+                if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                    continue
+
+                with archive.open(info) as member:
+                    if sniff_image_header(member.read(SIGNATURE_LENGTH)) is not None:
+                        paths.append(join_member_path(archive_path, info.filename))
+
+        return paths
+
+    def close(self) -> None:
+        """关闭所有已打开的归档，正在读取的归档在读取结束后关闭"""
+        with self._lock:
+            for archive, _ in self._archives.values():
+                self._retire(archive)
+            self._archives.clear()
@@ -3,8 +3,10 @@
 """
 
 import os
-from typing import Tuple, List, Optional, Union
-from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+import io
+import hashlib
+from typing import BinaryIO, Tuple, List, Optional, Union
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps, ExifTags
 import numpy as np
 
 
@@ -44,6 +46,33 @@ def resize_image(
     return image.resize((new_width, new_height), resample)
 
 
+# 支持输出的图片格式及其扩展名，第一个扩展名为默认扩展名
+OUTPUT_FORMATS = {
+    'JPEG': ['.jpg', '.jpeg'],
+    'PNG': ['.png'],
+    'BMP': ['.bmp'],
+    'TIFF': ['.tiff', '.tif']
+}
+
+
+def get_save_kwargs(file_format: str, quality: int = 90) -> dict:
+    """
+    获取保存图片时使用的参数
+
+    Args:
+        file_format: 输出文件格式
+        quality: JPEG质量 (1-100)
+
+    Returns:
+        传递给Image.save的关键字参数
+    """
+    save_kwargs = {}
+    if file_format.upper() == 'JPEG':
+        save_kwargs['quality'] = quality
+        save_kwargs['optimize'] = True
+    return save_kwargs
+
+
 def crop_image(
     image: Image.Image, 
     box: Tuple[int, int, int, int] = None, 
@@ -290,6 +319,262 @@ def create_thumbnail(image: Image.Image, size: Tuple[int, int] = (128, 128)) ->
     return thumbnail
 
 
+# EXIF方向标签对应的变换，与ImageOps.exif_transpose一致
+EXIF_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90
+}
+
+# 内嵌预览图与原图宽高比允许的偏差，超出时认为预览图带有黑边
+EXIF_PREVIEW_RATIO_TOLERANCE = 0.02
+
+
+def create_thumbnail_from_file(
+    file_path: Union[str, BinaryIO],
+    size: Tuple[int, int] = (128, 128)
+) -> Tuple[Image.Image, str]:
+    """
+    从图片文件创建缩略图，避免完整解码
+
+    优先使用EXIF中内嵌的预览图（尺寸足够且宽高比一致时）；否则JPEG使用draft在解码时
+    按1/2、1/4、1/8缩小，其他格式完整解码。缩略图会按EXIF方向标签旋转。
+
+    Args:
+        file_path: 图片文件路径或二进制文件对象
+        size: 缩略图尺寸
+
+    Returns:
+        (缩略图对象, 生成方式)，生成方式为'exif'、'draft'或'full'
+    """
+    with Image.open(file_path) as img:
+        exif = img.getexif()
+        orientation = exif.get(ExifTags.Base.Orientation, 1)
+
+        thumbnail = extract_exif_thumbnail(img, exif, size)
+        if thumbnail is not None:
+            source = 'exif'
+        else:
+            original_size = img.size
+            img.draft('RGB', size)
+            source = 'draft' if img.size != original_size else 'full'
+            thumbnail = create_thumbnail(img, size)
+
+    if orientation in EXIF_ORIENTATION_TRANSPOSE:
+        thumbnail = thumbnail.transpose(EXIF_ORIENTATION_TRANSPOSE[orientation])
+
+    if thumbnail.mode not in ('RGB', 'RGBA'):
+        thumbnail = thumbnail.convert('RGBA' if 'A' in thumbnail.getbands() else 'RGB')
+    return thumbnail, source
+
+
+def extract_exif_thumbnail(
+    img: Image.Image,
+    exif: Image.Exif,
+    size: Tuple[int, int] = (128, 128)
+) -> Optional[Image.Image]:
+    """
+    提取EXIF中内嵌的JPEG预览图
+
+    Args:
+        img: 已打开的PIL图片对象
+        exif: 图片的EXIF信息
+        size: 所需的缩略图尺寸
+
+    Returns:
+        缩小到指定尺寸的预览图（未按方向旋转），预览图不存在、
+        小于所需尺寸或宽高比与原图不一致时返回None
+    """
+    try:
+        ifd1 = exif.get_ifd(ExifTags.IFD.IFD1)
+        offset = ifd1.get(ExifTags.Base.JpegIFOffset)
+        length = ifd1.get(ExifTags.Base.JpegIFByteCount)
+        if not offset or not length:
+            return None
+
+        # 偏移量相对于TIFF头，JPEG的EXIF数据以"Exif\0\0"开头
+        data = img.info.get('exif', b'')
+        if data.startswith(b'Exif\x00\x00'):
+            data = data[6:]
+        data = data[offset:offset + length]
+        if not data.startswith(b'\xff\xd8'):
+            return None
+
+        preview = Image.open(io.BytesIO(data))
+        preview.load()
+    except Exception:
+        return None
+
+    # 预览图需覆盖缩略图尺寸（按长边比较）
+    if max(preview.size) < max(size):
+        return None
+
+    image_ratio = img.width / img.height
+    preview_ratio = preview.width / preview.height
+    if abs(preview_ratio - image_ratio) > image_ratio * EXIF_PREVIEW_RATIO_TOLERANCE:
+        return None
+
+    return create_thumbnail(preview, size)
+
+
+def read_exif_metadata(img: Image.Image) -> dict:
+    """
+    从已打开图片的EXIF中读取拍摄时间和相机型号，只读取文件头，不解码像素
+
+    Args:
+        img: 已打开的PIL图片对象
+
+    Returns:
+        字典，taken_at为拍摄时间（格式为YYYY-MM-DD HH:MM:SS，可按字符串排序），
+        camera为相机厂商和型号，缺失时为None
+    """
+    metadata = {'taken_at': None, 'camera': None}
+    # PNG文件头中没有EXIF块时，getexif会解码整张图片以查找图像数据之后的块
+    if img.format == 'PNG' and 'exif' not in img.info:
+        return metadata
+
+    try:
+        exif = img.getexif()
+    except Exception:
+        return metadata
+
+    try:
+        taken_at = exif.get_ifd(ExifTags.IFD.Exif).get(ExifTags.Base.DateTimeOriginal)
+    except Exception:
+        taken_at = None
+    taken_at = taken_at or exif.get(ExifTags.Base.DateTime)
+    if isinstance(taken_at, str):
+        # EXIF日期格式为YYYY:MM:DD HH:MM:SS
+        taken_at = taken_at.strip('\x00 ')
+        if len(taken_at) >= 10 and taken_at[4] == ':' and taken_at[7] == ':':
+            metadata['taken_at'] = taken_at[:4] + '-' + taken_at[5:7] + '-' + taken_at[8:]
+
+    make = str(exif.get(ExifTags.Base.Make) or '').strip('\x00 ')
+    model = str(exif.get(ExifTags.Base.Model) or '').strip('\x00 ')
+    # 多数相机的型号已包含厂商名称
+    if make and not model.lower().startswith(make.split()[0].lower()):
+        model = f"{make} {model}".strip()
+    metadata['camera'] = model or None
+
+    return metadata
+
+
+# 各图片格式的文件头特征
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'II*\x00', 'TIFF'),
+    (b'MM\x00*', 'TIFF'),
+    (b'II+\x00', 'TIFF'),  # BigTIFF
+    (b'MM\x00+', 'TIFF'),
+    (b'BM', 'BMP')
+]
+
+# 识别格式所需读取的字节数
+SIGNATURE_LENGTH = 8
+
+
+def sniff_image_header(header: bytes) -> Optional[str]:
+    """
+    根据文件头字节识别图片格式
+
+    Args:
+        header: 文件开头的字节
+
+    Returns:
+        格式名称（JPEG、PNG、TIFF、BMP），无法识别时返回None
+    """
+    for signature, format_name in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return format_name
+    return None
+
+
+def sniff_image_format(file_path: str) -> Optional[str]:
+    """
+    读取文件开头的几个字节识别图片格式，不依赖扩展名，也不解码图片
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        格式名称（JPEG、PNG、TIFF、BMP），无法识别或无法读取时返回None
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            return sniff_image_header(f.read(SIGNATURE_LENGTH))
+    except OSError:
+        return None
+
+
+# 快速内容哈希的采样块大小和块数
+HASH_BLOCK_SIZE = 64 * 1024
+HASH_SAMPLE_BLOCKS = 4
+
+
+def compute_quick_hash(source: Union[str, BinaryIO]) -> Optional[str]:
+    """
+    计算文件的快速内容哈希：文件大小加上均匀分布的若干采样块
+
+    内容相同的文件快速哈希一定相同；快速哈希相同时需用compute_file_hash确认。
+
+    Args:
+        source: 文件路径或可随机访问的二进制文件对象（读取后回到开头）
+
+    Returns:
+        十六进制哈希字符串，无法读取时返回None
+    """
+    try:
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                return compute_quick_hash(f)
+
+        size = source.seek(0, os.SEEK_END)
+        digest = hashlib.blake2b(str(size).encode('ascii'), digest_size=16)
+
+        if size <= HASH_BLOCK_SIZE * HASH_SAMPLE_BLOCKS:
+            source.seek(0)
+            digest.update(source.read())
+        else:
+            # 包含开头和结尾的块，中间的块均匀分布
+            step = (size - HASH_BLOCK_SIZE) // (HASH_SAMPLE_BLOCKS - 1)
+            for i in range(HASH_SAMPLE_BLOCKS):
+                source.seek(i * step)
+                digest.update(source.read(HASH_BLOCK_SIZE))
+
+        source.seek(0)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+
+def compute_file_hash(source: Union[str, BinaryIO]) -> Optional[str]:
+    """
+    计算文件完整内容的哈希
+
+    Args:
+        source: 文件路径或二进制文件对象
+
+    Returns:
+        十六进制哈希字符串，无法读取时返回None
+    """
+    try:
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                return compute_file_hash(f)
+
+        digest = hashlib.blake2b()
+        for chunk in iter(lambda: source.read(1024 * 1024), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+
 def is_valid_image(file_path: str) -> bool:
     """
     检查文件是否为有效图片
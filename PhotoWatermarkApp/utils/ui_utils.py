@@ -6,10 +6,19 @@ from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
     QFileDialog, QMessageBox, QProgressBar, QStatusBar
 )
-from PyQt6.QtGui import QPixmap, QIcon, QFont
+from PyQt6.QtGui import QPixmap, QIcon, QFont, QImage
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
 
 
+# PIL色彩模式 -> (转换后的模式, 每像素字节数, QImage格式)，按行直接复制PIL的像素数据，Qt无需再转换格式
+QIMAGE_FORMATS = {
+    'RGB': ('RGB', 3, QImage.Format.Format_RGB888),
+    'RGBA': ('RGBA', 4, QImage.Format.Format_RGBA8888),
+    'RGBX': ('RGBX', 4, QImage.Format.Format_RGBX8888),
+    'L': ('L', 1, QImage.Format.Format_Grayscale8)
+}
+
+
 def center_window(window):
     """
     将窗口居中显示
@@ -419,3 +428,35 @@ def create_spacer():
     """
     from PyQt6.QtWidgets import QSpacerItem, QSizePolicy
     return QSpacerItem(10, 10, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum)
+
+
+def pil_to_qimage(image, box=None):
+    """
+    将PIL图像转换为QImage，只复制一次像素数据
+
+    RGB和RGBA图像分别对应RGB888和RGBA8888格式，像素数据按行直接复制到缓冲区，
+    QImage直接引用该缓冲区，不再转换格式；其他色彩模式先转换为RGB或RGBA。
+    缓冲区为只读，在QImage上绘制时Qt会先复制一份可写的缓冲区。
+    缓冲区保存在返回的QImage对象上，QImage存在期间一直有效；需要长期保存时
+    请使用QPixmap.fromImage或QImage.copy生成独立的副本。
+
+    Args:
+        image: PIL图片对象
+        box: 只转换的区域 (left, top, right, bottom)，为None时转换整张图片
+
+    Returns:
+        QImage对象
+    """
+    if image.mode not in QIMAGE_FORMATS:
+        has_alpha = image.mode in ('LA', 'PA', 'La') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    if box is not None:
+        image = image.crop(box)
+
+    mode, depth, qformat = QIMAGE_FORMATS[image.mode]
+    buffer = image.tobytes('raw', mode)
+    qimage = QImage(buffer, image.width, image.height, image.width * depth, qformat)
+    # QImage不持有缓冲区的引用，保存在对象上，避免缓冲区先于QImage被释放
+    qimage._pil_buffer = buffer
+    return qimage
+